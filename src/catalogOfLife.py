@@ -2,55 +2,201 @@
 # Author
 # License
 
-import urllib.request
-from urllib.error import HTTPError
 import re
 import xml.etree.ElementTree as ET
 import html
+import os
 import sys
 import datetime
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from persistentCache import PersistentCache, defaultCachePath
+from webservice import getClient
 try:
     from tkinter import messagebox
 except:
     import tkMessageBox as messagebox
 
 
-# catalog of life scientific name search
-# queries catalog of life with a scientific name
-# returns the most up-to-date, accepted, scientific name for a specimen
-# or an error message to calling function
-def colNameSearch(givenScientificName):
+# time to live (in seconds) for cached Catalog of Life responses.
+# accepted names rarely change, error responses (typos) are retried sooner.
+nameCacheTTL = 90 * 24 * 60 * 60
+nameErrorCacheTTL = 7 * 24 * 60 * 60
+nameCacheMaxEntries = 50000
+# concurrent requests made when resolving a batch of names
+nameSearchWorkers = 8
+# seconds to wait on a Catalog of Life endpoint before also asking the next one
+colHedgeBudget = 3
+_nameCache = None
+_synonymMap = None
+# the longest synonym chain followed before giving up
+maxSynonymChain = 10
+# path to a checklist index built by localChecklist.importChecklist, '' for none
+localChecklistPath = ''
+_localChecklist = None
+_nameMatcher = None
+# taxonomy providers in order of preference, and how their answers are chosen
+# see taxonomyProviders.TaxonomyResolver
+taxonomyProviders = ['Local checklist', 'CoL']
+taxonomyMode = 'first'
+_taxonomyResolver = None
+# trailing words standing in for (or qualifying) an epithet, ie: 'Acer sp.'
+qualifierPattern = r'(?:^| )((?i:sp|spp|ssp|var)\.?)$'
+# words marking an infraspecific rank, ie: 'Acer saccharum var. nigrum'
+rankWords = ['var.', 'var', 'ssp.', 'ssp', 'subsp.', 'subsp', 'f.', 'forma', 'fo.']
+
+
+def getNameCache():
+    """Returns the session's scientific name cache, opening it on first use."""
+
+    global _nameCache
+    if _nameCache is None:
+        _nameCache = PersistentCache(defaultCachePath('.pdproject_namecache.sqlite'), table='colNames',
+                                     ttl=nameCacheTTL, maxEntries=nameCacheMaxEntries)
+    return _nameCache
+
+
+def setLocalChecklist(indexPath):
+    """Sets the checklist index consulted before Catalog of Life,
+    an empty path disables offline lookups."""
+
+    global localChecklistPath, _localChecklist, _nameMatcher
+    if indexPath != localChecklistPath and _localChecklist is not None:
+        _localChecklist.close()
+        _localChecklist = None
+        _nameMatcher = None
+    localChecklistPath = indexPath
+    return
+
+
+def getLocalChecklist():
+    """Returns the configured local checklist, or None if there isn't one."""
+
+    global _localChecklist
+    if _localChecklist is None and localChecklistPath != '' and os.path.isfile(localChecklistPath):
+        from localChecklist import LocalChecklist
+        _localChecklist = LocalChecklist(localChecklistPath)
+    return _localChecklist
+
+
+def setTaxonomyProviders(providerNames, mode='first'):
+    """Sets the providers names are resolved against, in order of
+    preference. providerNames may be a list or a comma separated string."""
+
+    global taxonomyProviders, taxonomyMode, _taxonomyResolver
+    if isinstance(providerNames, str):
+        providerNames = [x.strip() for x in providerNames.split(',') if x.strip() != '']
+    if providerNames != taxonomyProviders or mode != taxonomyMode:
+        if _taxonomyResolver is not None:
+            _taxonomyResolver.close()
+        _taxonomyResolver = None
+    taxonomyProviders = providerNames
+    taxonomyMode = mode
+    return
+
+
+def getTaxonomyResolver():
+    """Returns the resolver for the configured providers, building it on first use."""
+
+    global _taxonomyResolver
+    if _taxonomyResolver is None:
+        from taxonomyProviders import buildResolver
+        _taxonomyResolver = buildResolver(taxonomyProviders, taxonomyMode)
+    return _taxonomyResolver
+
+
+def printTaxonomyStats():
+    """Print a line of answer, latency and cache statistics for each taxonomy provider"""
+
+    for name, summary in getTaxonomyResolver().stats().items():
+        print('{}: {requests} lookups, {accepted} accepted, {wins} used, success {successRate:.0%}, '
+              'cache hits {cacheHitRate:.0%}, mean {meanLatency:.3f}s'.format(name, **summary))
+    return
+
+
+def getNameMatcher():
+    """Returns a fuzzy matcher over the local checklist, or None without one."""
+
+    global _nameMatcher
+    if _nameMatcher is None and getLocalChecklist() is not None:
+        from fuzzyNames import FuzzyNameMatcher
+        _nameMatcher = FuzzyNameMatcher(getLocalChecklist())
+    return _nameMatcher
+
+
+def suggestNames(givenScientificName, k=5):
+    """Closest accepted names to a (probably misspelled) scientific name,
+    as (distance, matched name, accepted name, authority) tuples. Empty if
+    no local checklist is configured."""
+
+    nameMatcher = getNameMatcher()
+    if nameMatcher is None:
+        return []
+    return nameMatcher.suggest(normalizeNameQuery(givenScientificName), k=k)
+
+
+def getSynonymMap():
+    """Returns the persistent map of synonym -> accepted name query keys,
+    learned from Catalog of Life responses."""
+
+    global _synonymMap
+    if _synonymMap is None:
+        _synonymMap = PersistentCache(defaultCachePath('.pdproject_namecache.sqlite'), table='colSynonyms',
+                                      ttl=nameCacheTTL, maxEntries=nameCacheMaxEntries)
+    return _synonymMap
+
+
+def normalizeNameQuery(givenScientificName):
+    """Reduces a scientific name to the genus, specific epithet and final
+    infraspecific word which are sent to Catalog of Life. Case is normalized
+    so that equivalent names share a cache entry."""
+
     identification = str(givenScientificName).split()
-    if givenScientificName != '':
-        identQuery = [identification[0]]
-    # no sci-name in row
-    else:
-        return 'empty_string'
-    if len(identification) > 1:
-        identQuery.append(identification[1])
-        if len(identification) > 2:
-            identQuery.append(identification[-1])
+    identQuery = identification[:2]
+    if len(identification) > 2:
+        identQuery.append(identification[-1])
+    identQuery = [x.lower() for x in identQuery]
+    if len(identQuery) > 0:
+        identQuery[0] = identQuery[0].capitalize()
+    return identQuery
+
+
+def colQuery(identQuery):
+    """Requests a terse response from Catalog of Life for a normalized
+    name query. Returns the parsed xml root, or None if the service could
+    not be reached."""
+
+    # If the main webservice is slow or failing, the current and previous year's
+    # annual checklists are asked as well. Whichever answers first is used.
+    year = datetime.datetime.now().year
+    name = '+'.join(identQuery)
+    targets = [('http://webservice.catalogueoflife.org/col/webservice?name={}&response=terse'.format(name), 'CoL'),
+               ('http://webservice.catalogueoflife.org/annual-checklist/{}/webservice?name={}&response=terse'.format(year, name), 'CoL {}'.format(year)),
+               ('http://webservice.catalogueoflife.org/annual-checklist/{}/webservice?name={}&response=terse'.format(year - 1, name), 'CoL {}'.format(year - 1))]
     try:
-        CoLQuery = ET.parse(urllib.request.urlopen('http://webservice.catalogueoflife.org/col/webservice?name={}&response=terse'.format('+'.join(identQuery)), timeout=30)).getroot()
-    # help(socket.timeout)
+        response = getClient().hedgedGet(targets, budget=colHedgeBudget)
     except OSError:
-        try:
-            # This try attempt tries to load a catalog by specififying the current year
-            # We may want to ask the user first, or consider removing this.
-            # This tries  the current year then attempts a year prior before giving up.
-            print('useing the alternative CoL URL')
-            CoLQuery = ET.parse(urllib.request.urlopen('http://webservice.catalogueoflife.org/annual-checklist/{}/webservice?name={}&response=terse'.format(datetime.datetime.now().year,'+'.join(identQuery)), timeout=30)).getroot()
-        # help(socket.timeout)
-        except OSError:
-            try:
-                CoLQuery = ET.parse(urllib.request.urlopen('http://webservice.catalogueoflife.org/annual-checklist/{}/webservice?name={}&response=terse'.format(datetime.datetime.now().year -1 ,'+'.join(identQuery)), timeout=30)).getroot()
-            except HTTPError:
-                return 'http_Error'
+        return None
+    return ET.fromstring(response.content)
+
+
+def cleanAuthority(authorityName):
+    """Drops the year and trailing punctuation from an authority string"""
+
+    authorityName = re.sub(r'\d+','',str(authorityName))
+    return authorityName.strip().rstrip(',')
+
+
+def parseColResponse(CoLQuery):
+    """Reads a terse Catalog of Life response. Returns a dict with a 'status'
+    of 'accepted' (with the name and authority), 'synonym' (with the
+    accepted name), 'error' (with CoL's message) or 'unmatched'."""
+
     #<status>accepted name|ambiguous synonym|misapplied name|privisionally acceptedname|synomym</status>  List of potential name status
 
     #Check if CoL returned an Error
     if len(CoLQuery.get('error_message')) > 0:
-        return ('ERROR', str(CoLQuery.get('error_message')))
+        return {'status': 'error', 'message': str(CoLQuery.get('error_message'))}
     #if not an error, then pull all the results
     for result in CoLQuery.findall('result'):
     #start checking the results for the first instance of an accepted name.
@@ -68,16 +214,257 @@ def colNameSearch(givenScientificName):
                     # Give up looking for authority
                     authorityName = ''
                 #cleaning the author name up.
-            authorityName = re.sub(r'\d+','',str(authorityName))
-            authorityName = authorityName.strip().rstrip(',')
-            return (name,authorityName)
+            return {'status': 'accepted', 'name': name, 'authority': cleanAuthority(authorityName)}
         elif 'synonym' in nameStatus:
-            return colNameSearch(result.find('accepted_name/name').text)
+            return {'status': 'synonym', 'acceptedName': result.find('accepted_name/name').text}
+    return {'status': 'unmatched'}
+
+
+def resolveKnownSynonyms(queryKey):
+    """Follows synonym edges already recorded in the synonym map. Returns
+    the list of keys walked, ending with the first key that is not a known
+    synonym. Raises ValueError on a cycle or an overly long chain."""
+
+    synonymMap = getSynonymMap()
+    chain = [queryKey]
+    acceptedKey = synonymMap.get(queryKey)
+    while acceptedKey is not None:
+        if acceptedKey in chain:
+            raise ValueError('synonym cycle: {}'.format(' -> '.join(chain + [acceptedKey])))
+        if len(chain) > maxSynonymChain:
+            raise ValueError('synonym chain too long: {}'.format(' -> '.join(chain)))
+        chain.append(acceptedKey)
+        acceptedKey = synonymMap.get(acceptedKey)
+    return chain
+
+
+def colNameLookup(identQuery):
+    """Resolves a normalized name query against Catalog of Life, following
+    synonyms to the accepted name. Returns a dict suitable for the name cache
+    with a 'status' of 'accepted', 'error' or 'unmatched', or None when the
+    webservice could not be reached.
 
+    Each synonym -> accepted edge is recorded in the synonym map, and known
+    edges (or cached accepted names) are used without asking CoL again."""
 
-def genScientificName(self, currentRowArg):
+    synonymMap = getSynonymMap()
+    nameCache = getNameCache()
+    synonyms = []
+    queryKey = ' '.join(identQuery)
+    while True:
+        try:
+            chain = resolveKnownSynonyms(queryKey)
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}
+        # every key in the chain but the last is a synonym we already know about.
+        for key in chain[:-1]:
+            if key in synonyms:
+                return {'status': 'error', 'message': 'synonym cycle: {}'.format(' -> '.join(synonyms + [key]))}
+            synonyms.append(key)
+        queryKey = chain[-1]
+        if len(synonyms) > maxSynonymChain:
+            return {'status': 'error', 'message': 'synonym chain too long: {}'.format(' -> '.join(synonyms))}
+        if len(synonyms) > 0:
+            entry = nameCache.get(queryKey)
+            if entry is not None and entry['status'] == 'accepted':
+                return {'status': 'accepted', 'name': entry['name'], 'authority': entry['authority'],
+                        'synonyms': synonyms}
+
+        CoLQuery = colQuery(queryKey.split())
+        if CoLQuery is None:
+            return None
+        result = parseColResponse(CoLQuery)
+        if result['status'] != 'synonym':
+            if result['status'] == 'accepted':
+                result['synonyms'] = synonyms
+                if len(synonyms) > 0:
+                    # the accepted name is worth caching under its own name too.
+                    nameCache.set(queryKey, dict(result, synonyms=[]))
+            return result
+        acceptedKey = ' '.join(normalizeNameQuery(result['acceptedName']))
+        if acceptedKey == queryKey or acceptedKey in synonyms:
+            return {'status': 'error', 'message': 'synonym cycle: {}'.format(' -> '.join(synonyms + [queryKey, acceptedKey]))}
+        synonymMap.set(queryKey, acceptedKey)
+        synonyms.append(queryKey)
+        queryKey = acceptedKey
+
+
+def nameCacheEntryToResult(entry):
+    """Converts a name cache entry into colNameSearch's return values."""
+
+    if entry['status'] == 'accepted':
+        return (entry['name'], entry['authority'])
+    elif entry['status'] == 'error':
+        return ('ERROR', entry['message'])
+    return None
+
+
+# catalog of life scientific name search
+# queries catalog of life with a scientific name
+# returns the most up-to-date, accepted, scientific name for a specimen
+# or an error message to calling function
+# the configured taxonomy providers are asked (see setTaxonomyProviders), each keeping
+# its answers in a persistent cache, so repeated names never leave the machine.
+def colNameSearch(givenScientificName):
+    if givenScientificName == '':
+        # no sci-name in row
+        return 'empty_string'
+    entry = getTaxonomyResolver().resolve(normalizeNameQuery(givenScientificName))
+    if entry is None:
+        # service problems are not cached, the next attempt should try again.
+        return 'http_Error'
+    return nameCacheEntryToResult(entry)
+
+
+def safeColNameSearch(givenScientificName):
+    """colNameSearch for worker threads, a garbled response counts as a
+    webservice failure rather than stopping the whole batch."""
+
+    try:
+        return colNameSearch(givenScientificName)
+    except ET.ParseError:
+        return 'http_Error'
+
+
+def batchColNameSearch(names, maxWorkers=nameSearchWorkers, queryKeys=None):
+    """Resolves many scientific names at once. Names are reduced to their
+    distinct normalized queries, which are resolved concurrently on a bounded
+    thread pool. queryKeys, if given, are the names' already normalized
+    queries (see parseScientificNames). Returns a dict of each given name to
+    its colNameSearch result."""
+
+    if queryKeys is None:
+        queryKeys = [' '.join(normalizeNameQuery(x)) for x in names]
+    distinctQueries = {}
+    for name, queryKey in zip(names, queryKeys):
+        if name != '':
+            distinctQueries.setdefault(queryKey, name)
+    if len(distinctQueries) == 0:
+        return {}
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        results = dict(zip(distinctQueries.keys(), executor.map(safeColNameSearch, distinctQueries.values())))
+    return {name: results[queryKey] for name, queryKey in zip(names, queryKeys) if name != ''}
+
+
+def tidyNames(names):
+    """Scientific names as stripped strings with single spaces, '' for missing"""
+
+    names = names.fillna('').astype(str).str.strip().str.replace(r'\s+', ' ', regex=True)
+    return names.replace('nan', '')
+
+
+def parseScientificNames(names):
+    """Splits a column of scientific names into their parts in one pass.
+    Returns a DataFrame on the same index with the columns genus, epithet,
+    rank, infraspecific and qualifier (ie: 'sp.'), along with query, the
+    name sent for lookup, and queryKey, its normalized form. Missing parts
+    are empty strings."""
+
+    names = tidyNames(names)
+    # collections repeat names a great deal, so each distinct name is parsed once.
+    distinctNames = pd.Series(names.unique())
+    parsed = pd.DataFrame(index=distinctNames.index)
+    #this intends to exclude only those instances where the final word is a qualifier.
+    parsed['qualifier'] = distinctNames.str.extract(qualifierPattern, expand=False).fillna('')
+    rest = distinctNames.str.replace(qualifierPattern, '', regex=True).str.strip()
+    words = rest.str.extract(r'^(\S+)(?: (\S+))?(?: (\S+))?(?: (\S+))?(?: .+)?$').fillna('')
+    wordCount = (rest.str.count(' ') + 1).where(rest != '', 0)
+    # handle infraspecific abbreviations by trusting user input.
+    hasRank = (wordCount == 4) & (parsed['qualifier'] == '') & words[2].str.lower().isin(rankWords)
+    parsed['rank'] = words[2].where(hasRank, '')
+    parsed['genus'] = words[0]
+    parsed['epithet'] = words[1]
+    parsed['infraspecific'] = rest.str.extract(r'(\S+)$', expand=False).fillna('').where(wordCount > 2, '')
+    parsed['query'] = rest.where(~hasRank, words[0] + ' ' + words[1] + ' ' + words[3])
+    # the same reduction as normalizeNameQuery
+    parsed['queryKey'] = (parsed['genus'].str.capitalize() + ' ' + parsed['epithet'].str.lower() + ' ' +
+                          parsed['infraspecific'].str.lower()).str.strip()
+    parsed.index = distinctNames
+    parsed = parsed.loc[names.values]
+    parsed.index = names.index
+    return parsed[['genus', 'epithet', 'rank', 'infraspecific', 'qualifier', 'query', 'queryKey']]
+
+
+def formatScientificName(name):
+    """Label markup for a single scientific name, without its qualifier.
+    The genus, the epithet and an infraspecific epithet are italicized,
+    rank words and authorities are left upright."""
+
+    words = name.split()
+    italic = [False] * len(words)
+    for x, word in enumerate(words):
+        if x == 0:
+            italic[x] = True
+        elif word[0].islower() or word[0] == '\u00d7':
+            # the epithet (perhaps after a hybrid sign), or an infraspecific epithet following a rank word.
+            italic[x] = (x == 1 or words[x - 1].lower() in rankWords or (x == 2 and words[1] == '\u00d7')) \
+                and word.lower() not in rankWords
+    formatted = []
+    for x, word in enumerate(words):
+        if italic[x] and (x == 0 or not italic[x - 1]):
+            word = '<i>' + word
+        if italic[x] and (x == len(words) - 1 or not italic[x + 1]):
+            word = word + '</i>'
+        formatted.append(word)
+    return ' '.join(formatted)
+
+
+def formatScientificNames(names):
+    """Label markup for a column of scientific names. The name is italicized
+    except for rank words, authorities and a qualifier,
+    ie: '<i>Acer</i> sp.' or '<i>Quercus alba</i> var. <i>latiloba</i> Sarg.'"""
+
+    names = tidyNames(names)
+    distinctNames = pd.Series(names.unique())
+    qualifier = distinctNames.str.extract(qualifierPattern, expand=False).fillna('')
+    rest = distinctNames.str.replace(qualifierPattern, '', regex=True).str.strip()
+    formatted = rest.map(formatScientificName)
+    formatted = formatted.where(qualifier == '', formatted + ' ' + qualifier)
+    formatted = formatted.where(rest != '', '')
+    formatted.index = distinctNames
+    formatted = formatted.loc[names.values]
+    formatted.index = names.index
+    return formatted
+
+
+def preparedNameFromParts(parts):
+    """Builds prepareNameQuery's tuple from a row of parseScientificNames"""
+
+    if parts['query'] == '':
+        return None
+    sciNameSuffix = ''
+    if parts['qualifier'] != '':
+        sciNameSuffix = ' ' + parts['qualifier']
+    infraSpecificAbbreviation = parts['rank'] if parts['rank'] != '' else None
+    return (parts['query'], sciNameSuffix, infraSpecificAbbreviation)
+
+
+def prepareNameQuery(sciNameAtRow):
+    """Separates qualifiers such as 'sp.' or 'var.' from a scientific name.
+    Returns a tuple of (name to query, suffix to restore, infraspecific
+    abbreviation or None), or None if nothing is left to query."""
+
+    return preparedNameFromParts(parseScientificNames(pd.Series([sciNameAtRow])).iloc[0])
+
+
+def restoreInfraspecificRank(sciName, infraSpecificAbbreviation):
+    """Puts the user's infraspecific abbreviation back before the final word
+    of a looked up name, ie: 'Acer saccharum nigrum' -> 'Acer saccharum var. nigrum'"""
+
+    if infraSpecificAbbreviation is None:
+        return sciName
+    sciName = sciName.split()
+    if len(sciName) > 2:
+        sciName.insert(-1, infraSpecificAbbreviation)
+    return ' '.join(sciName)
+
+
+def genScientificName(self, currentRowArg, resolvedNames=None, parsedNames=None):
     """Generate scientific name calls Catalog of Life to get
-    most up-to-date scientific name for the specimen in question."""
+    most up-to-date scientific name for the specimen in question.
+    resolvedNames is an optional dict of prepared names to colNameSearch
+    results, as returned by batchColNameSearch. parsedNames is an optional
+    parseScientificNames frame for the scientificName column."""
     
     # retrieve a user pref for which database to use for taxonomy.
     # ie: iPlant should probably be first because of the % score feature.
@@ -88,58 +475,53 @@ def genScientificName(self, currentRowArg):
     sciNameColumn = self.findColumnIndex('scientificName')
     authorColumn = self.findColumnIndex('scientificNameAuthorship')
     sciNameAtRow = self.model.getValueAt(currentRow, sciNameColumn)
-    sciNameList = sciNameAtRow.split(' ')
-    sciNameToQuery = sciNameAtRow
     sciAuthorAtRow = str(self.model.getValueAt(currentRow, authorColumn))
-    sciNameSuffix = ''
     if sciNameAtRow != '':
-        exclusionWordList = ['sp.','sp','spp','spp.','ssp','ssp.','var','var.']
-        #this intends to exclude only those instances where the final word is one from the exclusion list.
-        if sciNameList[-1].lower() in exclusionWordList:    #If an excluded word is in scientific name then modify.
-            sciNameToQuery = sciNameList
-            sciNameSuffix = str(' ' + sciNameToQuery[-1])       #store excluded word incase the user only has genus and wants Sp or the like included.
-            sciNameToQuery.pop()
-            if len(sciNameToQuery) < 1:                     #If the name has more than 1 word after excluded word was removed then forget the excluded word.
-                return sciNameAtRow
-            sciNameToQuery = ' '.join(sciNameToQuery)
-        #elif ((len(sciNameList) == 4) & (sciNameList[2].lower() in exclusionWordList)): # handle infraspecific abbreviations by trusting user input.
-        elif len(sciNameList) == 4:
-            if sciNameList[2].lower() in exclusionWordList: # handle infraspecific abbreviations by trusting user input.
-                infraSpecificAbbreviation = sciNameList[2]
-                sciNameList.remove(infraSpecificAbbreviation)
-                sciNameToQuery = ' '.join(sciNameList)
-        results = colNameSearch(sciNameToQuery)
+        if parsedNames is not None:
+            preparedName = preparedNameFromParts(parsedNames.iloc[currentRow])
+        else:
+            preparedName = prepareNameQuery(sciNameAtRow)
+        if preparedName is None:
+            return sciNameAtRow
+        sciNameToQuery, sciNameSuffix, infraSpecificAbbreviation = preparedName
+        # names resolved ahead of time by a batch stage skip the lookup here.
+        if resolvedNames is not None and sciNameToQuery in resolvedNames:
+            results = resolvedNames[sciNameToQuery]
+        else:
+            results = colNameSearch(sciNameToQuery)
         if isinstance(results, tuple):
             if results[0] == 'ERROR':
+                suggestions = suggestNames(sciNameToQuery)
+                if len(suggestions) > 0:
+                    suggestedName = restoreInfraspecificRank(suggestions[0][2], infraSpecificAbbreviation) + sciNameSuffix
+                    otherNames = '\n'.join([x[2] for x in suggestions[1:]])
+                    if otherNames != '':
+                        otherNames = '\n\nOther close names:\n{}'.format(otherNames)
+                    if messagebox.askyesno('Name ERROR at row {}'.format(currentRow+1), 'Name Verification Error at row {}:\nWhen asked about "{}",\nCatalog of Life responded with: "{}."\n\nWould you like to change it to the closest checklist name, {}?{}'.format(currentRow+1,sciNameAtRow,results[1],suggestedName,otherNames)):
+                        return (suggestedName, suggestions[0][3])
+                    return sciNameAtRow
                 messagebox.showinfo('Name ERROR at row {}'.format(currentRow+1), 'Name Verification Error at row {}:\nWhen asked about "{}",\nCatalog of Life responded with: "{}."\nName unverified! (probably a typo)'.format(currentRow+1,sciNameAtRow,results[1]))
                 return sciNameAtRow
 
-            sciName = str(results[0])
+            # sciNameAtRow still carries its suffix, so compare and return like for like.
+            sciName = restoreInfraspecificRank(str(results[0]), infraSpecificAbbreviation) + sciNameSuffix
             auth = str(results[1])
-            try:
-                if isinstance(infraSpecificAbbreviation, str):
-                    sciName = sciName.split()
-                    if len(sciName) > 2:
-                        sciName.insert(-1, infraSpecificAbbreviation)
-                    sciName = ' '.join(sciName)
-            except NameError:
-                pass # if we fail to check infraSpecificAbbreviation, it must not exist. Probably a nicer way to do this.
 
             if sciNameAtRow != sciName:   #If scientific name needs updating, ask. Don't ask about new authority in this case.
                 if messagebox.askyesno('Scientific name at row {}'.format(currentRow+1), 'Would you like to change {} to {} and update the authority?'.format(sciNameAtRow,sciName)):
                     return (sciName, auth)
                 else:
-                    return (sciNameAtRow + sciNameSuffix, sciAuthorAtRow) #if user declines the change return the old stuff.
+                    return (sciNameAtRow, sciAuthorAtRow) #if user declines the change return the old stuff.
 
             elif sciAuthorAtRow == '':  #if author is empty, update it without asking.
-                return (sciNameAtRow + sciNameSuffix, auth)
+                return (sciNameAtRow, auth)
             elif sciAuthorAtRow != auth:  #If only Author needs updating, ask and keep origional scientific name (we've covered if it is wrong already)
                 if messagebox.askyesno('Authority at row {}'.format(currentRow+1), 'Would you like to update the authorship for {} from {} to {}?'.format(sciNameAtRow,sciAuthorAtRow,auth)):
-                    return (sciNameAtRow + sciNameSuffix, auth)
+                    return (sciNameAtRow, auth)
                 else:
-                    return (sciNameAtRow + sciNameSuffix, sciAuthorAtRow) #if user declines the change return the old stuff.
+                    return (sciNameAtRow, sciAuthorAtRow) #if user declines the change return the old stuff.
             else:
-                return (sciNameAtRow + sciNameSuffix, sciAuthorAtRow)
+                return (sciNameAtRow, sciAuthorAtRow)
                 
         elif isinstance(results, str):
      #       if results == 'not_accepted_or_syn':
@@ -158,4 +540,39 @@ def genScientificName(self, currentRowArg):
             self.setSelectedRow(currentRow)
             self.setSelectedCol(sciNameColumn)
             return "user_set_sciname"
-        return sciNameAtRow
\ No newline at end of file
+        return sciNameAtRow
+
+
+def proposeScientificName(self, currentRow, resolvedNames=None, parsedNames=None):
+    """Works out the scientific name and authority for a row without asking
+    the user anything. Returns a dict of column name to proposed value, and
+    a note describing any problem ('' if none)."""
+
+    sciNameAtRow = str(self.model.getValueAt(currentRow, self.findColumnIndex('scientificName')))
+    if sciNameAtRow in ['', 'nan']:
+        return {}, 'Missing scientific name'
+    if parsedNames is not None:
+        preparedName = preparedNameFromParts(parsedNames.iloc[currentRow])
+    else:
+        preparedName = prepareNameQuery(sciNameAtRow)
+    if preparedName is None:
+        return {}, ''
+    sciNameToQuery, sciNameSuffix, infraSpecificAbbreviation = preparedName
+    if resolvedNames is not None and sciNameToQuery in resolvedNames:
+        results = resolvedNames[sciNameToQuery]
+    else:
+        results = safeColNameSearch(sciNameToQuery)
+    if results == 'http_Error':
+        return {}, 'Catalog of Life could not be reached, name unverified'
+    if not isinstance(results, tuple):
+        return {}, ''
+    if results[0] == 'ERROR':
+        suggestions = suggestNames(sciNameToQuery)
+        if len(suggestions) > 0:
+            note = 'Catalog of Life responded with: "{}", using the closest checklist name'.format(results[1])
+            suggestedName = restoreInfraspecificRank(suggestions[0][2], infraSpecificAbbreviation) + sciNameSuffix
+            return {'scientificName': suggestedName, 'scientificNameAuthorship': suggestions[0][3]}, note
+        return {}, 'Catalog of Life responded with: "{}", name unverified'.format(results[1])
+
+    sciName = restoreInfraspecificRank(str(results[0]), infraSpecificAbbreviation)
+    return {'scientificName': sciName + sciNameSuffix, 'scientificNameAuthorship': str(results[1])}, ''
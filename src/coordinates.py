@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# Author
+# License
+import re
+import numpy as np
+import pandas as pd
+
+# one coordinate in decimal degrees (DD), degrees decimal minutes (DDM) or
+# degrees minutes seconds (DMS), with an optional sign and hemisphere letter
+# before or after it. ie: 35.07704, -85.26839, 35° 4.622' N, W85°16'6.2"
+componentPattern = (r'(?<![\d.])(?P<{0}Before>[NSEWnsew])?\s*(?P<{0}Sign>[-+−])?\s*'
+                    r'(?P<{0}Degrees>\d{{1,3}}(?:\.\d+)?)\s*(?:[°º˚d:]|deg)?\s*'
+                    r'(?:(?<![\d.])(?P<{0}Minutes>\d{{1,2}}(?:\.\d+)?)\s*(?:[\'′’:]|min)?\s*'
+                    r'(?:(?<![\d.])(?P<{0}Seconds>\d{{1,2}}(?:\.\d+)?)\s*(?:["″”]|\'\'|sec)?)?)?\s*'
+                    r'(?({0}Before)|(?P<{0}After>[NSEWnsew])?)')
+# a latitude, longitude pair (either order when hemispheres say so). A number
+# is never split across two parts, and each coordinate takes its hemisphere
+# letter before or after it, not both.
+coordinatePattern = re.compile(r'^\s*' + componentPattern.format('first') + r'\s*[,;/]?\s*' +
+                               componentPattern.format('second') + r'\s*$')
+
+
+def componentDegrees(parts, prefix):
+    """Signed decimal degrees and hemisphere letter for one extracted
+    coordinate, and whether its degrees, minutes and seconds are valid."""
+
+    degrees = pd.to_numeric(parts[prefix + 'Degrees'], errors='coerce').values
+    minutes = pd.to_numeric(parts[prefix + 'Minutes'], errors='coerce').values
+    seconds = pd.to_numeric(parts[prefix + 'Seconds'], errors='coerce').values
+    hasMinutes = ~np.isnan(minutes)
+    hasSeconds = ~np.isnan(seconds)
+    # only the last part given may have a fraction, and minutes and seconds stay under 60.
+    valid = ~np.isnan(degrees)
+    valid &= ~hasMinutes | ((np.mod(degrees, 1) == 0) & (minutes < 60))
+    valid &= ~hasSeconds | ((np.mod(minutes, 1) == 0) & (seconds < 60))
+    value = degrees + np.nan_to_num(minutes) / 60 + np.nan_to_num(seconds) / 3600
+    hemisphere = parts[prefix + 'Before'].fillna(parts[prefix + 'After']).fillna('').str.upper().values
+    negative = np.isin(parts[prefix + 'Sign'].fillna('').values, ['-', '−']) | np.isin(hemisphere, ['S', 'W'])
+    return np.where(negative, -value, value), hemisphere, valid
+
+
+def parseVerbatimCoordinates(verbatim):
+    """Decimal latitude and longitude for a Series of verbatim coordinate
+    pairs, parsing each distinct value once. Returns a DataFrame indexed
+    like verbatim with float decimalLatitude and decimalLongitude columns,
+    NaN where a value couldn't be parsed or is out of range."""
+
+    verbatim = verbatim.where(verbatim.notna(), '').astype(str)
+    distinct = pd.Series(verbatim.unique(), dtype=object)
+    parts = distinct.str.extract(coordinatePattern)
+    first, firstHemisphere, firstValid = componentDegrees(parts, 'first')
+    second, secondHemisphere, secondValid = componentDegrees(parts, 'second')
+    # latitude comes first unless the hemispheres say otherwise.
+    swapped = np.isin(firstHemisphere, ['E', 'W']) | np.isin(secondHemisphere, ['N', 'S'])
+    latitudes = np.where(swapped, second, first)
+    longitudes = np.where(swapped, first, second)
+    latitudeHemispheres = np.where(swapped, secondHemisphere, firstHemisphere)
+    longitudeHemispheres = np.where(swapped, firstHemisphere, secondHemisphere)
+    with np.errstate(invalid='ignore'):
+        valid = (firstValid & secondValid & (np.abs(latitudes) <= 90) & (np.abs(longitudes) <= 180) &
+                 np.isin(latitudeHemispheres, ['', 'N', 'S']) & np.isin(longitudeHemispheres, ['', 'E', 'W']))
+    parsed = pd.DataFrame({'decimalLatitude': np.where(valid, latitudes, np.nan),
+                           'decimalLongitude': np.where(valid, longitudes, np.nan)})
+    # broadcast each distinct value's result to every row holding it.
+    positions = pd.Index(distinct).get_indexer(verbatim)
+    parsed = parsed.iloc[positions]
+    parsed.index = verbatim.index
+    return parsed
+
+
+def fillDecimalCoordinates(df, precision=6):
+    """Fill blank decimalLatitude and decimalLongitude from verbatimCoordinates,
+    for a whole table at once. Returns a boolean Series marking the rows whose
+    verbatim coordinates could not be parsed."""
+
+    unparsed = pd.Series(False, index=df.index)
+    if 'verbatimCoordinates' not in df.columns:
+        return unparsed
+    verbatim = df['verbatimCoordinates'].where(df['verbatimCoordinates'].notna(), '').astype(str).str.strip()
+    decimalColumns = ['decimalLatitude', 'decimalLongitude']
+    blank = pd.Series(True, index=df.index)
+    for column in decimalColumns:
+        if column in df.columns:
+            values = df[column].where(df[column].notna(), '').astype(str)
+            blank &= values.isin(['', 'nan'])
+        else:
+            df[column] = ''
+    toParse = blank & (verbatim != '')
+    if not toParse.any():
+        return unparsed
+    parsed = parseVerbatimCoordinates(verbatim[toParse])
+    resolved = parsed['decimalLatitude'].notna()
+    unparsed[parsed.index[~resolved]] = True
+    for column in decimalColumns:
+        if df[column].dtype.kind in 'biufc':
+            df[column] = df[column].astype(object)
+        values = parsed.loc[resolved, column].round(precision)
+        df.loc[values.index, column] = values.astype(str).values
+    return unparsed
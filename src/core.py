@@ -46,7 +46,12 @@ import images, util
 from dialogs import *
 # pd added imports
 from catalogOfLife import *
+import localChecklist
 from locality import *
+from geographyAudit import findGeographyConflicts
+from elevation import proposeElevations, setDemDirectory, setElevationTolerance
+from undoJournal import UndoJournal, FrameReplaced, setUndoMemoryLimit
+from coordinates import fillDecimalCoordinates
 from printLabels import *
 import webbrowser
 
@@ -131,7 +136,8 @@ class Table(Canvas):
                               'number' : {"Edit": 'drawCellEntry' }}
         self.setFontSize()
         self.importpath = None
-        self.prevdf = None
+        self.journal = UndoJournal()
+        self.model.journal = self.journal
 
         # List of Initial Column order
         self.column_order = [
@@ -197,9 +203,12 @@ class Table(Canvas):
         self.multipleselectioncolor = '#E0F2F7'
         self.boxoutlinecolor = '#084B8A'
         self.colselectedcolor = '#e4e3e4'
+        #cells whose geography disagrees with their coordinates
+        self.auditColor = '#f7c6c5'
         self.floatprecision = 0
         self.columncolors = {}
         self.rowcolors = pd.DataFrame()
+        self.textWidths = {} #measured canvas width of a run of characters, by (length, font)
         self.bg = Style().lookup('TLabel.label', 'background')
         #Collection data entry bar defaults
         self.collName = ''
@@ -212,6 +221,28 @@ class Table(Canvas):
         #Student Collection entry bar defaults
         self.stuCollVerifyBy = ''
         self.stuCollCheckBox = 0
+        #Offline taxonomy defaults
+        self.localChecklistPath = ''
+        #Taxonomy providers, in order of preference
+        self.taxonomyProviders = 'Local checklist, CoL'
+        self.taxonomyMode = 'first'
+        #Decimal places coordinates are rounded to when caching geocode results
+        self.geocodePrecision = 4
+        #Google geocoding rate limits, a daily quota of 0 is unlimited
+        self.geocodeQPS = 40
+        self.geocodeDailyQuota = 2500
+        #Meters within which geocoded points are reused, for rows without a coordinate uncertainty
+        self.geocodeReuseRadius = 100
+        #geocoding services asked in order, and their settings
+        self.geocoderBackends = 'Google, Self-hosted, Offline boundaries'
+        #no key by default, Google isn't asked until the user provides one
+        self.googleApiKey = ''
+        self.selfHostedGeocoderUrl = ''
+        #folder of .hgt elevation tiles, and meters an entered elevation may differ from them
+        self.demDirectory = ''
+        self.elevationTolerance = 100
+        #megabytes of undo history kept in memory before older steps go to disk
+        self.undoMemoryLimit = 200
         return
 
     def setFontSize(self):
@@ -262,6 +293,7 @@ class Table(Canvas):
         self.bind("<Delete>", self.clearData)
         self.bind("<Control-v>", self.paste)
         self.bind("<Control-z>", self.undo)
+        self.bind("<Control-y>", self.redo)
         self.bind("<Control-a>", self.selectAll)
 
         self.bind("<Right>", self.handle_arrow_keys)
@@ -313,7 +345,7 @@ class Table(Canvas):
             self.toolbar.grid(row=0,column=0,columnspan=3,sticky='ew')
         if self.showstatusbar == True:
             self.statusbar = statusBar(self.parentframe, self)
-            self.statusbar.grid(row=3,column=0,columnspan=3,sticky='ew')
+            self.statusbar.grid(row=7,column=0,columnspan=3,sticky='ew')
 
         self.collectiondataentrybar = CollectionDataEntryBar(self.parentframe,self)
         self.collectiondataentrybar.grid(row=1, column=0, columnspan=3, sticky='we')
@@ -601,7 +633,7 @@ class Table(Canvas):
         rc = self.rowcolors
         if col not in rc.columns:
             rc[col] = pd.Series()
-        rc[col] = rc[col].where(-mask, clr)
+        rc[col] = rc[col].where(~mask, clr)
         #print (rc)
         return
 
@@ -617,7 +649,7 @@ class Table(Canvas):
         for col in self.visiblecols:
             colname = df.columns[col]
             if colname in list(rc.columns):
-                colors = rc[colname].ix[idx]
+                colors = rc[colname].loc[idx]
                 for row in rows:
                     clr = colors.iloc[row-offset]
                     if not pd.isnull(clr):
@@ -684,16 +716,21 @@ class Table(Canvas):
         scale = 10.5 * float(fontsize)/9
         return scale
 
-    def adjustColumnWidths(self):
+    def adjustColumnWidths(self, cols=None):
         """Optimally adjust col widths to accomodate the longest entry
-            in each column - usually only called on first redraw"""
+            in each column - called for every column when a table is shown,
+            and with only the columns written after an edit (cols).
+            Entry lengths are kept by the model as cells change, and text
+            widths measured once per length."""
 
         try:
             fontsize = self.thefont[1]
         except:
             fontsize = self.fontsize
         scale = self.getScale()
-        for col in range(self.cols):
+        if cols is None:
+            cols = range(self.cols)
+        for col in cols:
             colname = self.model.getColumnName(col)
             if colname == 'site#':
                 #l = 4
@@ -712,9 +749,12 @@ class Table(Canvas):
                 l = self.model.getlongestEntry(col)
                 if l < 5:
                     l = 5
-            txt = ''.join(['X' for i in range(l+1)])
-            tw,tl = util.getTextLength(txt, self.maxcellwidth,
-                                       font=self.thefont)
+            key = (l, self.thefont)
+            if key not in self.textWidths:
+                txt = ''.join(['X' for i in range(l+1)])
+                self.textWidths[key] = util.getTextLength(txt, self.maxcellwidth,
+                                                          font=self.thefont)
+            tw,tl = self.textWidths[key]
             #print (col,txt,l,tw)
             if colname not in ['site#','-','specimen#']:
                 if tw >= self.maxcellwidth:
@@ -724,6 +764,22 @@ class Table(Canvas):
             self.model.columnwidths[colname] = tw
         return
 
+    def updateCells(self, cells):
+        """Write a sequence of (row, column, value) tuples through the model,
+        refitting only the widths of the columns written"""
+
+        self.model.updateCells(cells)
+        self.adjustColumnWidths(sorted(set(x[1] for x in cells)))
+        return
+
+    def updateColumns(self, columns):
+        """Write a dict of column name to a Series of values indexed by row
+        through the model, refitting only the widths of those columns"""
+
+        self.model.updateColumns(columns)
+        self.adjustColumnWidths([self.model.df.columns.get_loc(x) for x in columns])
+        return
+
     def autoResizeColumns(self):
         """Automatically set nice column widths and draw"""
 
@@ -754,27 +810,11 @@ class Table(Canvas):
             columnIndex = [columnIndex]
         #assert len(columnIndex) < len(df.columns)
         if index == True:
-            df.sort_index(inplace=True)
+            self.storeCurrent()
+            self.model.sortedBy = None
+            self.model.reorderRows(df.index.argsort())
         else:
-            colnames = list(df.columns[columnIndex])
-            try:
-                df.sort_values(by=colnames, inplace=True, ascending=ascending)
-                
-            except TypeError:                   #If mixed int/str column probably result of filling NaN with ''
-                def tempConvertForSort(v):      #Handle it by creating temp columns and fill '' with negative values which to sort by
-                    if v == '':
-                        return int(-9999)
-                    else:
-                        return v                    
-                tempColNames = []
-                for colName in colnames:
-                    df['tempSort_{}'.format(colName)] = df[colName].apply(lambda x: tempConvertForSort(x))
-                    tempColNames.append('tempSort_{}'.format(colName))
-                df.sort_values(by=tempColNames, inplace=True, ascending= True)
-                df.drop(tempColNames, axis = 1, inplace = True)     #Drop temporary helper columns
-                       
-            except Exception as e:
-                       print('core.py error in function "sortTable", error: {}'.format(e))
+            self.model.sortRows(list(df.columns[columnIndex]), ascending=ascending)
                 
         self.redraw()
         return
@@ -900,63 +940,65 @@ class Table(Canvas):
             siteData['identifiedBy'] = d.results[1]
 
         oldOtherSiteNum = siteData.get('site#')
-        siteData.pop('specimen#', None)
-        specimenNumbers = self.model.df['specimen#'].tolist()
-        try:
-            nextSpecimenNumber = max([int(y) for y in[x for x in specimenNumbers if isinstance(x, int)]]) + 1
-        except ValueError:
+        specimenNumbers = pd.to_numeric(self.model.df['specimen#'], errors='coerce')
+        if specimenNumbers.notna().any():
+            nextSpecimenNumber = int(specimenNumbers.max()) + 1
+        else:
             nextSpecimenNumber = 1
         newOtherCatNumber = str(oldOtherSiteNum) + '-' + str(nextSpecimenNumber)
         siteData['otherCatalogNumbers'] = newOtherCatNumber
-        df = self.model.df
-        a, b = df[:row], df[row:]
-        a = a.append(siteData, ignore_index=True)
-        self.model.df = pd.concat([a,b], ignore_index=True)
-        self.model.resetIndex()
-        self.refreshSpecimenSiteNums(self.model.df)
-        self.sortTable([self.model.df.columns.get_loc('site#'),self.model.df.columns.get_loc('specimen#')])
+        siteData['specimen#'] = nextSpecimenNumber
+        self.insertSiteOrdered(siteData, row)
         self.setSelectedRow(row)
         self.redraw()
         return
 
     def addSite(self):
-        """Inserts a "Site" row at the required index by append/concat"""
+        """Inserts a new "Site" row, numbered after the highest site, in site order"""
 
         self.storeCurrent()
         rowindex = self.getSelectedRow()
-        a, b = self.model.df[:rowindex], self.model.df[rowindex:]
-        
-        def siteNumExtract(catNum):
-            """ input a field number formatted as "siteNumber-SpecimenNumber" (ie: 04-124)
-            In the case of site only data, use "siteNumber-#" (ie: 05-#) returns the first "site number" value.
-            Using this method instead of calling defined function in core.py for simplicity.
-            There may be a cleaner way to do this."""
-    
-            try:
-                result = catNum.split('-')[0]
-                if result.isdigit():
-                    return int(result)
-                else:
-                    return 0
-            except: #an open exception catcher may be unwise.
-                return 0
-        maxSiteNum = max(self.model.df['otherCatalogNumbers'].apply(lambda x: siteNumExtract(x)))
-        newSiteData = {'otherCatalogNumbers':'{}-#'.format(maxSiteNum + 1), '-':'-'}
-        a = a.append(pd.Series(newSiteData), ignore_index=1)
-        self.model.df = pd.concat([a,b])
-        self.refreshSpecimenSiteNums(self.model.df)
-        self.sortTable([self.model.df.columns.get_loc('site#'),self.model.df.columns.get_loc('specimen#')])
-        self.model.resetIndex()
-        self.setSelectedRow(self.model.df.shape[0] - 1)
+        # field numbers are formatted as "siteNumber-SpecimenNumber" (ie: 04-124), or "siteNumber-#" for sites.
+        siteNumbers = self.model.df['otherCatalogNumbers'].astype(object).astype(str).str.extract(r'^(\d+)(?:-|$)')[0]
+        maxSiteNum = int(pd.to_numeric(siteNumbers, errors='coerce').fillna(0).max()) if len(siteNumbers) > 0 else 0
+        newSiteData = {'otherCatalogNumbers':'{}-#'.format(maxSiteNum + 1), '-':'-',
+                       'site#':maxSiteNum + 1, 'specimen#':'!AddSITE'}
+        row = self.insertSiteOrdered(newSiteData, rowindex)
+        if row is None:
+            row = self.model.df.shape[0] - 1
+        self.setSelectedRow(row)
         self.drawSelectedRow()
         self.movetoSelectedRow(self.getSelectedRow())
         self.redraw()
         return
 
+    def insertSiteOrdered(self, rowData, row):
+        """Insert a record (dict holding its site# and specimen#) where it
+        belongs among the records sorted by site# and specimen#, found by
+        binary search rather than sorting the table again. A table in
+        another order is inserted at row, then refreshed and sorted as
+        before. Returns the position of the new record, None when the table
+        was sorted."""
+
+        colnames = ['site#', 'specimen#']
+        position = None
+        if all(x in self.model.df.columns for x in colnames):
+            position = self.model.sortedPosition(colnames, [rowData[x] for x in colnames])
+        if position is not None:
+            self.model.insertRows([rowData], position)
+            return position
+        self.model.insertRows([rowData], row)
+        self.refreshSpecimenSiteNums(self.model.df)
+        # the sort is part of adding the record, not an undo step of its own.
+        self.model.sortRows(colnames, newStep=False)
+        self.redraw()
+        return None
+
     def addRow(self):
         """Insert a new row"""
 
         row = self.getSelectedRow()
+        self.storeCurrent()
         key = self.model.addRow(row)
         self.redraw()
         return
@@ -1057,20 +1099,27 @@ class Table(Canvas):
         return
 
     def storeCurrent(self):
-        """Store current version of the table before a major change is made"""
+        """Mark the start of a major change, so it can be undone as one step.
+        The model records the inverse of each edit it makes in the journal,
+        rather than the table being copied."""
 
-        self.prevdf = self.model.df.copy()
+        self.journal.begin()
         return
 
     def undo(self, event=None):
         """Undo last major table change"""
 
-        if self.prevdf is None:
+        if not self.journal.undo(self.model):
+            return
+        self.redraw()
+        return
+
+    def redo(self, event=None):
+        """Redo the last undone change"""
+
+        if not self.journal.redo(self.model):
             return
-        self.model.df = self.prevdf
         self.redraw()
-        self.prevdf = None
-        self.storeCurrent()
         return
 
     def deleteCells(self, rows, cols, answer=None):
@@ -1141,7 +1190,7 @@ class Table(Canvas):
             return
         t = d.results[0]
         try:
-            self.model.df[col] = df[col].astype(t)
+            self.model.addColumn(col, data=df[col].astype(t))
             self.redraw()
         except:
             print('failed')
@@ -1183,7 +1232,7 @@ class Table(Canvas):
         if method == '':
             pass
         elif method == 'fill scalar':
-            df = df.fillna(symbol)
+            df = df.astype({x: object for x in df.columns if isinstance(df[x].dtype, pd.CategoricalDtype)}).fillna(symbol)
         elif method == 'interpolate':
             df = df.interpolate()
         else:
@@ -1342,10 +1391,10 @@ class Table(Canvas):
         if len(cols) == 1 and temp.dtype == 'datetime64[ns]':
             if newname == '':
                 colname = prop
-            df[colname] = getattr(temp.dt, prop)
+            self.model.addColumn(colname, data=getattr(temp.dt, prop))
         else:
             try:
-                df[colname] = pd.to_datetime(temp, format=fmt, errors='coerce')
+                self.model.addColumn(colname, data=pd.to_datetime(temp, format=fmt, errors='coerce'))
             except Exception as e:
                 messagebox.showwarning("Convert error", e,
                                         parent=self.parentframe)
@@ -1448,8 +1497,9 @@ class Table(Canvas):
         if n == '':
             return
         #evaluate
+        self.storeCurrent()
         try:
-            df[n] = self._eval(df, ex)
+            self.model.addColumn(n, data=self._eval(df, ex))
             self.functionentry.configure(style="White.TCombobox")
         except Exception as e:
             print ('function parse error')
@@ -1481,7 +1531,7 @@ class Table(Canvas):
             ex = self.formulae[n]
             #need to check if self calculation here...
             try:
-                df[n] = self._eval(df, ex)
+                self.model.addColumn(n, data=self._eval(df, ex))
             except:
                 print('could not calculate %s' %ex)
         self.redraw()
@@ -1945,11 +1995,12 @@ class Table(Canvas):
         for elem in dfList:
             copiedValue = copiedValue + str(elem) + ' '
         if isinstance(row, list):
-            self.model.setValueAt(copiedValue,row[0],column[0])
+            row, column = row[0], column[0]
         else:
             row = self.getSelectedRow()
             column = self.getSelectedColumn()
-            self.model.setValueAt(copiedValue,row,column)
+        self.model.setValueAt(copiedValue,row,column)
+        self.adjustColumnWidths([column])
         self.redraw()
         return
 
@@ -2141,7 +2192,6 @@ class Table(Canvas):
         self.childframe = win
         newtable = self.__class__(win, dataframe=df, showtoolbar=0, showstatusbar=1)
         newtable.parenttable = self
-        newtable.adjustColumnWidths()
         newtable.show()
         toolbar = ChildToolBar(win, newtable)
         toolbar.grid(row=0,column=3,rowspan=2,sticky='news')
@@ -2253,6 +2303,7 @@ class Table(Canvas):
         defaultactions = {
                         "Copy" : lambda: self.copy(rows, cols),
                         "Undo" : lambda: self.undo(event),
+                        "Redo" : lambda: self.redo(event),
                         "Paste" : lambda: self.paste(rows, cols),
                         "Fill Down" : lambda: self.fillDown(rows, cols), # could potentially be removed
                         "Fill Right" : lambda: self.fillAcross(cols, rows), # could potentially be removed
@@ -2279,7 +2330,7 @@ class Table(Canvas):
                         "Clean Data" : self.cleanData, # could potentially be removed
                         "Clear Formatting" : self.clearFormatting} # could potentially be removed
 
-        main = ["Copy", "Paste", "Undo", "Clear Data"]
+        main = ["Copy", "Paste", "Undo", "Redo", "Clear Data"]
         general = ["Select All", "Preferences"]
 
         filecommands = ['New','Import csv','Save','Save as']
@@ -2317,7 +2368,9 @@ class Table(Canvas):
                         continue
                     if action == 'Fill Right' and (cols == None or len(cols) <= 1):
                         continue
-                    if action == 'Undo' and self.prevdf is None:
+                    if action == 'Undo' and not self.journal.canUndo():
+                        continue
+                    if action == 'Redo' and not self.journal.canRedo():
                         continue
                     else:
                         popupmenu.add_command(label=action, command=defaultactions[action])
@@ -2349,7 +2402,7 @@ class Table(Canvas):
         val = df.iloc[rowlist[0],collist[0]]
         #remove first element as we don't want to overwrite it
         rowlist.remove(rowlist[0])
-        df.iloc[rowlist,collist] = val
+        self.updateCells([(row, col, val) for row in rowlist for col in collist])
         self.redraw()
         return
 
@@ -2420,7 +2473,7 @@ class Table(Canvas):
         except Exception as e:
             print ('error indexing data')
             return pd.DataFrame()
-        data = data.fillna(' ')
+        data = data.astype(object).fillna(' ') # categorical columns (see compactStorage) can't take a new fill value.
         data = data.to_dict(orient = 'records')
         labelDicts = []
         for datum in data:
@@ -2525,6 +2578,7 @@ class Table(Canvas):
 
         value = self.cellentryvar.get()
         self.model.setValueAt(value,row,col)
+        self.adjustColumnWidths([col])
         self.drawText(row, col, value, align=self.align)
         self.delete('entry')
         self.gotonextCell()
@@ -2885,6 +2939,75 @@ class Table(Canvas):
         rowselectedcolorbutton.grid(row=row,column=0,columnspan=2, sticky='news')
         row=row+1
 
+        #taxonomy providers
+        lbl=Label(frame2,text='Name sources:')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        providersentry = Entry(frame2, textvariable=self.taxonomyProvidersVar, width=28)
+        providersentry.grid(row=row,column=1, sticky='nes', padx=3,pady=2)
+        ToolTip.createToolTip(providersentry,"Comma separated, most preferred first: Local checklist, CoL, CoL json")
+        row=row+1
+        lbl=Label(frame2,text='Use answer:')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        modeentry = Combobox(frame2, values=['first','preference'],
+                              textvariable=self.taxonomyModeVar)
+        modeentry.grid(row=row,column=1, sticky='nes', padx=3,pady=2)
+        row=row+1
+        lbl=Label(frame2,text='Geocoders:')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        backendsentry = Entry(frame2, textvariable=self.geocoderBackendsVar, width=28)
+        backendsentry.grid(row=row,column=1, sticky='nes', padx=3,pady=2)
+        ToolTip.createToolTip(backendsentry,"Comma separated, most preferred first: Google, Self-hosted, Offline boundaries")
+        row=row+1
+        lbl=Label(frame2,text='Google API key:')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        apikeyentry = Entry(frame2, textvariable=self.googleApiKeyVar, width=28)
+        apikeyentry.grid(row=row,column=1, sticky='nes', padx=3,pady=2)
+        ToolTip.createToolTip(apikeyentry,"Your Google Maps API key, the Google geocoder is skipped without one")
+        row=row+1
+        lbl=Label(frame2,text='Self-hosted geocoder:')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        geocoderurlentry = Entry(frame2, textvariable=self.selfHostedGeocoderUrlVar, width=28)
+        geocoderurlentry.grid(row=row,column=1, sticky='nes', padx=3,pady=2)
+        ToolTip.createToolTip(geocoderurlentry,"Base url of a Nominatim or Photon server, ie: http://geocoder.local:8080")
+        row=row+1
+        lbl=Label(frame2,text='Geocode cache decimals:')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        geoprecisionentry = Scale(frame2,from_=2,to=6,resolution=1,orient='horizontal',
+                                variable=self.geocodePrecisionVar)
+        geoprecisionentry.configure(fg='black', bg=self.bg)
+        geoprecisionentry.grid(row=row,column=1, sticky='wens',padx=3,pady=2)
+        ToolTip.createToolTip(geoprecisionentry,"Coordinates within this many decimal places share a cached address")
+        row=row+1
+        lbl=Label(frame2,text='Geocode requests/sec:')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        qpsentry = Entry(frame2, textvariable=self.geocodeQPSVar, width=10)
+        qpsentry.grid(row=row,column=1, sticky='nes', padx=3,pady=2)
+        row=row+1
+        lbl=Label(frame2,text='Geocode requests/day:')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        quotaentry = Entry(frame2, textvariable=self.geocodeDailyQuotaVar, width=10)
+        quotaentry.grid(row=row,column=1, sticky='nes', padx=3,pady=2)
+        ToolTip.createToolTip(quotaentry,"0 for no daily limit")
+        row=row+1
+        lbl=Label(frame2,text='Geocode reuse radius (m):')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        radiusentry = Entry(frame2, textvariable=self.geocodeReuseRadiusVar, width=10)
+        radiusentry.grid(row=row,column=1, sticky='nes', padx=3,pady=2)
+        ToolTip.createToolTip(radiusentry,"Records without a coordinate uncertainty reuse addresses found this close")
+        row=row+1
+        lbl=Label(frame2,text='Elevation tolerance (m):')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        toleranceentry = Entry(frame2, textvariable=self.elevationToleranceVar, width=10)
+        toleranceentry.grid(row=row,column=1, sticky='nes', padx=3,pady=2)
+        ToolTip.createToolTip(toleranceentry,"Entered elevations further than this from the elevation tiles are flagged")
+        row=row+1
+        lbl=Label(frame2,text='Undo memory (MB):')
+        lbl.grid(row=row,column=0,padx=3,pady=2)
+        undoentry = Entry(frame2, textvariable=self.undoMemoryLimitVar, width=10)
+        undoentry.grid(row=row,column=1, sticky='nes', padx=3,pady=2)
+        ToolTip.createToolTip(undoentry,"Undo history beyond this is kept in temporary files")
+        row=row+1
+
         frame=Frame(self.prefswindow)
         frame.pack(fill=BOTH,expand=1)
         # Apply Button
@@ -2934,7 +3057,21 @@ class Table(Canvas):
                         'catStart':self.catStart,
                         #student collection status stuff
                         'stuCollVerifyBy': self.stuCollVerifyBy,
-                        'stuCollCheckBox': self.stuCollCheckBox
+                        'stuCollCheckBox': self.stuCollCheckBox,
+                        #offline taxonomy
+                        'localChecklistPath': self.localChecklistPath,
+                        'taxonomyProviders': self.taxonomyProviders,
+                        'taxonomyMode': self.taxonomyMode,
+                        'geocodePrecision': self.geocodePrecision,
+                        'geocodeQPS': self.geocodeQPS,
+                        'geocodeDailyQuota': self.geocodeDailyQuota,
+                        'geocodeReuseRadius': self.geocodeReuseRadius,
+                        'geocoderBackends': self.geocoderBackends,
+                        'googleApiKey': self.googleApiKey,
+                        'selfHostedGeocoderUrl': self.selfHostedGeocoderUrl,
+                        'demDirectory': self.demDirectory,
+                        'elevationTolerance': self.elevationTolerance,
+                        'undoMemoryLimit': self.undoMemoryLimit
                         }
      
 
@@ -3002,6 +3139,44 @@ class Table(Canvas):
         # TODO organize this catNumberBar with other preferences in a more coherent maner.
         CatNumberBar.stuCollCheckBoxVar = IntVar()
         CatNumberBar.stuCollCheckBoxVar.set(self.prefs.get('stuCollCheckBox'))
+
+        #local checklist index for offline name lookups
+        setLocalChecklist(self.prefs.get('localChecklistPath'))
+        #taxonomy providers
+        self.taxonomyProvidersVar = StringVar()
+        self.taxonomyProvidersVar.set(self.prefs.get('taxonomyProviders'))
+        self.taxonomyModeVar = StringVar()
+        self.taxonomyModeVar.set(self.prefs.get('taxonomyMode'))
+        setTaxonomyProviders(self.prefs.get('taxonomyProviders'), self.prefs.get('taxonomyMode'))
+        #geocode cache grid
+        self.geocodePrecisionVar = IntVar()
+        self.geocodePrecisionVar.set(self.prefs.get('geocodePrecision'))
+        setGeocodePrecision(self.prefs.get('geocodePrecision'))
+        #geocode rate limits
+        self.geocodeQPSVar = StringVar()
+        self.geocodeQPSVar.set(self.prefs.get('geocodeQPS'))
+        self.geocodeDailyQuotaVar = StringVar()
+        self.geocodeDailyQuotaVar.set(self.prefs.get('geocodeDailyQuota'))
+        setGeocodeRateLimits(self.prefs.get('geocodeQPS'), self.prefs.get('geocodeDailyQuota'))
+        self.geocodeReuseRadiusVar = StringVar()
+        self.geocodeReuseRadiusVar.set(self.prefs.get('geocodeReuseRadius'))
+        setGeocodeReuseRadius(self.prefs.get('geocodeReuseRadius'))
+        #geocoder backends
+        self.geocoderBackendsVar = StringVar()
+        self.geocoderBackendsVar.set(self.prefs.get('geocoderBackends'))
+        self.googleApiKeyVar = StringVar()
+        self.googleApiKeyVar.set(self.prefs.get('googleApiKey'))
+        self.selfHostedGeocoderUrlVar = StringVar()
+        self.selfHostedGeocoderUrlVar.set(self.prefs.get('selfHostedGeocoderUrl'))
+        setGeocoderBackends(self.prefs.get('geocoderBackends'), self.prefs.get('googleApiKey'), self.prefs.get('selfHostedGeocoderUrl'))
+        #elevation tiles
+        setDemDirectory(self.prefs.get('demDirectory'))
+        self.elevationToleranceVar = StringVar()
+        self.elevationToleranceVar.set(self.prefs.get('elevationTolerance'))
+        setElevationTolerance(self.prefs.get('elevationTolerance'))
+        self.undoMemoryLimitVar = StringVar()
+        self.undoMemoryLimitVar.set(self.prefs.get('undoMemoryLimit'))
+        setUndoMemoryLimit(self.prefs.get('undoMemoryLimit'))
         return
 
     def savePrefs(self):
@@ -3033,6 +3208,24 @@ class Table(Canvas):
             self.rowheaderwidth = self.rowheaderwidthvar.get()
             # self.thefont = (self.prefs.get('celltextfont'), self.prefs.get('celltextsize'))
             self.fontsize = self.prefs.get('celltextsize')
+            self.prefs.set('taxonomyProviders', self.taxonomyProvidersVar.get())
+            self.prefs.set('taxonomyMode', self.taxonomyModeVar.get())
+            setTaxonomyProviders(self.taxonomyProvidersVar.get(), self.taxonomyModeVar.get())
+            self.prefs.set('geocodePrecision', self.geocodePrecisionVar.get())
+            setGeocodePrecision(self.geocodePrecisionVar.get())
+            setGeocodeRateLimits(self.geocodeQPSVar.get(), self.geocodeDailyQuotaVar.get())
+            self.prefs.set('geocodeQPS', float(self.geocodeQPSVar.get()))
+            self.prefs.set('geocodeDailyQuota', int(self.geocodeDailyQuotaVar.get()))
+            self.prefs.set('geocoderBackends', self.geocoderBackendsVar.get())
+            self.prefs.set('googleApiKey', self.googleApiKeyVar.get())
+            self.prefs.set('selfHostedGeocoderUrl', self.selfHostedGeocoderUrlVar.get())
+            setGeocoderBackends(self.geocoderBackendsVar.get(), self.googleApiKeyVar.get(), self.selfHostedGeocoderUrlVar.get())
+            setGeocodeReuseRadius(self.geocodeReuseRadiusVar.get())
+            self.prefs.set('geocodeReuseRadius', float(self.geocodeReuseRadiusVar.get()))
+            setElevationTolerance(self.elevationToleranceVar.get())
+            self.prefs.set('elevationTolerance', float(self.elevationToleranceVar.get()))
+            setUndoMemoryLimit(self.undoMemoryLimitVar.get())
+            self.prefs.set('undoMemoryLimit', float(self.undoMemoryLimitVar.get()))
         except ValueError as e:
             print('prefs error: ', e)
             pass
@@ -3077,6 +3270,10 @@ class Table(Canvas):
            Recreates widgets and redraws the table."""
     
         if model is not None:
+            if model is not self.model:
+                model.journal = self.journal
+                # a replaced table is undone by putting its frame back
+                self.journal.record(FrameReplaced(self.model.df))
             self.model = model
         self.rows = self.model.getRowCount()
         self.cols = self.model.getColumnCount()
@@ -3150,10 +3347,10 @@ class Table(Canvas):
         model = TableModel(dataframe=newDF)
         self.updateModel(model)
         self.sortTable([self.model.df.columns.get_loc('site#'),self.model.df.columns.get_loc('specimen#')])
-        self.adjustColumnWidths()
         #this solves addressing errors related to index at row 1 = 1 on import, and various functions later properly reset the index to 0
         self.model.resetIndex()
         self.rowcolors = pd.DataFrame()
+        self.journal.clear()
         self.redraw()
         self.setSelectedRow(0)
         self.drawSelectedRow()
@@ -3170,13 +3367,13 @@ class Table(Canvas):
         to update the given scientific name as well as fill locality
         fields from GPS coordinates."""
 
+        self.storeCurrent()
         localityColumn = self.findColumnIndex('locality')
         catalogNumColumn = self.findColumnIndex('otherCatalogNumbers')
         recordedByColumn = self.findColumnIndex('recordedBy')
         assCollectorColumn = self.findColumnIndex('associatedCollectors')
         scientNameColumn = self.findColumnIndex('scientificName')
         authorshipColumn = self.findColumnIndex('scientificNameAuthorship')
-        assocTaxaColumn = self.findColumnIndex('associatedTaxa')
         associatedTaxa = []
         # an indication of record processing
         self.parentframe.master.title("PD-Desktop (Processing Records...)")
@@ -3188,7 +3385,27 @@ class Table(Canvas):
         pb_Label.grid(row=5, column=1, columnspan = 3, pady=1, ipady=1)
         progBar["maximum"] = len(rows)
         progBar["value"] = 0
-        
+
+        # resolve each distinct scientific name once, concurrently, before walking the rows.
+        pb_Label.configure(text='Resolving names...')
+        progBar.update_idletasks()
+        parsedNames, resolvedNames = self.resolveNames(rows)
+        # geocode each distinct site location once, and fill its specimens in one write.
+        pb_Label.configure(text='Locating sites...')
+        progBar.update_idletasks()
+        siteLocalities = proposeSiteLocalities(self, self.specimenRows(rows))
+        self.writeSiteLocalities(siteLocalities)
+        failedLocations = siteLocalities[siteLocalities['status'] != '']
+        if len(failedLocations) > 0:
+            messagebox.showinfo('Location lookup error', 'Location lookup failed for {} records:\nThe geocoding service responded with: "{}"\nThis may be internet connection problems, or invalid GPS values. Their localities will be built from existing fields.'.format(len(failedLocations), '", "'.join(failedLocations['status'].unique())))
+        # localities from existing fields, for any record the geocoder can't place.
+        unlocatedRows = [x for x in self.specimenRows(rows) if x not in siteLocalities.index or x in failedLocations.index]
+        offlineLocalities, missingGeography = buildLocalitiesNoAPI(self, unlocatedRows)
+        limitedRows = []
+        pb_Label.configure(text='Processing Records...')
+        # cell changes are collected as (row, column, value) and written together once the rows are walked.
+        updates = []
+
         for n, currentRow in enumerate(rows):
             try:
                 if self.model.getValueAt(currentRow, self.findColumnIndex('specimen#')) in ['#','!AddSITE']:
@@ -3199,65 +3416,358 @@ class Table(Canvas):
                 recordedBy = self.model.getValueAt(currentRow, recordedByColumn)
                 #use all uppercase names to check for duplicates.
                 associatedCollectors = ', '.join([x.strip() for x in associatedCollectors if x.strip().upper() != recordedBy.strip().upper()])
-                self.model.setValueAt(associatedCollectors, currentRow, assCollectorColumn)
-                resultLocality = genLocality(self, currentRow)
+                updates.append((currentRow, assCollectorColumn, associatedCollectors))
+                if currentRow in failedLocations.index:
+                    resultLocality = "loc_apierr_no_retry"
+                elif currentRow in siteLocalities.index:
+                    resultLocality = siteLocalities.loc[currentRow, 'locality']
+                else:
+                    resultLocality = genLocality(self, currentRow)
                 # missing gps coordinates
                 if resultLocality in ["loc_error_no_gps","loc_apierr_no_retry"]:
-                    #if fails to generate locality from GPS coords, try with local fields
-                    # TODO This could probably use a try except block for whatever imaginable errors?
-                    resultLocality = genLocalityNoAPI(self, currentRow)
-                    self.model.setValueAt(resultLocality, currentRow, localityColumn)
+                    #if fails to generate locality from GPS coords, use the one built from local fields
+                    updates.append((currentRow, localityColumn, offlineLocalities[currentRow]))
+                    limitedRows.append(currentRow)
                 # TODO change this to a pop up dialog box OR at least select it before returning
                 elif resultLocality == "user_set_gps":
+                    self.updateCells(updates)
                     self.parentframe.master.title("PD-Desktop")
                     self.redraw()
                     return
                 else:
-                    self.model.setValueAt(resultLocality, currentRow, localityColumn)
+                    updates.append((currentRow, localityColumn, resultLocality))
                 catNum = self.model.getValueAt(currentRow, catalogNumColumn)
-                resSci = genScientificName(self, currentRow)
+                resSci = genScientificName(self, currentRow, resolvedNames, parsedNames)
                 # missing scientific name
                 # TODO change this to a pop up dialog box OR at least select it before returning
                 if resSci == "user_set_sciname":
+                    self.updateCells(updates)
                     self.parentframe.master.title("PD-Desktop")
                     self.redraw()
                     return
                 else:
                     if isinstance(resSci, tuple):
-                        self.model.setValueAt(resSci[0], currentRow, scientNameColumn)
+                        updates.append((currentRow, scientNameColumn, resSci[0]))
                         # getting more weird authorship return values? add them here!
                         if resSci[1] != 'None':
-                            self.model.setValueAt(resSci[1], currentRow, authorshipColumn)
+                            updates.append((currentRow, authorshipColumn, resSci[1]))
                         associatedTaxa.append([currentRow, catNum, resSci[0]])
                     else:
-                        self.model.setValueAt(resSci, currentRow, scientNameColumn)
+                        updates.append((currentRow, scientNameColumn, resSci))
                         associatedTaxa.append([currentRow, catNum, resSci])
 
             except IndexError:
                 self.parentframe.master.title("PD-Desktop")
-            self.redraw()
             progBar["value"] = n
+            progBar.update_idletasks()
         progBar.destroy()
-        
-        self.model.df = self.model.df.groupby('site#').apply(self.genAssociatedTaxa).reset_index(drop=True)#group by 'site#', apply genAssociatedTaxa groupwise
+        self.updateCells(updates)
+        if len(limitedRows) > 0:
+            sparseRows = [x + 1 for x in limitedRows if missingGeography[x]]
+            message = 'Locality for {} records was generated using limited methods.'.format(len(limitedRows))
+            if len(sparseRows) > 0:
+                message = message + '\n{} records are missing important geographic data! You may need to manually enter data into location fields (such as State, and County) at rows: {}'.format(len(sparseRows), ', '.join(str(x) for x in sparseRows))
+            messagebox.showinfo('LIMITED Location data', message)
+
+        self.refreshAssociatedTaxa()
+        self.parentframe.master.title("PD-Desktop")
+        # update the table to display progress to the user.
+        self.redraw()
+
+    def resolveNames(self, rows):
+        """Parse the scientificName column once, then resolve the distinct
+        names among the given specimen rows concurrently. Returns the parsed
+        names (see parseScientificNames) and a dict of query names to their
+        colNameSearch results."""
+
+        df = self.model.df
+        parsedNames = parseScientificNames(df['scientificName'])
+        isSpecimen = ~df['specimen#'].iloc[rows].isin(['#','!AddSITE']).values
+        toResolve = parsedNames.iloc[rows][isSpecimen]
+        toResolve = toResolve[toResolve['query'] != '']
+        resolvedNames = batchColNameSearch(toResolve['query'].tolist(), queryKeys=toResolve['queryKey'].tolist())
+        return parsedNames, resolvedNames
+
+    def specimenRows(self, rows):
+        """The given rows, less any site level records"""
+
+        specimenNums = self.model.df['specimen#'].iloc[rows]
+        return [x for x, specimenNum in zip(rows, specimenNums) if specimenNum not in ['#','!AddSITE']]
+
+    def writeSiteLocalities(self, siteLocalities):
+        """Write the geography found by proposeSiteLocalities into the
+        table, with a single assignment per column."""
+
+        df = self.model.df
+        resolved = siteLocalities[siteLocalities['status'] == '']
+        self.updateColumns({x: resolved[x].dropna() for x in localityFieldNames + ['locality'] if x in df.columns})
+        return
+
+    def refreshAssociatedTaxa(self):
+        """Rebuild associatedTaxa for every record from the other
+        scientific names at its site."""
+
+        scientNameColumn = self.findColumnIndex('scientificName')
+        assocTaxaColumn = self.findColumnIndex('associatedTaxa')
+        df = self.model.df
+        # each site's taxa are worked out once, and only the cells which change are written back.
+        siteGroups = df[['site#', 'associatedTaxa', 'scientificName']].groupby('site#', sort=False)
+        siteTaxa = {site: self.genAssociatedTaxa(siteGroup) for site, siteGroup in siteGroups}
+        currentTaxa = df.iloc[:, assocTaxaColumn].astype(object).fillna('').astype(str)
+        # records without a site# keep what they have
+        groupTaxa = df['site#'].map(siteTaxa).astype(object).fillna(currentTaxa)
         #this loop fixes the scientific name's presence also being in associated Taxa. It would be ideal to do this in associatedTaxa
-        for recordRow in range(self.model.getRowCount()):
-            recordAssociatedTaxa = self.model.getValueAt(recordRow, assocTaxaColumn) # identify associated taxa cell
+        scientificNames = df.iloc[:, scientNameColumn].astype(object).fillna('').tolist()
+        cleanedTaxa = []
+        for recordAssociatedTaxa, scientificName in zip(groupTaxa.astype(str).tolist(), scientificNames):
             recordAssociatedTaxa = recordAssociatedTaxa.split(',') # split it into a list of strings on ','
             recordAssociatedTaxa = [x.strip() for x in recordAssociatedTaxa]
-            if self.model.getValueAt(recordRow,scientNameColumn) in recordAssociatedTaxa:
-                recordAssociatedTaxa.remove(self.model.getValueAt(recordRow,scientNameColumn))
-              
-            recordAssociatedTaxa = ', '.join(recordAssociatedTaxa).strip().strip(', ')
-            self.model.setValueAt(recordAssociatedTaxa, recordRow, assocTaxaColumn)
+            if scientificName in recordAssociatedTaxa:
+                recordAssociatedTaxa.remove(scientificName)
+            cleanedTaxa.append(', '.join(recordAssociatedTaxa).strip().strip(', '))
+        cleanedTaxa = pd.Series(cleanedTaxa)
+        self.model.setColumnValues(cleanedTaxa[cleanedTaxa.values != currentTaxa.values], assocTaxaColumn)
+        self.adjustColumnWidths([assocTaxaColumn])
+        return
+
+    def processRecordsBatch(self):
+        """Process records without interrupting the user. Name and locality
+        lookups for the selected records run to completion first, then the
+        proposed changes are listed for review and the accepted ones are
+        applied to the table in a single step."""
 
+        catalogNumColumn = self.findColumnIndex('otherCatalogNumbers')
+        recordedByColumn = self.findColumnIndex('recordedBy')
+        assCollectorColumn = self.findColumnIndex('associatedCollectors')
+        rows = self.specimenRows(self.multiplerowlist)
+        self.parentframe.master.title("PD-Desktop (Processing Records...)")
+        progBar = ttk.Progressbar(self.master,orient ="horizontal",length = 200, mode ="determinate")
+        progBar.grid(row=5, column=1, columnspan = 3, sticky='news', pady=1, ipady=1)
+        pb_Label = Label(progBar, text='Processing Records...')
+        pb_Label.grid(row=5, column=1, columnspan = 3, pady=1, ipady=1)
+        progBar["maximum"] = len(rows)
+        progBar["value"] = 0
+
+        # resolve each distinct scientific name once, concurrently, before walking the rows.
+        pb_Label.configure(text='Resolving names...')
+        progBar.update_idletasks()
+        parsedNames, resolvedNames = self.resolveNames(rows)
+        pb_Label.configure(text='Locating sites...')
+        progBar.update_idletasks()
+        siteLocalities = proposeSiteLocalities(self, rows)
+        unlocatedRows = [x for x in rows if x not in siteLocalities.index or siteLocalities.loc[x, 'status'] != '']
+        offlineLocalities = buildLocalitiesNoAPI(self, unlocatedRows)
+        pb_Label.configure(text='Processing Records...')
+
+        changes = []
+        for n, currentRow in enumerate(rows):
+            catNum = self.model.getValueAt(currentRow, catalogNumColumn)
+            proposed = {}
+            #Clean duplicate primary collector names out of associated collectors.
+            recordedBy = str(self.model.getValueAt(currentRow, recordedByColumn))
+            associatedCollectors = str(self.model.getValueAt(currentRow, assCollectorColumn)).split(',')
+            proposed['associatedCollectors'] = ', '.join([x.strip() for x in associatedCollectors if x.strip().upper() != recordedBy.strip().upper()])
+            localityFields, localityNote = proposeLocality(self, currentRow, siteLocalities, offlineLocalities)
+            proposed.update(localityFields)
+            nameFields, nameNote = proposeScientificName(self, currentRow, resolvedNames, parsedNames)
+            proposed.update(nameFields)
+            note = '. '.join([x for x in [localityNote, nameNote] if x != ''])
+
+            rowChanges = []
+            for field, value in proposed.items():
+                fieldColumn = self.findColumnIndex(field)
+                # getting more weird authorship return values? add them here!
+                if fieldColumn == '' or value == 'None':
+                    continue
+                oldValue = str(self.model.getValueAt(currentRow, fieldColumn))
+                if oldValue == 'nan':
+                    oldValue = ''
+                if value != oldValue:
+                    rowChanges.append([currentRow, catNum, field, oldValue, value, note])
+            # keep problems visible even when nothing could be proposed.
+            if len(rowChanges) == 0 and note != '':
+                rowChanges.append([currentRow, catNum, '', '', '', note])
+            changes.extend(rowChanges)
+            progBar["value"] = n
+            progBar.update_idletasks()
+        progBar.destroy()
         self.parentframe.master.title("PD-Desktop")
-        # update the table to display progress to the user.
+
+        changes = pd.DataFrame(changes, columns=ReviewChangesDialog.columns)
+        if len(changes) == 0:
+            messagebox.showinfo('Process Records', 'No changes to propose for the selected records.')
+            return
+        reviewDialog = ReviewChangesDialog(self.parentframe, changes)
+        if reviewDialog.accepted is not None:
+            self.applyChangeSet(reviewDialog.accepted)
+        return
+
+    def applyChangeSet(self, changes):
+        """Write reviewed changes into the table, with a single assignment
+        per field. changes is a DataFrame as built by processRecordsBatch."""
+
+        changes = changes[changes['field'] != '']
+        if len(changes) == 0:
+            return
+        self.storeCurrent()
+        self.updateColumns({field: pd.Series(fieldChanges['new'].values, index=fieldChanges['row'].values)
+                                  for field, fieldChanges in changes.groupby('field')})
+        self.refreshAssociatedTaxa()
         self.redraw()
+        return
+
+    def auditGeography(self, online=False):
+        """Check the entered country, state and county of every record
+        against its coordinates. Conflicting cells are highlighted, and
+        listed for review so the geocoded values can be accepted."""
+
+        self.parentframe.master.title("PD-Desktop (Auditing Geography...)")
+        self.update_idletasks()
+        try:
+            conflicts, mask = findGeographyConflicts(self, online=online)
+        finally:
+            self.parentframe.master.title("PD-Desktop")
+        df = self.model.df
+        for field in mask.columns:
+            if field in df.columns:
+                fieldMask = pd.Series(False, index=range(len(df)))
+                fieldMask.iloc[mask.index] = mask[field].values
+                self.setColorByMask(field, fieldMask, self.auditColor)
+        self.redraw()
+        if len(conflicts) == 0:
+            messagebox.showinfo('Geography Audit', 'The entered geography agrees with the coordinates of every record.')
+            return
+        reviewDialog = ReviewChangesDialog(self.parentframe, conflicts)
+        if reviewDialog.accepted is not None:
+            self.applyChangeSet(reviewDialog.accepted)
+        return
+
+    def fillVerbatimCoordinates(self):
+        """Convert verbatimCoordinates (DMS, DDM or decimal degrees) into
+        decimal coordinates for every record without them, highlighting
+        those which couldn't be read."""
+
+        df = self.model.df
+        unparsed = fillDecimalCoordinates(df)
+        # the coordinates were written straight into the table, so their cached lengths no longer hold.
+        coordinateColumns = ['decimalLatitude', 'decimalLongitude']
+        self.model.invalidateEntryLengths(coordinateColumns)
+        self.model.unsortColumns(coordinateColumns)
+        self.adjustColumnWidths([df.columns.get_loc(x) for x in coordinateColumns])
+        if unparsed.any():
+            self.setColorByMask('verbatimCoordinates', pd.Series(unparsed.values, index=range(len(df))), self.auditColor)
+            messagebox.showinfo('Verbatim coordinates', 'Could not read the verbatimCoordinates of {} records, they are highlighted.'.format(unparsed.sum()))
+        return unparsed
+
+    def setElevationTiles(self, directory=None):
+        """Choose the folder of SRTM .hgt tiles elevations are read from"""
+
+        if directory is None:
+            directory = filedialog.askdirectory(parent=self.master, initialdir=os.getcwd(),
+                                                title='Folder of elevation (.hgt) tiles')
+        if not directory:
+            return False
+        setDemDirectory(directory)
+        self.prefs.set('demDirectory', directory)
+        return True
+
+    def checkElevations(self):
+        """Fill blank elevations from the elevation tiles, and flag entered
+        elevations which disagree with them. The proposed values are
+        listed for review."""
+
+        changes, deviates = proposeElevations(self)
+        if changes is None:
+            if not messagebox.askyesno('Check Elevations', 'No elevation tiles are available. Would you like to choose a folder of .hgt tiles?'):
+                return
+            if not self.setElevationTiles():
+                return
+            changes, deviates = proposeElevations(self)
+            if changes is None:
+                messagebox.showwarning('Check Elevations', 'No .hgt tiles were found in {}'.format(self.prefs.get('demDirectory')))
+                return
+        df = self.model.df
+        if 'minimumElevationInMeters' in df.columns:
+            fieldMask = pd.Series(False, index=range(len(df)))
+            fieldMask.iloc[deviates.index] = deviates.values
+            self.setColorByMask('minimumElevationInMeters', fieldMask, self.auditColor)
+            self.redraw()
+        if len(changes) == 0:
+            messagebox.showinfo('Check Elevations', 'Every elevation agrees with the elevation tiles.')
+            return
+        reviewDialog = ReviewChangesDialog(self.parentframe, changes)
+        if reviewDialog.accepted is not None:
+            self.applyChangeSet(reviewDialog.accepted)
+        return
+
+    def importLocalChecklist(self, sourcePath=None):
+        """Build an offline checklist index from a Catalog of Life or
+        Darwin Core Archive taxon dump. Once imported, names are looked up
+        locally before asking the Catalog of Life webservice."""
+
+        if sourcePath is None:
+            sourcePath = filedialog.askopenfilename(parent=self.master,
+                                                    initialdir=os.getcwd(),
+                                                    filetypes=[("Darwin Core Archive","*.zip"),
+                                                               ("Taxon file","*.txt *.tsv *.csv"),
+                                                               ("All files","*.*")])
+        if not sourcePath:
+            return
+        indexPath = defaultCachePath('.pdproject_checklist.sqlite')
+        self.parentframe.master.title("PD-Desktop (Importing Checklist...)")
+        self.update_idletasks()
+        # release the current index before replacing its file.
+        setLocalChecklist('')
+        try:
+            nameCount = localChecklist.importChecklist(sourcePath, indexPath)
+        except (ValueError, OSError) as e:
+            messagebox.showwarning('Checklist Import Error', 'Could not import a checklist from {}:\n{}'.format(sourcePath, e))
+            setLocalChecklist(self.prefs.get('localChecklistPath'))
+            return
+        finally:
+            self.parentframe.master.title("PD-Desktop")
+        self.prefs.set('localChecklistPath', indexPath)
+        setLocalChecklist(indexPath)
+        messagebox.showinfo('Checklist Imported', '{} names are now available for offline lookups.'.format(nameCount))
+        return
+
+    def importBoundaries(self, sourcePath=None):
+        """Add administrative boundaries (GeoJSON, or a shapefile with pyshp
+        installed) for one level of geography to the offline geocoder, which
+        fills locality fields when Google's geocoding service can't be reached."""
+
+        if sourcePath is None:
+            sourcePath = filedialog.askopenfilename(parent=self.master,
+                                                    initialdir=os.getcwd(),
+                                                    filetypes=[("GeoJSON","*.geojson *.json"),
+                                                               ("Shapefile","*.shp"),
+                                                               ("All files","*.*")])
+        if not sourcePath:
+            return
+        d = MultipleValDialog(title='Import Boundaries',
+                                initialvalues=(['country','stateProvince','county','municipality'], ''),
+                                labels=('Boundaries of','Name field'),
+                                types=('combobox','string'),
+                                tooltips=('The field these boundaries fill','Property holding each name, blank to guess'),
+                                parent = self.parentframe)
+        if d.result == None:
+            return
+        level, nameField = d.results
+        self.parentframe.master.title("PD-Desktop (Importing Boundaries...)")
+        self.update_idletasks()
+        try:
+            boundaryCount = importBoundaries(level, sourcePath, nameField.strip() or None)
+        except (ValueError, OSError, KeyError, ImportError) as e:
+            messagebox.showwarning('Boundary Import Error', 'Could not import boundaries from {}:\n{}'.format(sourcePath, e))
+            return
+        finally:
+            self.parentframe.master.title("PD-Desktop")
+        messagebox.showinfo('Boundaries Imported', '{} {} boundaries are now available for offline locality lookups.'.format(boundaryCount, level))
+        return
 
     def genAssociatedTaxa(self, siteGroup):
         """Generate Associated Taxa gets all associated taxa
-        for a given record (specimen)."""
+        for the records of a site, returned as a single string."""
         
         associatedTaxaList = [] #start with empty list
 #first generate a list of every item already in associatedTaxa (user entered)
@@ -3278,8 +3788,7 @@ class Table(Canvas):
 #join the lists keeping user entered fields at the start of the list.
         groupAssociatedTaxa = associatedTaxaList + groupScientificNameList
         groupAssociatedTaxa = ', '.join(groupAssociatedTaxa).strip().replace(', , ', ', ')
-        siteGroup['associatedTaxa'] = groupAssociatedTaxa #Update associated taxa according to the group with the final list.
-        return siteGroup    #Return the groups with modified associatedTaxa Fields.
+        return groupAssociatedTaxa    #Return the final list, shared by every record in the group.
         
 
 
@@ -3298,6 +3807,10 @@ class Table(Canvas):
         toPrintDataFrame = self.getSelectedLabelDict()  #function returns a list of dicts (one for each record to print)
         labelsToPrint = len(toPrintDataFrame)
         if labelsToPrint > 0:
+            # italicize names, but not their rank or qualifier words.
+            sciNames = pd.Series([x.get('scientificName', '') for x in toPrintDataFrame])
+            for record, sciNameHTML in zip(toPrintDataFrame, formatScientificNames(sciNames)):
+                record['scientificNameHTML'] = sciNameHTML
             for record in toPrintDataFrame:   
                 if CatNumberBar.stuCollCheckBoxVar.get() == 1: # for each dict, if it is student collection
                     record['verifiedBy'] = CatNumberBar.stuCollVerifyByVar.get() #then add the verified by name to the dict.
@@ -3344,8 +3857,8 @@ class Table(Canvas):
             model = TableModel()
             model.load(filename, filetype)
             self.updateModel(model)
+            self.journal.clear()
             self.filename = filename
-            self.adjustColumnWidths()
             self.redraw()
         return
 
@@ -3454,11 +3967,14 @@ class Table(Canvas):
         model = TableModel(dataframe=df)
         self.updateModel(model)
         self.sortTable([self.model.df.columns.get_loc('site#'),self.model.df.columns.get_loc('specimen#')])
-        self.adjustColumnWidths()
 
         #this solves addressing errors related to index at row 1 = 1 on import, and various functions later properly reset the index to 0
         self.model.resetIndex()
         self.rowcolors = pd.DataFrame()
+        self.fillVerbatimCoordinates()
+        self.model.compactStorage()
+        # undo history belongs to the previous data set
+        self.journal.clear()
         self.redraw()
         self.setSelectedRow(0)
         self.drawSelectedRow()
@@ -3525,13 +4041,26 @@ class Table(Canvas):
         
         df = dframe
         if self.column_order:
-            df['site#'] = df['otherCatalogNumbers'].apply(lambda x: siteNumExtract(x))
-            df['specimen#'] = df['otherCatalogNumbers'].apply(lambda x: specimenNumExtract(x))
+            siteNums = df['otherCatalogNumbers'].apply(lambda x: siteNumExtract(x))
+            specimenNums = df['otherCatalogNumbers'].apply(lambda x: specimenNumExtract(x))
+            if df is not self.model.df:
+                df['site#'] = siteNums
+                df['specimen#'] = specimenNums
+            else:
+                # the model's own table is only written where the numbers changed, through the model so it can be undone.
+                for colname, values in [('site#', siteNums), ('specimen#', specimenNums)]:
+                    if colname not in df.columns or df[colname].dtype != object:
+                        self.model.addColumn(colname, data=pd.Series(values.values, dtype=object))
+                        continue
+                    values = pd.Series(values.values, dtype=object)
+                    changed = [isinstance(x, str) != isinstance(y, str) or x != y for x, y in zip(values, df[colname])]
+                    self.model.setColumnValues(values[changed], df.columns.get_loc(colname))
             for item in df.columns.values.tolist():
                 if item not in self.column_order:
                     self.column_order.append(item)
             #If it needs to add a new column full of empty values, bring it in as a string dtype.
-            self.model.df = df.reindex(columns = self.column_order, fill_value= '')
+            if df is not self.model.df or list(df.columns) != self.column_order:
+                self.model.df = df.reindex(columns = self.column_order, fill_value= '')
             
     def getGeometry(self, frame):
         """Get frame geometry"""
@@ -3618,32 +4147,38 @@ class CollectionDataEntryBar(Frame):
 
     def addCollectionName(self):
         collName = self.collNameVar.get()
-        self.parentapp.model.df['collectionName'] = collName
+        self.parentapp.storeCurrent()
+        self.parentapp.model.addColumn('collectionName', data=collName)
         self.parentapp.redraw()
 
     def delCollectionName(self):
+        self.parentapp.storeCurrent()
         try:
-            self.parentapp.model.df.drop('collectionName', axis=1, inplace=True)
-        except ValueError:
+            self.parentapp.model.deleteColumn(self.parentapp.model.df.columns.get_loc('collectionName'))
+        except (KeyError, ValueError):
             pass
         self.parentapp.redraw()
 
     def addDetByName(self): # Only replacing empty cells.
-        detByCol = self.parentapp.model.df['identifiedBy']
+        self.parentapp.storeCurrent()
+        detByCol = self.parentapp.model.df['identifiedBy'].reset_index(drop=True)
         detName = self.detNameVar.get()
-        self.parentapp.model.df.loc[detByCol == '', 'identifiedBy'] = detName
+        emptyRows = detByCol[detByCol == ''].index
+        self.parentapp.model.setColumnValues(pd.Series(detName, index=emptyRows), self.parentapp.model.df.columns.get_loc('identifiedBy'))
         #self.parentapp.model.df['identifiedBy'] = detName
         if self.useDetDateVar.get() == 1:
             from datetime import date
             isoDate = date.today().isoformat()
-            self.parentapp.model.df['dateIdentified'] = isoDate
+            self.parentapp.model.addColumn('dateIdentified', data=isoDate)
         self.parentapp.redraw()
 
     def delDetByName(self): # Should this only remove the "added" names?
+        self.parentapp.storeCurrent()
+        model = self.parentapp.model
         try:
-            self.parentapp.model.df.drop('identifiedBy', axis=1, inplace=True)
-            self.parentapp.model.df.drop('dateIdentified', axis=1, inplace=True)
-        except ValueError:
+            model.deleteColumn(model.df.columns.get_loc('identifiedBy'))
+            model.deleteColumn(model.df.columns.get_loc('dateIdentified'))
+        except (KeyError, ValueError):
             pass
         self.parentapp.redraw()
 
@@ -3751,14 +4286,16 @@ class CatNumberBar(Frame):
         if len(str(start)) > digits: #check that the starting value does not require more decimal places than the entered digit length
             messagebox.showwarning("Starting Value Error", "Starting Catalog Number Value Exceeds Entered The Max Digits")
         else:
+            self.parentapp.storeCurrent()
             try: # try and isolate the records which need a catalog number
                 groupNeedingBarcodes = specimenRecordGroup[specimenRecordGroup['catalogNumber'].str.len() != (len(str(prefix)) + digits)]
             except KeyError: #if no 'catalogNumber column exists, generate it
-                self.parentapp.model.df['catalogNumber'] = ''
+                self.parentapp.model.addColumn('catalogNumber', data='')
                 groupNeedingBarcodes = specimenRecordGroup[specimenRecordGroup['catalogNumber'].str.len() != (len(str(prefix)) + digits)]
             catalogValues = [prefix + str(x + int(start)).zfill(digits) for x in range(len(groupNeedingBarcodes))] #Generate a list of the barcodes to assign
             self.catStartVar.set(len(catalogValues) + int(start)) # update the starting view by the quanity being added
-            df.loc[groupNeedingBarcodes.index,'catalogNumber'] = catalogValues #apply the selective changes
+            self.parentapp.model.setColumnValues(pd.Series(catalogValues, index=df.index.get_indexer(groupNeedingBarcodes.index)),
+                                                 df.columns.get_loc('catalogNumber')) #apply the selective changes
             self.parentapp.redraw()
                 
     def delCatalogNumbers(self):
@@ -3771,10 +4308,11 @@ class CatNumberBar(Frame):
             # then removes the catalog numbers
             # the catalog number starting value will roll back further than appropriate
             # because the pre-existing numbers were properly formatted & we're counting the quantity to roll back based on formatting conditions.
-            self.parentapp.model.df.drop('catalogNumber', axis=1, inplace=True)
+            self.parentapp.storeCurrent()
+            self.parentapp.model.deleteColumn(self.parentapp.model.df.columns.get_loc('catalogNumber'))
             if messagebox.askyesno("Roll Back Starting Catalog Number?", "Would you like to reduce the starting catalog value by the quantity removed from the table?\nTAKE CAUTION: If you had pre-existing catalog numbers assigned, this may roll back the starting value too far!"):
                 self.catStartVar.set(str(self.catStartVar.get() - len(self.parentapp.getOnlySpecimenRecords())))              
-        except ValueError:
+        except (KeyError, ValueError):
             pass
         self.parentapp.redraw()
 
@@ -3804,6 +4342,8 @@ class ToolBar(Frame):
         img = images.merge() 
         addButton(self, 'Process Records', self.parentapp.processRecords, img, 'Process Selected Records', side=LEFT)
 
+        addButton(self, 'Batch Process', self.parentapp.processRecordsBatch, img, 'Process Selected Records, then review every change at once', side=LEFT)
+
         img = images.aggregate() #hijacking random image for now
         addButton(self, 'Make Labels',self.parentapp.genLabelPDF, img, 'Generate Labels for Selected Records', side=LEFT)
 
@@ -3885,6 +4425,9 @@ class statusBar(Frame):
         self.filenamevar = StringVar()
         l=Label(self,textvariable=self.filenamevar,font=sfont)
         l.pack(fill=X, side=RIGHT)
+        self.memoryvar = StringVar()
+        l=Label(self,textvariable=self.memoryvar,font=sfont)
+        l.pack(fill=X, side=RIGHT, padx=10)
         return
 
     def update(self):
@@ -3895,4 +4438,9 @@ class statusBar(Frame):
         self.colsvar.set(len(model.df.columns))
         if self.parentapp.filename != None:
             self.filenamevar.set(self.parentapp.filename)
+        compactedBytes = getattr(model, 'compactedBytes', 0)
+        if compactedBytes > 0:
+            self.memoryvar.set('compact storage saved {:.1f} MB'.format(compactedBytes / 1e6))
+        else:
+            self.memoryvar.set('')
         return
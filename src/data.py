@@ -5,10 +5,54 @@ from copy import deepcopy
 import operator
 import os, string, types, copy
 import pickle
+import bisect
+from collections import Counter
 import numpy as np
 import pandas as pd
 import util
 import core
+from undoJournal import (CellsChange, RowsInserted, RowsDeleted, RowsReordered, ColumnsAdded,
+                         ColumnsDropped, ColumnMoved, FrameReplaced)
+
+# text columns with at most this many distinct values per row are stored as categories
+categoryMaxRatio = 0.5
+# tables smaller than this aren't worth compacting
+categoryMinRows = 500
+# descriptive columns which repeat across a collection and are rarely rewritten.
+# Names, dates, localities and coordinates are edited per record by processing, so stay plain text
+compactedColumns = ['country', 'stateProvince', 'county', 'municipality',
+                    'recordedBy', 'associatedCollectors', 'identifiedBy',
+                    'habitat', 'substrate', 'establishmentMeans',
+                    'reproductiveCondition', 'geodeticDatum', 'labelProject']
+
+
+def sortKey(value):
+    """Sort key ordering the values of a mixed column as sort_values does:
+    numbers, then text, then blanks"""
+
+    if isinstance(value, str):
+        return (1, value)
+    if value is None or pd.isna(value):
+        return (2, 0)
+    if isinstance(value, (int, float, np.number)):
+        return (0, value)
+    return (1, str(value))
+
+
+class SortedRows(object):
+    """The sort keys of a table's rows for the given columns, read only as
+    they are asked for, so bisect can search the table in place."""
+
+    def __init__(self, df, colnames):
+        self.columns = [df[x].values for x in colnames]
+        return
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __getitem__(self, row):
+        return tuple(sortKey(x[row]) for x in self.columns)
+
 
 class TableModel(object):
     """A data model for the Table class that uses pandas
@@ -42,8 +86,40 @@ class TableModel(object):
         """Create meta data fields"""
         self.meta = {}
         self.columnwidths = {} #used to store col widths
+        self.entryLengths = {} #Counter of displayed text length to number of rows, by column
+        self.sortedBy = None #columns the rows are known to be sorted by (ascending)
+        self.journal = None #UndoJournal the inverse of each change is recorded in
+        self.compactedBytes = 0 #memory saved by the last compactStorage, shown in the status bar
+        return
+
+    def record(self, operation):
+        """Record the operation undoing a change, if a journal is attached"""
+
+        if self.journal is not None:
+            self.journal.record(operation)
+        return
+
+    def beginStep(self):
+        """Start a new undo step, if a journal is attached"""
+
+        if self.journal is not None:
+            self.journal.begin()
         return
 
+    @property
+    def df(self):
+        return self._df
+
+    @df.setter
+    def df(self, dataframe):
+        # a replaced frame may hold anything, its entry lengths are counted again when needed.
+        previous = getattr(self, '_df', None)
+        if previous is not None and previous is not dataframe:
+            self.record(FrameReplaced(previous))
+        self._df = dataframe
+        self.entryLengths = {}
+        self.sortedBy = None
+
     def save(self, filename):
         """Save dataframe"""
 
@@ -67,24 +143,73 @@ class TableModel(object):
             self.df = pd.read_pickle(filename)
         else:
             self.df = pd.read_msgpack(filename)
+        self.compactStorage()
+        return
+
+    def textLengths(self, values, dtype):
+        """Displayed text length of each of values, for a column of dtype"""
+
+        values = pd.Series(values)
+        if dtype == 'float64':
+            values = pd.to_numeric(values, errors='coerce').round(3)
+        # blank cells count as empty, however the pandas version converts them
+        return values.astype('object').astype('str').str.len().fillna(0).astype(int)
+
+    def getEntryLengths(self, colname):
+        """The Counter of text lengths for a column, counted from the column
+        the first time, then kept up to date as cells are edited and rows
+        inserted or deleted."""
+
+        lengths = self.entryLengths.get(colname)
+        # a column written directly into the frame no longer matches its row count.
+        if lengths is None or sum(lengths.values()) != len(self._df):
+            column = self._df[colname]
+            lengths = Counter(self.textLengths(column, column.dtype).value_counts().to_dict())
+            self.entryLengths[colname] = lengths
+        return lengths
+
+    def updateEntryLengths(self, colname, oldValues, newValues):
+        """Count the text lengths of newValues in place of oldValues"""
+
+        lengths = self.entryLengths.get(colname)
+        if lengths is None:
+            return
+        dtype = self._df[colname].dtype
+        lengths.subtract(self.textLengths(oldValues, dtype).value_counts().to_dict())
+        lengths.update(self.textLengths(newValues, dtype).value_counts().to_dict())
+        # drop lengths no row has any more, so the longest is always held by a row.
+        for length in [x for x, count in lengths.items() if count <= 0]:
+            del lengths[length]
+        return
+
+    def invalidateEntryLengths(self, colnames=None):
+        """Forget the text lengths of the given columns (all by default),
+        after writing into them outside the model"""
+
+        if colnames is None:
+            self.entryLengths = {}
+        else:
+            for colname in colnames:
+                self.entryLengths.pop(colname, None)
+        return
+
+    def unsortColumns(self, colnames):
+        """Forget the sort order when any of colnames was written"""
+
+        if self.sortedBy is not None and any(x in self.sortedBy for x in colnames):
+            self.sortedBy = None
         return
 
     def getlongestEntry(self, colindex):
         """Get the longest string in the column for determining width"""
 
-        df = self.df
-        col = df.columns[colindex]
         try:
-            if df.dtypes[col] == 'float64':
-                c = df[col].round(3)
-            else:
-                c = df[col]
-        except:
+            lengths = self.getEntryLengths(self._df.columns[colindex])
+        except Exception:
             return 1
-        longest = c.astype('object').astype('str').str.len().max()
-        if np.isnan(longest):
+        if len(lengths) == 0:
             return 1
-        return longest
+        return max(lengths)
 
     def getRecordAtRow(self, rowIndex):
         """Get the entire record at the specifed row"""
@@ -102,7 +227,9 @@ class TableModel(object):
         name = cols[oldindex]
         del cols[oldindex]
         cols.insert(newindex, name)
-        self.df = df[cols]
+        # the same columns, so their entry lengths still hold
+        self._df = df[cols]
+        self.record(ColumnMoved(cols.index(name), oldindex))
         return
 
     def autoAddRows(self, num):
@@ -119,19 +246,137 @@ class TableModel(object):
         except:
             ind = len(df)+1
         new = pd.DataFrame(np.nan, index=range(ind,ind+num), columns=df.columns)
-        self.df = pd.concat([df, new])
+        self._df = pd.concat([df, new])
+        self.record(RowsInserted(range(len(df), len(df) + num)))
+        for colname in list(self.entryLengths):
+            self.updateEntryLengths(colname, [], new[colname])
         
         return
     
     def addRow(self, rowindex):
-        """Inserts a row at the required index by append/concat"""
+        """Inserts a blank row at the required index"""
+
+        self.insertRows([{}], rowindex)
+        return
+
+    def insertRows(self, rows, position):
+        """Insert rows (a DataFrame or list of dicts keyed by column name)
+        before position with a single concat, renumbering the index. Columns
+        the rows leave out are left blank. The concat still copies the whole
+        table (O(n) per call), so pass rows added together in one call rather
+        than inserting them one at a time."""
+
+        rows = self.alignRows(rows)
+        df = self.df
+        self._df = pd.concat([df.iloc[:position], rows, df.iloc[position:]], ignore_index=True)
+        self.record(RowsInserted(range(position, position + len(rows))))
+        for colname in list(self.entryLengths):
+            self.updateEntryLengths(colname, [], rows[colname])
+        if self.sortedBy is not None:
+            # still sorted only if the new rows are in order with their neighbours.
+            sortedRows = SortedRows(self._df, self.sortedBy)
+            keys = [sortedRows[x] for x in range(max(position - 1, 0), min(position + len(rows) + 1, len(sortedRows)))]
+            if any(keys[x] > keys[x + 1] for x in range(len(keys) - 1)):
+                self.sortedBy = None
+        return
 
+    def alignRows(self, rows):
+        """New rows with the table's columns, cast to the categories of any
+        categorical column so concat keeps the column categorical. Categorical
+        cells the rows don't provide are left as '' rather than NaN."""
+
+        rows = pd.DataFrame(rows)
+        missing = [x for x in self.df.columns if x not in rows.columns]
+        rows = rows.reindex(columns=self.df.columns)
+        for colindex, colname in enumerate(self.df.columns):
+            if isinstance(self.df[colname].dtype, pd.CategoricalDtype):
+                if colname in missing:
+                    rows[colname] = ''
+                self.addCategories(colindex, rows[colname])
+                rows[colname] = rows[colname].astype(self.df[colname].dtype)
+        return rows
+
+    def restoreRows(self, rows, positions):
+        """Put deleted rows back, so they end up at the given (ascending)
+        positions"""
+
+        rows = self.alignRows(rows)
         df = self.df
-        a, b = df[:rowindex], df[rowindex:]
-        a = a.append(pd.Series(), ignore_index=1)
-        self.df = pd.concat([a,b])
+        total = len(df) + len(rows)
+        restored = np.zeros(total, dtype=bool)
+        restored[list(positions)] = True
+        order = np.empty(total, dtype=int)
+        order[restored] = len(df) + np.arange(len(rows))
+        order[~restored] = np.arange(len(df))
+        self._df = pd.concat([df, rows], ignore_index=True).iloc[order].reset_index(drop=True)
+        self.record(RowsInserted(positions))
+        self.sortedBy = None
+        for colname in list(self.entryLengths):
+            self.updateEntryLengths(colname, [], rows[colname])
+        return
+
+    def sortRows(self, colnames, ascending=True, newStep=True):
+        """Sort the rows by the named columns, recording the new order so the
+        sort can be undone. A sort is an undo step of its own unless newStep
+        is False (ie: a sort finishing some larger change)."""
+
+        if newStep:
+            self.beginStep()
+        df = self.df
+        self.sortedBy = None
+        labels = df.index
+        # row positions travel with the rows while sorting, so the sort can be undone
+        df.index = pd.RangeIndex(len(df))
+        try:
+            df.sort_values(by=colnames, inplace=True, ascending=ascending)
+            # lets rows be inserted in order without sorting again (see sortedPosition)
+            self.sortedBy = list(colnames) if ascending == True else None
+
+        except TypeError:                   #If mixed int/str column probably result of filling NaN with ''
+            def tempConvertForSort(v):      #Handle it by creating temp columns and fill '' with negative values which to sort by
+                if v == '':
+                    return int(-9999)
+                else:
+                    return v
+            tempColNames = []
+            for colName in colnames:
+                df['tempSort_{}'.format(colName)] = df[colName].apply(lambda x: tempConvertForSort(x))
+                tempColNames.append('tempSort_{}'.format(colName))
+            df.sort_values(by=tempColNames, inplace=True, ascending= True)
+            df.drop(tempColNames, axis = 1, inplace = True)     #Drop temporary helper columns
+
+        except Exception as e:
+            print('data.py error in function "sortRows", error: {}'.format(e))
+        order = df.index.values
+        df.index = labels[order]
+        self.record(RowsReordered(np.argsort(order)))
         return
 
+    def reorderRows(self, order):
+        """Rearrange the rows, order giving the current position of each"""
+
+        self._df = self.df.take(order)
+        self.record(RowsReordered(np.argsort(order)))
+        self.sortedBy = None
+        return
+
+    def sortedPosition(self, colnames, values):
+        """Where a row holding values in colnames belongs, found by binary
+        search, while the table is still sorted by those columns (see
+        sortedBy). After any rows with equal values. None if the table may
+        be in another order."""
+
+        if self.sortedBy != list(colnames):
+            return None
+        rows = SortedRows(self.df, colnames)
+        newKey = tuple(sortKey(x) for x in values)
+        position = bisect.bisect_right(rows, newKey)
+        # a last check of the neighbours, in case the frame was reordered outside the model.
+        if (position > 0 and rows[position - 1] > newKey) or (position < len(rows) and rows[position] < newKey):
+            self.sortedBy = None
+            return None
+        return position
+
     def deleteRow(self, row, unique=True):
         """Delete a row"""
 
@@ -142,11 +387,16 @@ class TableModel(object):
         """Delete multiple or all rows"""
 
         df = self.df
+        positions = sorted(set(rowlist))
+        removed = df.iloc[positions]
+        self.record(RowsDeleted(positions, removed))
         if unique == True:
             rows = list(set(range(len(df))) - set(rowlist))
-            self.df = df.iloc[rows]
+            self._df = df.iloc[rows]
         else:
             df.drop(df.index[rowlist],inplace=True)
+        for colname in list(self.entryLengths):
+            self.updateEntryLengths(colname, removed[colname], [])
         return
 
     def addColumn(self, colname=None, dtype=None, data=None):
@@ -154,7 +404,13 @@ class TableModel(object):
 
         if data is None:
             data = pd.Series(dtype=dtype)
+        if colname in self.df.columns:
+            # replacing a column, undone by dropping the new one and restoring the old
+            self.record(ColumnsDropped([self.df.columns.get_loc(colname)], self.df[[colname]]))
         self.df[colname] = data
+        self.record(ColumnsAdded([colname]))
+        self.invalidateEntryLengths([colname])
+        self.unsortColumns([colname])
         return
 
     def deleteColumn(self, colindex):
@@ -162,7 +418,10 @@ class TableModel(object):
 
         df = self.df
         colname = df.columns[colindex]
+        self.record(ColumnsDropped([colindex], df[[colname]]))
         df.drop([colname], axis=1, inplace=True)
+        self.invalidateEntryLengths([colname])
+        self.unsortColumns([colname])
         return
 
     def deleteColumns(self, cols=None):
@@ -170,11 +429,30 @@ class TableModel(object):
 
         df = self.df
         colnames = df.columns[cols]
+        positions = sorted(df.columns.get_indexer(colnames))
+        self.record(ColumnsDropped(positions, df.iloc[:, positions]))
         df.drop(colnames, axis=1, inplace=True)
+        self.invalidateEntryLengths(colnames)
+        self.unsortColumns(colnames)
+        return
+
+    def restoreColumns(self, columns, positions):
+        """Put dropped columns back at the given (ascending) positions"""
+
+        for position, colname in zip(positions, columns.columns):
+            self.df.insert(min(position, len(self.df.columns)), colname, columns[colname].values)
+        self.record(ColumnsAdded(columns.columns))
+        self.invalidateEntryLengths(columns.columns)
         return
 
     def deleteCells(self, rows, cols):
+        old = self.df.iloc[rows,cols]
         self.df.iloc[rows,cols] = np.nan
+        new = self.df.iloc[rows,cols]
+        for colname in old.columns:
+            self.record(CellsChange(colname, rows, old[colname].values))
+            self.updateEntryLengths(colname, old[colname], new[colname])
+        self.unsortColumns(old.columns)
         return
 
     def resetIndex(self):
@@ -287,7 +565,7 @@ class TableModel(object):
         #if value == '':
             #value = np.nan
         
-        dtype = self.df.dtypes[colindex]
+        dtype = self.df.dtypes.iloc[colindex]
         #try to cast to column type
         try:
             if dtype == 'float64':
@@ -298,7 +576,117 @@ class TableModel(object):
                 value = pd.to_datetime(value)
         except Exception as e:
             print (e)
+        self.addCategories(colindex, [value])
+        old = self.df.iloc[rowindex,colindex]
+        self.record(CellsChange(self.df.columns[colindex], [rowindex], [old]))
         self.df.iloc[rowindex,colindex] = value
+        self.updateEntryLengths(self.df.columns[colindex], [old], [self.df.iloc[rowindex,colindex]])
+        self.unsortColumns([self.df.columns[colindex]])
+        return
+
+    def compactStorage(self):
+        """Store the repetitive descriptive columns (see compactedColumns) as
+        categories, so each distinct value is held once rather than once per
+        row. '' is always one of the categories, so the columns can still be
+        filled with it. Returns the number of bytes saved, also kept as
+        compactedBytes."""
+
+        df = self.df
+        self.compactedBytes = 0
+        if len(df) < categoryMinRows:
+            return 0
+        before = df.memory_usage(deep=True).sum()
+        for colname in df.columns:
+            column = df[colname]
+            if colname not in compactedColumns or not (column.dtype == object or pd.api.types.is_string_dtype(column.dtype)):
+                continue
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                continue
+            if column.nunique(dropna=False) <= len(df) * categoryMaxRatio:
+                df[colname] = column.astype('category')
+                self.addCategories(df.columns.get_loc(colname), [''])
+        self.compactedBytes = before - df.memory_usage(deep=True).sum()
+        return self.compactedBytes
+
+    def addCategories(self, colindex, values):
+        """Let a categorical column hold the given values before they are
+        written, keeping its categories sorted so the column sorts as text."""
+
+        column = self.df.iloc[:, colindex]
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            return
+        newValues = pd.Index(pd.Series(values).dropna().unique()).difference(column.cat.categories)
+        if len(newValues) == 0:
+            return
+        categories = column.cat.categories.append(newValues)
+        try:
+            categories = categories.sort_values()
+        except TypeError:
+            pass
+        self.df[self.df.columns[colindex]] = column.cat.set_categories(categories)
+        return
+
+    def setColumnValues(self, values, colindex):
+        """Bulk setValueAt for a single column. values is a Series indexed
+        by row number. Values are cast to the column type once, and written
+        with a single assignment."""
+
+        if len(values) == 0:
+            return
+        df = self.df
+        colname = df.columns[colindex]
+        dtype = df.dtypes.iloc[colindex]
+        values = pd.Series(values)
+        #try to cast to column type
+        try:
+            if dtype == 'float64':
+                values = values.astype(float)
+            elif dtype == 'int':
+                values = values.astype(int)
+            elif dtype == 'datetime64[ns]':
+                values = pd.to_datetime(values)
+        except (ValueError, TypeError) as e:
+            print (e)
+        self.addCategories(colindex, values)
+        old = df.iloc[values.index.values, colindex]
+        self.record(CellsChange(colname, values.index.values, old.values))
+        try:
+            df.iloc[values.index.values, colindex] = values.values
+        except (ValueError, TypeError):
+            # values the column type can't hold, keep the column as general objects
+            df[colname] = df[colname].astype(object)
+            df.iloc[values.index.values, colindex] = values.values
+            self.invalidateEntryLengths([colname])
+        self.updateEntryLengths(colname, old, df.iloc[values.index.values, colindex])
+        self.unsortColumns([colname])
+        return
+
+    def setValuesAt(self, values, rowindexes, colindexes):
+        """Bulk setValueAt for sequences of values, rows and columns, one
+        assignment per column"""
+
+        updates = pd.DataFrame({'value': list(values), 'row': list(rowindexes), 'col': list(colindexes)})
+        # the last value given for a cell wins, as it would with setValueAt.
+        updates = updates.drop_duplicates(['row', 'col'], keep='last')
+        for colindex, colUpdates in updates.groupby('col'):
+            self.setColumnValues(pd.Series(colUpdates['value'].values, index=colUpdates['row'].values), colindex)
+        return
+
+    def updateCells(self, cells):
+        """Bulk setValueAt for a sequence of (row, column, value) tuples"""
+
+        if len(cells) == 0:
+            return
+        rowindexes, colindexes, values = zip(*cells)
+        self.setValuesAt(values, rowindexes, colindexes)
+        return
+
+    def updateColumns(self, columns):
+        """Bulk update from a dict of column name to a Series of values
+        indexed by row number"""
+
+        for colname, values in columns.items():
+            self.setColumnValues(values, self.df.columns.get_loc(colname))
         return
 
     def __repr__(self):
@@ -599,7 +599,6 @@ class CombineDialog(Frame):
         f = self.tbf = Frame(self.main)
         f.pack(side=LEFT,fill=BOTH)
         newtable = core.Table(f, dataframe=df, showstatusbar=1)
-        newtable.adjustColumnWidths()
         newtable.show()
         bf = Frame(f)
         bf.grid(row=4,column=0,columnspan=2,sticky='news',padx=2,pady=2)
@@ -713,6 +712,73 @@ class AggregateDialog(Frame):
         self.main.destroy()
         return
 
+class ReviewChangesDialog(Frame):
+    """Lists the changes proposed by batch record processing so they can be
+    accepted or rejected together. changes is a DataFrame with the columns
+    row, catalogNumber, field, old, new and note, with a
+    default integer index. Rows with no field only
+    carry a note. The accepted changes are left in self.accepted."""
+
+    columns = ['row', 'catalogNumber', 'field', 'old', 'new', 'note']
+
+    def __init__(self, parent=None, changes=None):
+
+        self.parent = parent
+        self.changes = changes
+        self.accepted = None
+        self.main = Toplevel()
+        self.master = self.main
+        self.main.title('Review Proposed Changes')
+        self.main.protocol("WM_DELETE_WINDOW", self.quit)
+        self.main.grab_set()
+        self.main.transient(parent)
+
+        fieldChanges = changes[changes['field'] != '']
+        summary = '{} changes proposed across {} records, {} notes'.format(
+                   len(fieldChanges), fieldChanges['row'].nunique(), (changes['note'] != '').sum())
+        Label(self.main, text=summary).pack(side=TOP,fill=X,padx=2,pady=2)
+
+        f = Frame(self.main)
+        f.pack(side=TOP,fill=BOTH,expand=1)
+        self.tree = Treeview(f, columns=self.columns, show='headings', height=20)
+        widths = {'row':50, 'catalogNumber':110, 'field':130, 'old':200, 'new':200, 'note':300}
+        for col in self.columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=widths[col], stretch=(col == 'note'))
+        yScroll = Scrollbar(f, orient=VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=yScroll.set)
+        yScroll.pack(side=RIGHT,fill=Y)
+        self.tree.pack(side=LEFT,fill=BOTH,expand=1)
+        for i, change in changes.iterrows():
+            values = [change['row']+1] + [change[x] for x in self.columns[1:]]
+            self.tree.insert('', END, iid=str(i), values=values)
+
+        bf = Frame(self.main)
+        bf.pack(side=TOP,fill=X)
+        b = Button(bf, text="Apply Selected", command=self.applySelected)
+        b.pack(side=LEFT,fill=X,expand=1,pady=1)
+        b = Button(bf, text="Apply All", command=self.applyAll)
+        b.pack(side=LEFT,fill=X,expand=1,pady=1)
+        b = Button(bf, text="Reject All", command=self.quit)
+        b.pack(side=LEFT,fill=X,expand=1,pady=1)
+        self.main.wait_window()
+        return
+
+    def applySelected(self):
+        selected = [int(x) for x in self.tree.selection()]
+        self.accepted = self.changes.loc[selected]
+        self.quit()
+        return
+
+    def applyAll(self):
+        self.accepted = self.changes
+        self.quit()
+        return
+
+    def quit(self):
+        self.main.destroy()
+        return
+
 def addListBox(parent, values=[], width=10):
     """Add an EasyListBox"""
 
@@ -969,7 +1035,7 @@ class FindReplaceDialog(Frame):
         ''' identifies matches to self.serachvar, used for find and replace '''
         
         table=self.table
-        df = table.model.df.applymap(str)
+        df = table.model.df.astype(str)
         s = str(self.searchvar.get())
         queryCells = []
         # get addresses of the matches
@@ -1020,9 +1086,7 @@ class FindReplaceDialog(Frame):
         table=self.table
         df = table.model.df
         r=self.replacevar.get()
-        for match in self.identifyMatches():
-            row,col = match
-            table.model.setValueAt(r,row,col)
+        table.model.updateCells([(row, col, r) for row, col in self.identifyMatches()])
         table.redraw()
         return
 
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import re
+import math
+import threading
+import numpy as np
+import pandas as pd
+
+# folder holding SRTM style .hgt elevation tiles (ie: N35W086.hgt)
+demDirectory = ''
+_demTiles = None
+# meters an entered elevation may differ from the DEM before it is flagged
+elevationTolerance = 100
+# height of a DEM cell with no data
+voidValue = -32768
+feetPerMeter = 3.28084
+tileNamePattern = re.compile(r'^([NS])(\d{2})([EW])(\d{3})\.hgt$', re.IGNORECASE)
+
+
+class DEMTiles(object):
+    """The .hgt tiles in a folder. Each tile is a square grid of big endian
+    16 bit heights covering one degree, named for its south west corner. Tiles
+    are memory mapped when first sampled, so only the pages holding sampled
+    cells are ever read from disk.
+
+    Args:
+        directory: folder containing the tiles
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.paths = {}
+        self.tiles = {}
+        self.lock = threading.Lock()
+        for fileName in os.listdir(directory):
+            match = tileNamePattern.match(fileName)
+            if match is None:
+                continue
+            latitude = int(match.group(2)) * (1 if match.group(1).upper() == 'N' else -1)
+            longitude = int(match.group(4)) * (1 if match.group(3).upper() == 'E' else -1)
+            self.paths[(latitude, longitude)] = os.path.join(directory, fileName)
+        return
+
+    def tile(self, latitude, longitude):
+        """The height grid for the tile whose south west corner is given, or None"""
+
+        key = (latitude, longitude)
+        with self.lock:
+            if key not in self.tiles:
+                path = self.paths.get(key)
+                if path is None:
+                    self.tiles[key] = None
+                else:
+                    # 1 arc second tiles are 3601 cells square, 3 arc second tiles 1201.
+                    size = int(math.sqrt(os.path.getsize(path) // 2))
+                    self.tiles[key] = np.memmap(path, dtype='>i2', mode='r', shape=(size, size))
+            return self.tiles[key]
+
+    def sample(self, latitudes, longitudes):
+        """Bilinearly interpolated heights in meters for arrays of
+        coordinates. NaN where there is no tile, or the surrounding cells
+        hold no data."""
+
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        heights = np.full(latitudes.shape, np.nan)
+        valid = np.isfinite(latitudes) & np.isfinite(longitudes)
+        tileLatitudes = np.floor(np.where(valid, latitudes, 0)).astype(int)
+        tileLongitudes = np.floor(np.where(valid, longitudes, 0)).astype(int)
+        # points are grouped by tile, so each tile is sampled with one set of array operations.
+        tileIds = tileLatitudes * 1000 + tileLongitudes
+        for tileId in np.unique(tileIds[valid]):
+            points = np.nonzero(valid & (tileIds == tileId))[0]
+            grid = self.tile(tileLatitudes[points[0]], tileLongitudes[points[0]])
+            if grid is None:
+                continue
+            last = grid.shape[0] - 1
+            # rows run north to south, columns west to east.
+            y = (tileLatitudes[points] + 1 - latitudes[points]) * last
+            x = (longitudes[points] - tileLongitudes[points]) * last
+            row = np.clip(np.floor(y).astype(int), 0, last - 1)
+            col = np.clip(np.floor(x).astype(int), 0, last - 1)
+            dy = y - row
+            dx = x - col
+            corners = [grid[row, col], grid[row, col + 1], grid[row + 1, col], grid[row + 1, col + 1]]
+            corners = [np.where(corner == voidValue, np.nan, corner.astype(float)) for corner in corners]
+            heights[points] = ((corners[0] * (1 - dx) + corners[1] * dx) * (1 - dy) +
+                               (corners[2] * (1 - dx) + corners[3] * dx) * dy)
+        return heights
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __repr__(self):
+        return 'DEM tiles in {} ({} tiles)'.format(self.directory, len(self))
+
+
+def setDemDirectory(directory):
+    """Use the .hgt tiles in directory for elevations, '' for none"""
+
+    global demDirectory, _demTiles
+    if directory != demDirectory:
+        _demTiles = None
+    demDirectory = directory
+    return
+
+
+def getDemTiles():
+    """The DEM tiles in demDirectory, scanned on first use. None if there are none."""
+
+    global _demTiles
+    if _demTiles is None and demDirectory != '' and os.path.isdir(demDirectory):
+        _demTiles = DEMTiles(demDirectory)
+    if _demTiles is not None and len(_demTiles) == 0:
+        return None
+    return _demTiles
+
+
+def setElevationTolerance(tolerance):
+    global elevationTolerance
+    try:
+        elevationTolerance = max(0.0, float(tolerance))
+    except (TypeError, ValueError):
+        pass
+    return
+
+
+def proposeElevations(self, rows=None, tolerance=None):
+    """Samples the DEM at the coordinates of the given rows (every row by
+    default) in one batch. Blank elevations are filled in, and entered
+    elevations further than tolerance meters from the DEM are flagged.
+
+    Returns a DataFrame of proposed changes with the columns of
+    dialogs.ReviewChangesDialog, and a boolean Series indexed by row marking
+    the flagged elevations. Returns None, None without any DEM tiles."""
+
+    demTiles = getDemTiles()
+    if demTiles is None:
+        return None, None
+    if tolerance is None:
+        tolerance = elevationTolerance
+    df = self.model.df
+    if rows is None:
+        rows = list(range(len(df)))
+    columns = ['decimalLatitude', 'decimalLongitude', 'minimumElevationInMeters', 'otherCatalogNumbers']
+    records = pd.DataFrame({x: df[x].iloc[rows].values if x in df.columns else '' for x in columns},
+                           index=rows, dtype=object)
+    records = records.where(records.notna(), '').astype(str).replace('nan', '')
+    latitudes = pd.to_numeric(records['decimalLatitude'], errors='coerce').values
+    longitudes = pd.to_numeric(records['decimalLongitude'], errors='coerce').values
+    demElevations = pd.Series(np.round(demTiles.sample(latitudes, longitudes)), index=rows)
+    entered = pd.to_numeric(records['minimumElevationInMeters'].str.replace(r'\s*m$', '', regex=True),
+                            errors='coerce')
+
+    sampled = demElevations.notna()
+    blank = sampled & (records['minimumElevationInMeters'] == '')
+    deviates = sampled & ~blank & ~((entered - demElevations).abs() <= tolerance)
+    # phone apps often record feet, say so when that explains the difference.
+    inFeet = deviates & ((entered / feetPerMeter - demElevations).abs() <= tolerance)
+    notes = pd.Series('', index=rows, dtype=object)
+    notes[blank] = 'Elevation from DEM'
+    notes[deviates] = ['Entered elevation is {:.0f} m from the DEM'.format(x) for x in (entered - demElevations)[deviates].abs()]
+    notes[inFeet] = notes[inFeet] + ', it may be in feet'
+    notes[deviates & entered.isna()] = 'Entered elevation is not a number'
+    proposed = blank | deviates
+    changes = pd.DataFrame({'row': records.index[proposed],
+                            'catalogNumber': records['otherCatalogNumbers'][proposed].values,
+                            'field': 'minimumElevationInMeters',
+                            'old': records['minimumElevationInMeters'][proposed].values,
+                            'new': demElevations[proposed].astype(int).astype(str).values,
+                            'note': notes[proposed].values})
+    return changes, deviates
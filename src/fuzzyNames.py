@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# Author
+# License
+import threading
+from collections import Counter, defaultdict
+
+
+def editDistance(a, b, maxDistance=None):
+    """Levenshtein distance between two strings. When maxDistance is given
+    the calculation stops early, returning maxDistance + 1 for any pair
+    known to be further apart."""
+
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if maxDistance is not None and len(a) - len(b) > maxDistance:
+        return maxDistance + 1
+    previous = list(range(len(b) + 1))
+    for i, charA in enumerate(a, 1):
+        current = [i]
+        for j, charB in enumerate(b, 1):
+            current.append(min(previous[j] + 1,                       # deletion
+                               current[j - 1] + 1,                    # insertion
+                               previous[j - 1] + (charA != charB)))   # substitution
+        if maxDistance is not None and min(current) > maxDistance:
+            return maxDistance + 1
+        previous = current
+    return previous[-1]
+
+
+def trigrams(word):
+    """Padded trigrams of a word, ie: 'acer' -> {'  a', ' ac', 'ace', 'cer', 'er '}"""
+
+    word = '  {} '.format(word.lower())
+    return set(word[i:i + 3] for i in range(len(word) - 2))
+
+
+class FuzzyNameMatcher(object):
+    """Finds the closest accepted names in a local checklist for a misspelled
+    scientific name. Candidate genera are gathered from a trigram index and
+    ranked by edit distance, then the epithets filed under those genera are
+    ranked the same way. Indexes are built on first use and kept for the session.
+
+    Args:
+        checklist: a localChecklist.LocalChecklist
+        maxGenera: how many of the closest genera have their epithets compared
+    """
+
+    def __init__(self, checklist, maxGenera=5):
+        self.checklist = checklist
+        self.maxGenera = maxGenera
+        self.lock = threading.Lock()
+        self.genera = None
+        self.gramIndex = None
+        self.genusNames = {}
+        return
+
+    def buildGenusIndex(self):
+        """Index each genus in the checklist by its trigrams"""
+
+        with self.lock:
+            if self.gramIndex is not None:
+                return
+            genera = self.checklist.genera()
+            gramIndex = defaultdict(list)
+            for genusId, genus in enumerate(genera):
+                for gram in trigrams(genus):
+                    gramIndex[gram].append(genusId)
+            self.genera = genera
+            self.gramIndex = gramIndex
+        return
+
+    def matchGenus(self, genus, maxDistance=2):
+        """Returns a list of (distance, genus) for the genera within
+        maxDistance edits of genus, closest first."""
+
+        self.buildGenusIndex()
+        grams = trigrams(genus)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.gramIndex.get(gram, ()))
+        # a single edit can spoil at most three trigrams, anything sharing
+        # fewer than that allowance cannot be within maxDistance.
+        minShared = len(grams) - 3 * maxDistance
+        matches = []
+        for genusId, count in shared.items():
+            if count < minShared:
+                continue
+            candidate = self.genera[genusId]
+            distance = editDistance(genus.lower(), candidate.lower(), maxDistance)
+            if distance <= maxDistance:
+                matches.append((distance, candidate))
+        return sorted(matches)
+
+    def namesInGenus(self, genus):
+        if genus not in self.genusNames:
+            self.genusNames[genus] = [x.split(' ', 1)[1] if ' ' in x else '' for x in self.checklist.namesInGenus(genus)]
+        return self.genusNames[genus]
+
+    def suggest(self, identQuery, k=5, maxDistance=2):
+        """Returns up to k suggestions for a normalized name query (see
+        catalogOfLife.normalizeNameQuery), each a tuple of (distance, matched
+        name, accepted name, authority), closest first. Names matched
+        through a synonym are reported with their accepted name."""
+
+        if len(identQuery) == 0:
+            return []
+        genus = identQuery[0]
+        epithets = ' '.join(identQuery[1:])
+        candidates = []
+        for genusDistance, candidateGenus in self.matchGenus(genus, maxDistance)[:self.maxGenera]:
+            remaining = maxDistance - genusDistance
+            if epithets == '':
+                candidates.append((genusDistance, candidateGenus))
+                continue
+            for candidateEpithets in self.namesInGenus(candidateGenus):
+                distance = editDistance(epithets, candidateEpithets, remaining)
+                if distance <= remaining:
+                    candidates.append((genusDistance + distance, '{} {}'.format(candidateGenus, candidateEpithets)))
+        suggestions = []
+        seen = set()
+        for distance, matchedName in sorted(candidates):
+            if epithets == '':
+                # a genus on its own has no entry to resolve.
+                entry = {'name': matchedName, 'authority': ''}
+            else:
+                entry = self.checklist.lookup(matchedName.split())
+            if entry is None or entry['name'] in seen:
+                continue
+            seen.add(entry['name'])
+            suggestions.append((distance, matchedName, entry['name'], entry['authority']))
+            if len(suggestions) >= k:
+                break
+        return suggestions
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# Author
+# License
+import time
+import threading
+import locality
+from webservice import getClient
+
+# backends asked in order until one finds an address, when none is configured
+defaultBackendNames = ['Google', 'Self-hosted', 'Offline boundaries']
+# Nominatim address keys holding the municipality, most specific last so larger places win
+municipalityKeys = ['hamlet', 'village', 'town', 'municipality', 'city']
+roadKeys = ['road', 'path', 'footway', 'track']
+
+
+class BackendStats(object):
+    """Answer counts and latency for a single geocoder backend"""
+
+    def __init__(self):
+        self.requests = 0
+        self.found = 0
+        self.empty = 0
+        self.failures = 0
+        self.wins = 0
+        self.totalLatency = 0.0
+        self.lock = threading.Lock()
+        return
+
+    def record(self, latency, address):
+        with self.lock:
+            self.requests += 1
+            self.totalLatency += latency
+            if isinstance(address, list):
+                self.found += 1
+            elif address == 'ZERO_RESULTS':
+                self.empty += 1
+            else:
+                self.failures += 1
+        return
+
+    def recordWin(self):
+        with self.lock:
+            self.wins += 1
+        return
+
+    def summary(self):
+        with self.lock:
+            requests = self.requests
+            return {'requests': requests, 'found': self.found, 'empty': self.empty,
+                    'failures': self.failures, 'wins': self.wins,
+                    'successRate': (requests - self.failures) / requests if requests else 0.0,
+                    'meanLatency': self.totalLatency / requests if requests else 0.0}
+
+
+def addressComponent(componentType, longName, shortName=None):
+    types = [componentType] if componentType == 'route' else [componentType, 'political']
+    return {'types': types, 'long_name': longName,
+            'short_name': longName if shortName is None else shortName}
+
+
+class GeocoderBackend(object):
+    """A reverse geocoding service. Subclasses implement query, which returns
+    a list of address components in the format of Google's geocoding api
+    (most specific first, see locality.parseAddressComponents), 'ZERO_RESULTS'
+    for a place without an address, or another status string on failure."""
+
+    name = ''
+    # offline answers are never cached, a connection may give a better one later
+    offline = False
+
+    def __init__(self):
+        self.stats = BackendStats()
+        return
+
+    def available(self):
+        return True
+
+    def query(self, latitude, longitude):
+        raise NotImplementedError
+
+    def lookup(self, latitude, longitude):
+        """query, recording stats. A garbled response is reported as a status."""
+
+        start = time.time()
+        try:
+            address = self.query(latitude, longitude)
+        except OSError as e:
+            # connection problems are reported like any other unsuccessful status.
+            address = 'CONNECTION_ERROR ({})'.format(e)
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            address = 'INVALID_RESPONSE ({})'.format(e)
+        self.stats.record(time.time() - start, address)
+        return address
+
+    def __repr__(self):
+        return 'Geocoder backend {}'.format(self.name)
+
+
+class GoogleBackend(GeocoderBackend):
+    """Google's geocoding api, paced by locality's token bucket to stay
+    within the rate limit and daily quota.
+
+    Args:
+        apiKey: the Google maps api key requests are made with
+    """
+
+    name = 'Google'
+    url = 'https://maps.googleapis.com/maps/api/geocode/json'
+
+    def __init__(self, apiKey=''):
+        GeocoderBackend.__init__(self)
+        self.apiKey = apiKey
+        return
+
+    def available(self):
+        return self.apiKey != ''
+
+    def query(self, latitude, longitude):
+        params = {'latlng': '{},{}'.format(latitude, longitude), 'key': self.apiKey}
+        limiter = locality.getGeocodeLimiter()
+        for backoff in locality.geocodeQuotaBackoff + [None]:
+            if not limiter.acquire():
+                # the day's quota is spent, don't bother asking.
+                return 'OVER_QUERY_LIMIT'
+            locality.getQuotaCache().set(limiter.day, limiter.usedToday)
+            data = getClient().get(self.url, endpoint='Google geocoding', params=params).json()
+            status = data['status']
+            if status != 'OVER_QUERY_LIMIT':
+                break
+            if backoff is None:
+                # still refused after backing off, so the daily quota is spent rather than the rate.
+                limiter.exhaust()
+                break
+            limiter.pause(backoff)
+        if status == 'OK':
+            return data['results'][0]['address_components']
+        return str(status)
+
+
+class SelfHostedBackend(GeocoderBackend):
+    """A Nominatim or Photon server, such as one run on the local network.
+    Either answer is translated into Google style address components.
+
+    Args:
+        url: the server's base url (ie: http://geocoder.local:8080)
+    """
+
+    name = 'Self-hosted'
+
+    def __init__(self, url=''):
+        GeocoderBackend.__init__(self)
+        self.url = url.rstrip('/')
+        return
+
+    def available(self):
+        return self.url != ''
+
+    def query(self, latitude, longitude):
+        params = {'lat': latitude, 'lon': longitude, 'format': 'jsonv2', 'addressdetails': 1}
+        data = getClient().get(self.url + '/reverse', endpoint=self.name, params=params).json()
+        if 'features' in data:
+            # Photon answers with GeoJSON
+            if len(data['features']) == 0:
+                return 'ZERO_RESULTS'
+            return photonComponents(data['features'][0]['properties'])
+        if 'address' in data:
+            return nominatimComponents(data['address'])
+        # Nominatim reports places without an address as an error
+        if 'error' in data:
+            return 'ZERO_RESULTS'
+        raise ValueError('Unrecognized response from {}'.format(self.url))
+
+
+def nominatimComponents(address):
+    """Google style address components from a Nominatim address"""
+
+    components = []
+    for key in roadKeys:
+        if address.get(key):
+            components.append(addressComponent('route', address[key]))
+            break
+    municipality = [address[x] for x in municipalityKeys if address.get(x)]
+    if len(municipality) > 0:
+        components.append(addressComponent('locality', municipality[-1]))
+    if address.get('county'):
+        components.append(addressComponent('administrative_area_level_2', address['county']))
+    if address.get('state'):
+        # ISO3166-2-lvl4 is the state's code, ie: US-TN
+        stateCode = address.get('ISO3166-2-lvl4', '').split('-')[-1]
+        components.append(addressComponent('administrative_area_level_1', address['state'], stateCode or None))
+    if address.get('country'):
+        components.append(addressComponent('country', address['country'], address.get('country_code', '').upper() or None))
+    if len(components) == 0:
+        return 'ZERO_RESULTS'
+    return components
+
+
+def photonComponents(properties):
+    """Google style address components from a Photon feature's properties"""
+
+    components = []
+    if properties.get('street'):
+        components.append(addressComponent('route', properties['street']))
+    if properties.get('city'):
+        components.append(addressComponent('locality', properties['city']))
+    if properties.get('county'):
+        components.append(addressComponent('administrative_area_level_2', properties['county']))
+    if properties.get('state'):
+        components.append(addressComponent('administrative_area_level_1', properties['state']))
+    if properties.get('country'):
+        components.append(addressComponent('country', properties['country'], properties.get('countrycode', '').upper() or None))
+    if len(components) == 0:
+        return 'ZERO_RESULTS'
+    return components
+
+
+class OfflineBackend(GeocoderBackend):
+    """The boundaries imported with locality.importBoundaries"""
+
+    name = 'Offline boundaries'
+    offline = True
+
+    def available(self):
+        return locality.getOfflineGeocoder() is not None
+
+    def query(self, latitude, longitude):
+        return locality.offlineReverseGeoCall(latitude, longitude)
+
+
+# backend classes by the name used in preferences
+availableBackends = {x.name: x for x in [GoogleBackend, SelfHostedBackend, OfflineBackend]}
+
+
+class GeocoderChain(object):
+    """Asks backends in order of preference until one finds an address.
+    An online backend's 'ZERO_RESULTS' is taken as final, since the place has
+    no address, while any other status falls through to the next backend.
+
+    Args:
+        backends: GeocoderBackend instances in order of preference
+    """
+
+    def __init__(self, backends):
+        self.backends = backends
+        return
+
+    def reverseGeoCall(self, latitude, longitude):
+        """Returns the address (or the first failure status) and the backend
+        which answered, None if no backend is available."""
+
+        firstStatus = 'NO_BACKENDS'
+        for backend in self.backends:
+            if not backend.available():
+                continue
+            address = backend.lookup(latitude, longitude)
+            if isinstance(address, list) or (address == 'ZERO_RESULTS' and not backend.offline):
+                backend.stats.recordWin()
+                return address, backend
+            if firstStatus == 'NO_BACKENDS':
+                firstStatus = address
+        return firstStatus, None
+
+    def stats(self):
+        return {x.name: x.stats.summary() for x in self.backends}
+
+
+def buildChain(backendNames=defaultBackendNames, googleApiKey='', selfHostedUrl=''):
+    """A chain of the named backends, unknown names are ignored"""
+
+    settings = {'Google': (googleApiKey,), 'Self-hosted': (selfHostedUrl,)}
+    backends = [availableBackends[x](*settings.get(x, ())) for x in backendNames if x in availableBackends]
+    return GeocoderChain(backends)
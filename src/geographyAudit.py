@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# Author
+# License
+import pandas as pd
+from locality import geocodeMany, knownAddress, offlineReverseGeoCall
+
+# the entered geography checked against the coordinates, and the Google address component type each corresponds to
+auditedFieldTypes = {'country': 'country',
+                     'stateProvince': 'administrative_area_level_1',
+                     'county': 'administrative_area_level_2'}
+# trailing words which name the kind of area rather than the area itself (ie: "Hamilton County")
+areaSuffixPattern = r'\s+(?:county|parish|borough|census area|city and borough|municipality|municipio|province|state|district|department|co)$'
+# alternate country names not matched by either the long or short name from the geocoder
+countryAliases = {'usa': 'us', 'united states of america': 'us', 'united states': 'us',
+                  'mexico': 'mx', 'canada': 'ca'}
+
+
+def normalizeGeographyNames(names):
+    """Comparable forms of geography names: lower case, without accents,
+    punctuation or area suffixes such as "County", and with "St." spelled
+    out. Each distinct name is normalized once, returns a Series like names."""
+
+    distinct = pd.Series(names.unique(), dtype=object)
+    normalized = distinct.fillna('').astype(str).str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+    normalized = normalized.str.lower().str.replace(r'[.,\'"()]', ' ', regex=True)
+    normalized = normalized.str.replace(r'\s+', ' ', regex=True).str.strip()
+    normalized = normalized.str.replace(areaSuffixPattern, '', regex=True)
+    normalized = normalized.str.replace(r'\bst\b', 'saint', regex=True).str.replace(r'\bste\b', 'sainte', regex=True)
+    normalized = normalized.replace(countryAliases)
+    return names.map(dict(zip(distinct, normalized.values)))
+
+
+def addressNames(address):
+    """The long and short name of each audited field in an address, as a
+    flat dict (ie: {'county': ..., 'countyShort': ...})"""
+
+    names = {}
+    if not isinstance(address, list):
+        return names
+    for addressComponent in address:
+        for field, componentType in auditedFieldTypes.items():
+            if addressComponent['types'][0] == componentType:
+                names[field] = addressComponent['long_name']
+                names[field + 'Short'] = addressComponent['short_name']
+    return names
+
+
+def findGeographyConflicts(self, rows=None, online=False):
+    """Compares the entered country, stateProvince and county of every row
+    with coordinates against the geography found for those coordinates, in
+    a single pass over the table. Coordinates are looked up in the geocode
+    cache then the imported boundaries, or with reverseGeoCall when online.
+
+    Returns a DataFrame of conflicts with the columns of
+    dialogs.ReviewChangesDialog (the entered value as old, the geocoded
+    value as new) and a boolean DataFrame indexed by row, with a column
+    per audited field, marking the conflicting cells."""
+
+    df = self.model.df
+    if rows is None:
+        rows = list(range(len(df)))
+    fields = list(auditedFieldTypes)
+    columns = ['decimalLatitude', 'decimalLongitude', 'coordinateUncertaintyInMeters', 'otherCatalogNumbers'] + fields
+    entered = pd.DataFrame({x: df[x].iloc[rows].values if x in df.columns else '' for x in columns},
+                           index=rows, dtype=object)
+    entered = entered.where(entered.notna(), '').astype(str).replace('nan', '')
+    mask = pd.DataFrame(False, index=rows, columns=fields)
+    conflictColumns = ['row', 'catalogNumber', 'field', 'old', 'new', 'note']
+    located = entered[(entered['decimalLatitude'] != '') & (entered['decimalLongitude'] != '')]
+    if len(located) == 0:
+        return pd.DataFrame(columns=conflictColumns), mask
+
+    # each distinct location is looked up once and broadcast to the rows sharing it.
+    coordinateColumns = ['decimalLatitude', 'decimalLongitude', 'coordinateUncertaintyInMeters']
+    locationIds = located.groupby(coordinateColumns, sort=False).ngroup()
+    locations = located.drop_duplicates(coordinateColumns)
+    coordinates = list(zip(locations['decimalLatitude'], locations['decimalLongitude'],
+                           locations['coordinateUncertaintyInMeters']))
+    if online:
+        addresses = geocodeMany(coordinates)
+    else:
+        addresses = [knownAddress(*x) or offlineReverseGeoCall(*x[:2]) for x in coordinates]
+    referenceColumns = fields + [x + 'Short' for x in fields]
+    reference = pd.DataFrame([addressNames(x) for x in addresses], columns=referenceColumns)
+    reference = reference.iloc[locationIds.values].fillna('')
+    reference.index = located.index
+
+    conflicts = []
+    for field in fields:
+        enteredNames = normalizeGeographyNames(located[field])
+        disagrees = ((located[field] != '') & (reference[field] != '') &
+                     (enteredNames != normalizeGeographyNames(reference[field])) &
+                     (enteredNames != normalizeGeographyNames(reference[field + 'Short'])))
+        if not disagrees.any():
+            continue
+        mask.loc[disagrees[disagrees].index, field] = True
+        # country is recorded by its short name, as parseAddressComponents does.
+        proposed = reference[field + 'Short'] if field == 'country' else reference[field]
+        conflicts.append(pd.DataFrame({'row': disagrees[disagrees].index,
+                                       'catalogNumber': located.loc[disagrees, 'otherCatalogNumbers'].values,
+                                       'field': field,
+                                       'old': located.loc[disagrees, field].values,
+                                       'new': proposed[disagrees].values,
+                                       'note': 'Entered {} disagrees with the coordinates'.format(field)}))
+    if len(conflicts) == 0:
+        return pd.DataFrame(columns=conflictColumns), mask
+    conflicts = pd.concat(conflicts, ignore_index=True).sort_values(['row', 'field'], kind='stable')
+    return conflicts.reset_index(drop=True), mask
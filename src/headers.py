@@ -193,6 +193,7 @@ class ColumnHeader(Canvas):
         self.delete('resizesymbol')
         #move column
         if self.draggedcol != None and self.table.currentcol != self.draggedcol:
+            self.table.storeCurrent()
             self.model.moveColumn(self.table.currentcol, self.draggedcol)
             self.table.setSelectedCol(self.draggedcol)
             self.table.redraw()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import io
+import re
+import csv
+import sqlite3
+import zipfile
+import threading
+import xml.etree.ElementTree as ET
+from catalogOfLife import normalizeNameQuery, cleanAuthority
+
+# taxon files we expect to find in a Darwin Core Archive (or Catalog of Life
+# data package) when there is no meta.xml to tell us where the core file is.
+taxonFileNames = ['taxa.txt', 'Taxon.tsv', 'taxon.txt', 'Taxon.txt', 'NameUsage.tsv']
+
+# rank markers which Catalog of Life leaves out of the canonical name
+rankMarkers = ['var.', 'var', 'ssp.', 'ssp', 'subsp.', 'subsp', 'f.', 'forma', 'fo.']
+
+# the longest synonym chain followed inside the checklist
+maxSynonymChain = 10
+
+
+def termName(term):
+    """Strips namespaces from a Darwin Core term,
+    ie: 'dwc:taxonID' or 'http://rs.tdwg.org/dwc/terms/taxonID' become 'taxonID'"""
+
+    term = term.strip().lstrip('\ufeff')
+    return re.split(r'[/:#]', term)[-1]
+
+
+def readArchiveMeta(metaText):
+    """Reads the core file location, delimiter and field positions
+    from a Darwin Core Archive's meta.xml"""
+
+    root = ET.fromstring(metaText)
+    core = [x for x in root.iter() if x.tag.endswith('core')][0]
+    location = [x for x in core.iter() if x.tag.endswith('location')][0].text.strip()
+    delimiter = core.get('fieldsTerminatedBy', '\\t').encode().decode('unicode_escape')
+    headerLines = int(core.get('ignoreHeaderLines', 0))
+    fields = {}
+    for element in core:
+        if element.tag.endswith('id'):
+            fields[int(element.get('index'))] = 'taxonID'
+        elif element.tag.endswith('field') and element.get('index') is not None:
+            fields[int(element.get('index'))] = termName(element.get('term'))
+    return location, delimiter, headerLines, fields
+
+
+def openTaxonFile(sourcePath):
+    """Locates the taxon file within a checklist source, which may be a
+    Darwin Core Archive (zip or unpacked directory) or a bare taxon file.
+    Returns an open text file, the delimiter, header lines to skip
+    and a dict of field positions (or None if the header names the fields)."""
+
+    def opener(name):
+        if zipfile.is_zipfile(sourcePath):
+            archive = zipfile.ZipFile(sourcePath)
+            return io.TextIOWrapper(archive.open(name), encoding='utf-8', errors='replace')
+        return open(os.path.join(sourcePath, name), encoding='utf-8', errors='replace')
+
+    if zipfile.is_zipfile(sourcePath):
+        contents = zipfile.ZipFile(sourcePath).namelist()
+    elif os.path.isdir(sourcePath):
+        contents = os.listdir(sourcePath)
+    else:
+        delimiter = ',' if sourcePath.lower().endswith('.csv') else '\t'
+        return open(sourcePath, encoding='utf-8', errors='replace'), delimiter, 0, None
+
+    if 'meta.xml' in contents:
+        with opener('meta.xml') as metaFile:
+            location, delimiter, headerLines, fields = readArchiveMeta(metaFile.read())
+        return opener(location), delimiter, headerLines, fields
+    for fileName in taxonFileNames:
+        if fileName in contents:
+            return opener(fileName), '\t', 0, None
+    raise ValueError('No taxon file found in {}'.format(sourcePath))
+
+
+def canonicalName(record):
+    """Builds a name without authorship from a taxon record, preferring
+    the atomized genus/epithet fields when the source provides them."""
+
+    genus = record.get('genus') or record.get('genericName') or ''
+    epithet = record.get('specificEpithet', '')
+    if genus != '' and epithet != '':
+        return ' '.join([x for x in [genus, epithet, record.get('infraspecificEpithet', '')] if x != ''])
+    name = record.get('scientificName', '')
+    authority = record.get('scientificNameAuthorship', '')
+    if authority != '' and name.endswith(authority):
+        name = name[:-len(authority)]
+    return ' '.join([x for x in name.split() if x not in rankMarkers])
+
+
+def importChecklist(sourcePath, indexPath):
+    """Builds a compact SQLite index from a local Catalog of Life or
+    Darwin Core Archive taxon dump. Any existing index at indexPath is
+    replaced. Returns the number of names indexed."""
+
+    taxonFile, delimiter, headerLines, fields = openTaxonFile(sourcePath)
+    csv.field_size_limit(2**24)
+    reader = csv.reader(taxonFile, delimiter=delimiter, quoting=csv.QUOTE_NONE)
+    if fields is None:
+        fields = {i: termName(x) for i, x in enumerate(next(reader))}
+    else:
+        for _ in range(headerLines):
+            next(reader)
+
+    def records():
+        for row in reader:
+            record = {fields[i]: x.strip() for i, x in enumerate(row) if i in fields}
+            name = canonicalName(record)
+            if name == '':
+                continue
+            authority = cleanAuthority(record.get('scientificNameAuthorship', ''))
+            identQuery = normalizeNameQuery(name)
+            yield (record.get('taxonID', ''), ' '.join(identQuery), identQuery[0], name, authority,
+                   record.get('taxonomicStatus', '').lower(), record.get('acceptedNameUsageID', ''))
+
+    tempPath = indexPath + '.building'
+    if os.path.exists(tempPath):
+        os.remove(tempPath)
+    conn = sqlite3.connect(tempPath)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('CREATE TABLE taxa (id TEXT, queryKey TEXT, genus TEXT, name TEXT, authority TEXT, '
+                 'status TEXT, acceptedId TEXT)')
+    with conn:
+        conn.executemany('INSERT INTO taxa VALUES (?, ?, ?, ?, ?, ?, ?)', records())
+    # indexes are cheaper to build once the table is full.
+    conn.execute('CREATE INDEX taxa_queryKey ON taxa (queryKey)')
+    conn.execute('CREATE INDEX taxa_id ON taxa (id)')
+    conn.execute('CREATE INDEX taxa_genus ON taxa (genus)')
+    count = conn.execute('SELECT COUNT(*) FROM taxa').fetchone()[0]
+    conn.execute('VACUUM')
+    conn.close()
+    taxonFile.close()
+    os.replace(tempPath, indexPath)
+    return count
+
+
+class LocalChecklist(object):
+    """Read only access to a checklist index built by importChecklist.
+    The index file is memory mapped, so lookups only touch the pages they need.
+
+    Args:
+        indexPath: location of the SQLite index
+    """
+
+    def __init__(self, indexPath):
+        self.indexPath = indexPath
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect('file:{}?mode=ro'.format(indexPath), uri=True, check_same_thread=False)
+        self.conn.execute('PRAGMA mmap_size={}'.format(os.path.getsize(indexPath)))
+        return
+
+    def findByKey(self, queryKey):
+        """All rows for a normalized name, accepted names first"""
+
+        with self.lock:
+            rows = self.conn.execute('SELECT id, name, authority, status, acceptedId FROM taxa '
+                                     'WHERE queryKey = ?', (queryKey,)).fetchall()
+        return sorted(rows, key=lambda x: 'accepted' not in x[3])
+
+    def findById(self, taxonId):
+        with self.lock:
+            return self.conn.execute('SELECT id, name, authority, status, acceptedId FROM taxa '
+                                     'WHERE id = ?', (taxonId,)).fetchone()
+
+    def genera(self):
+        """Every distinct genus in the checklist"""
+
+        with self.lock:
+            return [x[0] for x in self.conn.execute('SELECT DISTINCT genus FROM taxa')]
+
+    def namesInGenus(self, genus):
+        """The distinct normalized names filed under a genus"""
+
+        with self.lock:
+            return [x[0] for x in self.conn.execute('SELECT DISTINCT queryKey FROM taxa WHERE genus = ?',
+                                                    (genus,))]
+
+    def lookup(self, identQuery):
+        """Resolves a normalized name query (see normalizeNameQuery) to its
+        accepted name. Returns a name cache style dict, or None if the name
+        is not in the checklist."""
+
+        for taxonId, name, authority, status, acceptedId in self.findByKey(' '.join(identQuery)):
+            if 'accepted' in status:
+                return {'status': 'accepted', 'name': name, 'authority': authority, 'synonyms': []}
+            if 'synonym' in status and acceptedId != '':
+                synonyms = [name]
+                accepted = self.findById(acceptedId)
+                # follow the synonym chain, giving up on loops or missing taxa.
+                while accepted is not None and 'synonym' in accepted[3] and len(synonyms) < maxSynonymChain:
+                    if accepted[1] in synonyms:
+                        return None
+                    synonyms.append(accepted[1])
+                    accepted = self.findById(accepted[4])
+                if accepted is not None and 'accepted' in accepted[3]:
+                    return {'status': 'accepted', 'name': accepted[1], 'authority': accepted[2],
+                            'synonyms': synonyms}
+        return None
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM taxa').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+        return
+
+    def __repr__(self):
+        return 'Local checklist {}'.format(self.indexPath)
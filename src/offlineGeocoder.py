@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import json
+import math
+import pickle
+import numpy as np
+try:
+    import shapefile
+except ImportError:
+    # pyshp is only needed to read shapefiles, GeoJSON works without it.
+    shapefile = None
+
+# geography columns, and the Google address component type each corresponds to
+levelTypes = {'country': 'country',
+              'stateProvince': 'administrative_area_level_1',
+              'county': 'administrative_area_level_2',
+              'municipality': 'locality'}
+# properties tried, in order, for a boundary's name and its short name (ie: ISO code)
+nameFields = ['NAME', 'name', 'NAME_EN', 'name_en', 'NAMELSAD', 'ADMIN', 'admin', 'NAME_2', 'NAME_1', 'NAME_0']
+shortNameFields = ['ISO_A2', 'iso_a2', 'ISO2', 'iso2', 'STUSPS', 'postal', 'POSTAL', 'ABBREV']
+
+
+def readGeoJSON(path):
+    """Yields (properties, rings) for each polygon feature of a GeoJSON file,
+    rings being lists of (longitude, latitude) points."""
+
+    with open(path, encoding='utf-8') as geoFile:
+        data = json.load(geoFile)
+    features = data['features'] if data.get('type') == 'FeatureCollection' else [data]
+    for feature in features:
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') == 'Polygon':
+            rings = geometry['coordinates']
+        elif geometry.get('type') == 'MultiPolygon':
+            rings = [ring for polygon in geometry['coordinates'] for ring in polygon]
+        else:
+            continue
+        yield feature.get('properties') or {}, rings
+
+
+def readShapefile(path):
+    """Yields (properties, rings) for each polygon of a shapefile. Needs pyshp."""
+
+    if shapefile is None:
+        raise ImportError('Reading shapefiles requires pyshp (pip install pyshp)')
+    reader = shapefile.Reader(path)
+    fields = [x[0] for x in reader.fields[1:]]
+    for shapeRecord in reader.iterShapeRecords():
+        shape = shapeRecord.shape
+        if len(shape.points) == 0:
+            continue
+        parts = list(shape.parts) + [len(shape.points)]
+        rings = [shape.points[parts[i]:parts[i + 1]] for i in range(len(parts) - 1)]
+        yield dict(zip(fields, shapeRecord.record)), rings
+
+
+def readBoundaries(path):
+    if path.lower().endswith('.shp'):
+        return readShapefile(path)
+    return readGeoJSON(path)
+
+
+def firstProperty(properties, fieldNames):
+    for field in fieldNames:
+        if str(properties.get(field, '')).strip() not in ['', 'None', '-99']:
+            return str(properties[field]).strip()
+    return ''
+
+
+class BoundaryLayer(object):
+    """The boundaries for one level of geography (ie: counties), indexed by
+    a uniform grid. Each grid cell lists the boundaries whose bounding box
+    touches it, so a point is only tested against the few polygons near it.
+
+    Args:
+        boundaries: a list of (name, short name, rings)
+        cellSize: width and height of a grid cell in degrees
+    """
+
+    def __init__(self, boundaries, cellSize=1.0):
+        self.cellSize = cellSize
+        self.names = []
+        self.shortNames = []
+        self.bboxes = []
+        # each boundary's edges as x1, y1, x2, y2 arrays, so a point is tested
+        # against every edge at once. Holes and multiple parts need no special
+        # treatment under the even-odd rule.
+        self.edges = []
+        self.grid = {}
+        for name, shortName, rings in boundaries:
+            edges = []
+            for ring in rings:
+                ring = np.asarray(ring, dtype=float)[:, :2]
+                if len(ring) < 3:
+                    continue
+                edges.append(np.hstack([ring, np.roll(ring, -1, axis=0)]))
+            if len(edges) == 0:
+                continue
+            edges = np.vstack(edges)
+            boundaryId = len(self.names)
+            self.names.append(name)
+            self.shortNames.append(shortName)
+            bbox = (edges[:, 0].min(), edges[:, 1].min(), edges[:, 0].max(), edges[:, 1].max())
+            self.bboxes.append(bbox)
+            self.edges.append((edges[:, 0].copy(), edges[:, 1].copy(), edges[:, 2].copy(), edges[:, 3].copy()))
+            for cellX in range(self.cell(bbox[0]), self.cell(bbox[2]) + 1):
+                for cellY in range(self.cell(bbox[1]), self.cell(bbox[3]) + 1):
+                    self.grid.setdefault((cellX, cellY), []).append(boundaryId)
+        return
+
+    def cell(self, degrees):
+        return int(math.floor(degrees / self.cellSize))
+
+    def contains(self, boundaryId, longitude, latitude):
+        """Point in polygon test by counting edge crossings"""
+
+        x1, y1, x2, y2 = self.edges[boundaryId]
+        straddles = (y1 > latitude) != (y2 > latitude)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossingX = x1 + (latitude - y1) * (x2 - x1) / (y2 - y1)
+        return np.count_nonzero(straddles & (longitude < crossingX)) % 2 == 1
+
+    def find(self, longitude, latitude):
+        """Index of the boundary containing a point, or None"""
+
+        for boundaryId in self.grid.get((self.cell(longitude), self.cell(latitude)), ()):
+            minX, minY, maxX, maxY = self.bboxes[boundaryId]
+            if minX <= longitude <= maxX and minY <= latitude <= maxY and self.contains(boundaryId, longitude, latitude):
+                return boundaryId
+        return None
+
+    def __len__(self):
+        return len(self.names)
+
+
+class OfflineGeocoder(object):
+    """Reverse geocodes coordinates against local administrative boundaries,
+    one BoundaryLayer per level of geography. Answers in the same address
+    component format as Google's geocoding api, so results can be used in
+    place of reverseGeoCall's.
+
+    Args:
+        cellSize: grid cell size in degrees for new layers
+    """
+
+    def __init__(self, cellSize=1.0):
+        self.cellSize = cellSize
+        self.layers = {}
+        return
+
+    def addLayer(self, level, path, nameField=None, shortNameField=None):
+        """Load the boundaries for a level ('country', 'stateProvince',
+        'county' or 'municipality') from a GeoJSON file or shapefile,
+        replacing any layer already held for that level. Returns the
+        number of boundaries loaded."""
+
+        if level not in levelTypes:
+            raise ValueError('Unknown level {}, expected one of {}'.format(level, ', '.join(levelTypes)))
+        names = [nameField] if nameField else nameFields
+        shortNames = [shortNameField] if shortNameField else shortNameFields
+        boundaries = []
+        for properties, rings in readBoundaries(path):
+            name = firstProperty(properties, names)
+            boundaries.append((name, firstProperty(properties, shortNames) or name, rings))
+        self.layers[level] = BoundaryLayer(boundaries, self.cellSize)
+        return len(self.layers[level])
+
+    def lookup(self, latitude, longitude):
+        """Address components for a point, or 'ZERO_RESULTS' when it
+        falls outside every boundary."""
+
+        latitude = float(latitude)
+        longitude = float(longitude)
+        address = []
+        # Google lists the most specific component first.
+        for level in ['municipality', 'county', 'stateProvince', 'country']:
+            layer = self.layers.get(level)
+            if layer is None:
+                continue
+            boundaryId = layer.find(longitude, latitude)
+            if boundaryId is not None:
+                address.append({'types': [levelTypes[level], 'political'],
+                                'long_name': layer.names[boundaryId],
+                                'short_name': layer.shortNames[boundaryId]})
+        if len(address) == 0:
+            return 'ZERO_RESULTS'
+        return address
+
+    def lookupMany(self, latitudes, longitudes):
+        """lookup for sequences of coordinates, returning a list"""
+
+        return [self.lookup(latitude, longitude) for latitude, longitude in zip(latitudes, longitudes)]
+
+    def save(self, path):
+        """Store the indexed boundaries, replacing any file at path"""
+
+        tempPath = path + '.saving'
+        with open(tempPath, 'wb') as indexFile:
+            pickle.dump(self, indexFile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tempPath, path)
+        return
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as indexFile:
+            return pickle.load(indexFile)
+
+    def __repr__(self):
+        return 'Offline geocoder with {}'.format(', '.join('{} {}'.format(len(y), x) for x, y in self.layers.items()))
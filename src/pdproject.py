@@ -15,7 +15,7 @@ class PDDesktop(Frame):
             f.pack(fill=BOTH,expand=1)
             df = pd.DataFrame()
             self.table = pt = Table(f, dataframe=df,
-                                    showtoolbar=True, showstatusbar=False)
+                                    showtoolbar=True, showstatusbar=True)
             self.createMenuBar()
             pt.show()
             #return
@@ -37,12 +37,19 @@ class PDDesktop(Frame):
                 self.menu.add_cascade(label='File',menu=self.file_menu['var'])
         
                 self.edit_menu={'01Undo Last Change':{'cmd': self.table.undo},
-                                '02Preferences' :{'cmd': self.table.showPrefs},
-                                '03sep':'',
-                                '04Find/Replace':{'cmd':self.findText},
-                                '05sep':'',
-                                '06Add Row Site to Records':{'cmd': self.table.addSite},
-                                '07Add Row From Site':{'cmd':self.table.addRowFromSite}
+                                '02Redo Last Change':{'cmd': self.table.redo},
+                                '03Preferences' :{'cmd': self.table.showPrefs},
+                                '04sep':'',
+                                '05Find/Replace':{'cmd':self.findText},
+                                '06sep':'',
+                                '07Add Row Site to Records':{'cmd': self.table.addSite},
+                                '08Add Row From Site':{'cmd':self.table.addRowFromSite},
+                                '09sep':'',
+                                '10Import Local Checklist':{'cmd':self.table.importLocalChecklist},
+                                '11Import Boundaries':{'cmd':self.table.importBoundaries},
+                                '12Audit Geography':{'cmd':self.table.auditGeography},
+                                '13Set Elevation Tiles':{'cmd':self.table.setElevationTiles},
+                                '14Check Elevations':{'cmd':self.table.checkElevations}
                                 }
                 self.edit_menu = self.createPulldown(self.menu,self.edit_menu)
                 self.menu.add_cascade(label='Edit',menu=self.edit_menu['var'])
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# writes between sweeps for expired entries
+purgeInterval = 1000
+
+
+def defaultCachePath(fileName):
+    """Location for cache files, kept beside the preferences file in the
+    user's home directory."""
+
+    return os.path.join(os.path.expanduser('~'), fileName)
+
+
+class PersistentCache(object):
+    """A size bounded key/value store with expiring entries, kept in an
+    SQLite file so that lookups survive between sessions.
+
+    Values are stored as json, so anything made of dicts, lists, strings
+    and numbers can be cached. Entries past their expiry are treated as
+    misses, and once the cache holds more than maxEntries the least recently
+    used entries are evicted.
+
+    Args:
+        path: the SQLite file to use, ':memory:' for a throw away cache
+        table: table name, allows several caches to share one file
+        ttl: default lifetime of an entry in seconds, None never expires
+        maxEntries: number of entries kept before eviction begins
+    """
+
+    def __init__(self, path, table='cache', ttl=None, maxEntries=50000):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # lookups may come from worker threads, sqlite connections may not
+        # be shared between threads without serializing access ourselves.
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        if path != ':memory:':
+            self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS {} (key TEXT PRIMARY KEY, value TEXT, '
+                          'expires REAL, accessed REAL)'.format(self.table))
+        self.conn.execute('CREATE INDEX IF NOT EXISTS {0}_accessed ON {0} (accessed)'.format(self.table))
+        # the row count is kept here, so writes don't have to count the table.
+        self.entries = len(self)
+        self.writesSincePurge = 0
+        return
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if it is missing
+        or has expired."""
+
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT value, expires FROM {} WHERE key = ?'.format(self.table),
+                                    (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value, expires = row
+            if expires is not None and expires < now:
+                self.conn.execute('DELETE FROM {} WHERE key = ?'.format(self.table), (key,))
+                self.entries -= 1
+                self.misses += 1
+                return default
+            self.conn.execute('UPDATE {} SET accessed = ? WHERE key = ?'.format(self.table), (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        """Store value under key. ttl overrides the cache's default lifetime."""
+
+        if ttl is None:
+            ttl = self.ttl
+        now = time.time()
+        expires = None if ttl is None else now + ttl
+        with self.lock:
+            exists = self.conn.execute('SELECT 1 FROM {} WHERE key = ?'.format(self.table), (key,)).fetchone()
+            self.conn.execute('INSERT OR REPLACE INTO {} (key, value, expires, accessed) '
+                              'VALUES (?, ?, ?, ?)'.format(self.table),
+                              (key, json.dumps(value), expires, now))
+            if exists is None:
+                self.entries += 1
+            self.writesSincePurge += 1
+            # expired entries are swept now and then, the least recently used only once over the limit.
+            if self.writesSincePurge >= purgeInterval or self.entries > self.maxEntries:
+                self.evict()
+        return
+
+    def delete(self, key):
+        """Remove a single entry"""
+
+        with self.lock:
+            deleted = self.conn.execute('DELETE FROM {} WHERE key = ?'.format(self.table), (key,)).rowcount
+            self.entries -= max(deleted, 0)
+        return
+
+    def __contains__(self, key):
+        with self.lock:
+            row = self.conn.execute('SELECT expires FROM {} WHERE key = ?'.format(self.table),
+                                    (key,)).fetchone()
+        return row is not None and (row[0] is None or row[0] >= time.time())
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM {}'.format(self.table)).fetchone()[0]
+
+    def items(self):
+        """Every unexpired (key, value) pair. Doesn't count as a lookup."""
+
+        with self.lock:
+            rows = self.conn.execute('SELECT key, value FROM {} WHERE expires IS NULL OR expires >= ?'.format(self.table),
+                                     (time.time(),)).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def evict(self):
+        """Drop expired entries, then the least recently used entries until
+        the cache is back within maxEntries."""
+
+        with self.lock:
+            expired = self.conn.execute('DELETE FROM {} WHERE expires IS NOT NULL AND expires < ?'.format(self.table),
+                                        (time.time(),)).rowcount
+            self.entries -= max(expired, 0)
+            self.writesSincePurge = 0
+            excess = self.entries - self.maxEntries
+            if excess > 0:
+                self.conn.execute('DELETE FROM {0} WHERE key IN (SELECT key FROM {0} '
+                                  'ORDER BY accessed LIMIT ?)'.format(self.table), (excess,))
+                self.entries -= excess
+                self.evictions += excess
+        return
+
+    def clear(self):
+        """Remove every entry and reset the counters"""
+
+        with self.lock:
+            self.conn.execute('DELETE FROM {}'.format(self.table))
+            self.entries = 0
+            self.hits = self.misses = self.evictions = 0
+        return
+
+    def stats(self):
+        """Hit/miss counters for this session, and the current size"""
+
+        lookups = self.hits + self.misses
+        hitRate = self.hits / lookups if lookups else 0.0
+        return {'hits': self.hits, 'misses': self.misses, 'hitRate': hitRate,
+                'evictions': self.evictions, 'entries': len(self)}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+        return
+
+    def __repr__(self):
+        return 'PersistentCache {} with {} entries'.format(self.table, len(self))
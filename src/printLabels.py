@@ -179,6 +179,8 @@ def genPrintLabelPDFs(labelDataInput,defaultFileName = None):
 
     def sciName(textfield1,textfield2,styleKey,prefix = ''):
         if len(dfl(textfield1)) > 0 :
+            if len(dfl(textfield1 + 'HTML')) > 0:    #use the markup from catalogOfLife.formatScientificNames if it was provided.
+                return Paragraph(dfl(textfield1 + 'HTML') + ' ' + dfl(textfield2),style = stylesheet(styleKey))
             return Paragraph(('<i>{}</i>'.format(dfl(textfield1))) + ' ' + dfl(textfield2),style = stylesheet(styleKey))
         else:
             return Paragraph('', style = stylesheet(styleKey))
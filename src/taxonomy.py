@@ -80,30 +80,39 @@ def colNameSearch(givenScientificName):
             return colNameSearch(result.find('accepted_name/name').text)
 
 
+# kept between searches, see getColJsonProvider
+_colJsonProvider = None
+
+
+def getColJsonProvider():
+    """Returns the configured resolver's CoL json provider, or one made on
+    first use and kept, so searches share its cache connection."""
+
+    global _colJsonProvider
+    from catalogOfLife import getTaxonomyResolver
+    from taxonomyProviders import ColJsonProvider
+    for provider in getTaxonomyResolver().providers:
+        if isinstance(provider, ColJsonProvider):
+            return provider
+    if _colJsonProvider is None:
+        _colJsonProvider = ColJsonProvider()
+    return _colJsonProvider
+
+
 def iPlantNameSearch(givenScientificName):
+    """Asks Catalog of Life's json webservice for the accepted name,
+    returning (name, authority), ('ERROR', message), 'http_Error' or None.
+    See taxonomyProviders.ColJsonProvider."""
+
+    from catalogOfLife import normalizeNameQuery, nameCacheEntryToResult
     queryWordList = givenScientificName.split()
     # dump any indications of infraspecific taxa
     omitList = ['var.','ssp.','x']
     query = ' '.join([x for x in queryWordList if x not in omitList])
-    queryText = query.replace(' ','%20')
-    url = 'http://www.catalogueoflife.org/annual-checklist/2017/webservice?name={}&format=json&response=full'.format(queryText)
-    
-    data = requests.get(url=url)
-    data = json.loads(data.text)
-    
-    print(data.keys)
-    nameStatus = data.get('results')[0].get('name_status')
-    if 'accepted name' not in nameStatus: # if it is not accepted it'll be organized differently...
-        acceptedName = data.get('results')[0].get('accepted_name').get('name')
-        query = acceptedName
-        queryText = query.replace(' ','%20')
-        url = 'http://www.catalogueoflife.org/annual-checklist/2017/webservice?name={}&format=json&response=full'.format(acceptedName)
-        data = requests.get(url=url)
-        data = json.loads(data.text)
-    else:
-        acceptedName = data.get('results')[0].get('name')
-    
-    print(acceptedName)
+    entry = getColJsonProvider().lookup(normalizeNameQuery(query))
+    if entry is None:
+        return 'http_Error'
+    return nameCacheEntryToResult(entry)
 
 
     
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# Author
+# License
+import time
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import catalogOfLife
+from persistentCache import PersistentCache, defaultCachePath
+from webservice import getClient
+
+# preference order used when none is configured. A single remote provider, so
+# a name missing from the local checklist costs one set of requests.
+defaultProviderNames = ['Local checklist', 'CoL']
+# 'first' takes the first accepted answer to arrive, 'preference' waits on
+# more preferred providers before settling for a less preferred answer.
+resolverModes = ['first', 'preference']
+
+
+class ProviderStats(object):
+    """Answer counts, latency and cache use for a single provider"""
+
+    def __init__(self):
+        self.requests = 0
+        self.accepted = 0
+        self.failures = 0
+        self.cacheHits = 0
+        self.wins = 0
+        self.totalLatency = 0.0
+        self.lock = threading.Lock()
+        return
+
+    def record(self, latency, entry, cacheHit=False):
+        with self.lock:
+            self.requests += 1
+            self.totalLatency += latency
+            if entry is None:
+                self.failures += 1
+            elif entry['status'] == 'accepted':
+                self.accepted += 1
+            if cacheHit:
+                self.cacheHits += 1
+        return
+
+    def recordWin(self):
+        with self.lock:
+            self.wins += 1
+        return
+
+    def summary(self):
+        with self.lock:
+            requests = self.requests
+            return {'requests': requests, 'accepted': self.accepted, 'failures': self.failures,
+                    'cacheHits': self.cacheHits, 'wins': self.wins,
+                    'successRate': (requests - self.failures) / requests if requests else 0.0,
+                    'cacheHitRate': self.cacheHits / requests if requests else 0.0,
+                    'meanLatency': self.totalLatency / requests if requests else 0.0}
+
+
+class TaxonomyProvider(object):
+    """A source of accepted scientific names. Subclasses implement query,
+    which resolves a normalized name query (see catalogOfLife.normalizeNameQuery)
+    to a name cache style dict with a 'status' of 'accepted', 'error' or
+    'unmatched', or returns None when the source could not be reached.
+
+    Args:
+        cache: a PersistentCache for this provider's answers, or None
+    """
+
+    name = ''
+    # offline providers are asked before any request goes out
+    offline = False
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.stats = ProviderStats()
+        return
+
+    def available(self):
+        return True
+
+    def query(self, identQuery):
+        raise NotImplementedError
+
+    def lookup(self, identQuery):
+        """query with this provider's cache in front of it, recording stats"""
+
+        start = time.time()
+        cacheKey = ' '.join(identQuery)
+        if self.cache is not None:
+            entry = self.cache.get(cacheKey)
+            if entry is not None:
+                self.stats.record(time.time() - start, entry, cacheHit=True)
+                return entry
+        try:
+            entry = self.query(identQuery)
+        except (OSError, ValueError, ET.ParseError):
+            # a garbled response counts as the source being unavailable.
+            entry = None
+        self.stats.record(time.time() - start, entry)
+        if entry is not None and self.cache is not None:
+            if entry['status'] == 'accepted':
+                self.cache.set(cacheKey, entry)
+            else:
+                self.cache.set(cacheKey, entry, ttl=catalogOfLife.nameErrorCacheTTL)
+        return entry
+
+    def __repr__(self):
+        return 'Taxonomy provider {}'.format(self.name)
+
+
+class ColTerseProvider(TaxonomyProvider):
+    """Catalog of Life's terse xml webservice, following synonyms and
+    hedging across the annual checklists (see catalogOfLife.colNameLookup)."""
+
+    name = 'CoL'
+
+    def __init__(self):
+        TaxonomyProvider.__init__(self, catalogOfLife.getNameCache())
+        return
+
+    def query(self, identQuery):
+        return catalogOfLife.colNameLookup(identQuery)
+
+
+class ColJsonProvider(TaxonomyProvider):
+    """Catalog of Life's json webservice. A full response carries the
+    accepted name of a synonym, so synonyms resolve in a single request."""
+
+    name = 'CoL json'
+    url = 'http://webservice.catalogueoflife.org/col/webservice'
+
+    def __init__(self):
+        TaxonomyProvider.__init__(self, PersistentCache(defaultCachePath('.pdproject_namecache.sqlite'),
+                                                        table='colJsonNames', ttl=catalogOfLife.nameCacheTTL,
+                                                        maxEntries=catalogOfLife.nameCacheMaxEntries))
+        return
+
+    def query(self, identQuery):
+        params = {'name': ' '.join(identQuery), 'format': 'json', 'response': 'full'}
+        data = getClient().get(self.url, endpoint=self.name, params=params).json()
+        if data.get('error_message', '') != '':
+            return {'status': 'error', 'message': str(data['error_message'])}
+        for result in data.get('results', []):
+            nameStatus = result.get('name_status', '')
+            if nameStatus == 'accepted name':
+                return {'status': 'accepted', 'name': result['name'],
+                        'authority': catalogOfLife.cleanAuthority(result.get('author', '')), 'synonyms': []}
+            elif 'synonym' in nameStatus and result.get('accepted_name'):
+                acceptedName = result['accepted_name']
+                return {'status': 'accepted', 'name': acceptedName['name'],
+                        'authority': catalogOfLife.cleanAuthority(acceptedName.get('author', '')),
+                        'synonyms': [' '.join(identQuery)]}
+        return {'status': 'unmatched'}
+
+
+class LocalChecklistProvider(TaxonomyProvider):
+    """The offline checklist set up with catalogOfLife.setLocalChecklist"""
+
+    name = 'Local checklist'
+    offline = True
+
+    def available(self):
+        return catalogOfLife.getLocalChecklist() is not None
+
+    def query(self, identQuery):
+        entry = catalogOfLife.getLocalChecklist().lookup(identQuery)
+        if entry is None:
+            return {'status': 'unmatched'}
+        return entry
+
+
+# provider classes by the name used in preferences
+availableProviders = {x.name: x for x in [LocalChecklistProvider, ColTerseProvider, ColJsonProvider]}
+
+
+class TaxonomyResolver(object):
+    """Resolves names against several providers at once. Offline providers
+    are asked first, and an accepted answer from one ahead of every online
+    provider is used without any requests. Otherwise the online providers
+    are queried concurrently.
+
+    In 'first' mode the first accepted answer to arrive is used, in
+    'preference' mode the most preferred accepted answer is used, and less
+    preferred answers only once every provider ahead of them has failed to
+    accept the name. Without any accepted answer an error is preferred to
+    an unmatched name. A winner missing its authority borrows it from
+    another provider which accepted the same name.
+
+    Args:
+        providers: TaxonomyProvider instances in order of preference
+        mode: 'first' or 'preference'
+        maxWorkers: concurrent provider queries across all lookups
+    """
+
+    def __init__(self, providers, mode='first', maxWorkers=24):
+        self.providers = providers
+        self.mode = mode
+        self.executor = ThreadPoolExecutor(max_workers=maxWorkers)
+        return
+
+    def decide(self, providers, answers, arrivals):
+        """The provider whose answer should be used, or None if the
+        answers so far don't settle it."""
+
+        if self.mode == 'first':
+            for provider in arrivals:
+                if answers[provider] is not None and answers[provider]['status'] == 'accepted':
+                    return provider
+            return None
+        for provider in providers:
+            if provider not in answers:
+                return None
+            if answers[provider] is not None and answers[provider]['status'] == 'accepted':
+                return provider
+        return None
+
+    def fallback(self, providers, answers):
+        """The most preferred error, then unmatched, answer if nothing was accepted"""
+
+        for status in ['error', 'unmatched']:
+            for provider in providers:
+                if answers.get(provider) is not None and answers[provider]['status'] == status:
+                    return provider
+        return None
+
+    def merge(self, winner, answers):
+        entry = dict(answers[winner])
+        if entry['status'] == 'accepted' and entry.get('authority', '') == '':
+            for answer in answers.values():
+                if answer is not None and answer['status'] == 'accepted' and answer['name'] == entry['name'] \
+                        and answer.get('authority', '') != '':
+                    entry['authority'] = answer['authority']
+                    break
+        return entry
+
+    def resolve(self, identQuery):
+        """Returns a name cache style dict for a normalized name query, or
+        None if no provider could be reached."""
+
+        providers = [x for x in self.providers if x.available()]
+        answers = {}
+        arrivals = []
+        online = []
+        for provider in providers:
+            if provider.offline and len(online) == 0:
+                answers[provider] = provider.lookup(identQuery)
+                arrivals.append(provider)
+                if answers[provider] is not None and answers[provider]['status'] == 'accepted':
+                    provider.stats.recordWin()
+                    return answers[provider]
+            else:
+                online.append(provider)
+
+        futures = {self.executor.submit(x.lookup, identQuery): x for x in online}
+        pending = set(futures)
+        winner = None
+        while len(pending) > 0 and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # several answers arriving together are taken in order of preference.
+            for future in sorted(done, key=lambda x: providers.index(futures[x])):
+                answers[futures[future]] = future.result()
+                arrivals.append(futures[future])
+            winner = self.decide(providers, answers, arrivals)
+        # slower providers still fill their caches in the background.
+        if winner is None:
+            winner = self.fallback(providers, answers)
+        if winner is None:
+            return None
+        winner.stats.recordWin()
+        return self.merge(winner, answers)
+
+    def stats(self):
+        return {x.name: x.stats.summary() for x in self.providers}
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        return
+
+
+def buildResolver(providerNames=defaultProviderNames, mode='first'):
+    """A resolver for the named providers, unknown names are ignored"""
+
+    providers = [availableProviders[x]() for x in providerNames if x in availableProviders]
+    if mode not in resolverModes:
+        mode = 'first'
+    return TaxonomyResolver(providers, mode)
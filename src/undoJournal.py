@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import atexit
+import shutil
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+
+# megabytes of undo history held in memory, older steps are written to disk
+memoryLimit = 200
+
+
+def setUndoMemoryLimit(megabytes):
+    global memoryLimit
+    try:
+        memoryLimit = max(0.0, float(megabytes))
+    except (TypeError, ValueError):
+        pass
+    return
+
+
+def valuesSize(values):
+    """Rough bytes held by a sequence of cell values"""
+
+    values = pd.Series(values)
+    if values.dtype == object:
+        return int(values.memory_usage(deep=True))
+    return int(values.memory_usage())
+
+
+class CellsChange(object):
+    """Cells of one column to set back to values, by row position"""
+
+    def __init__(self, colname, rows, values):
+        self.colname = colname
+        self.rows = np.asarray(rows)
+        self.values = list(values)
+        return
+
+    def apply(self, model):
+        # a column since dropped outside the model has nothing to set back
+        if self.colname in model.df.columns:
+            model.setColumnValues(pd.Series(self.values, index=self.rows), model.df.columns.get_loc(self.colname))
+        return
+
+    def size(self):
+        return self.rows.nbytes + valuesSize(self.values)
+
+
+class RowsInserted(object):
+    """Rows inserted at the given positions, undone by deleting them"""
+
+    def __init__(self, positions):
+        self.positions = list(positions)
+        return
+
+    def apply(self, model):
+        model.deleteRows(self.positions)
+        # insertRows renumbered the index, so the table before it had a plain one too.
+        model.df.reset_index(drop=True, inplace=True)
+        return
+
+    def size(self):
+        return 8 * len(self.positions)
+
+
+class RowsDeleted(object):
+    """Deleted rows, and the positions they are restored to"""
+
+    def __init__(self, positions, rows):
+        self.positions = list(positions)
+        self.rows = rows
+        return
+
+    def apply(self, model):
+        model.restoreRows(self.rows, self.positions)
+        return
+
+    def size(self):
+        return 8 * len(self.positions) + int(self.rows.memory_usage(deep=True).sum())
+
+
+class RowsReordered(object):
+    """A new order for the rows, as the current position of each"""
+
+    def __init__(self, order):
+        self.order = np.asarray(order)
+        return
+
+    def apply(self, model):
+        model.reorderRows(self.order)
+        return
+
+    def size(self):
+        return self.order.nbytes
+
+
+class ColumnsAdded(object):
+    """Columns added by name, undone by dropping them"""
+
+    def __init__(self, colnames):
+        self.colnames = list(colnames)
+        return
+
+    def apply(self, model):
+        colnames = [x for x in self.colnames if x in model.df.columns]
+        if len(colnames) > 0:
+            model.deleteColumns([model.df.columns.get_loc(x) for x in colnames])
+        return
+
+    def size(self):
+        return 0
+
+
+class ColumnsDropped(object):
+    """Dropped columns, and the positions they are restored to"""
+
+    def __init__(self, positions, columns):
+        self.positions = list(positions)
+        self.columns = columns
+        return
+
+    def apply(self, model):
+        model.restoreColumns(self.columns, self.positions)
+        return
+
+    def size(self):
+        return int(self.columns.memory_usage(deep=True).sum())
+
+
+class ColumnMoved(object):
+    """A column to move from one position back to another"""
+
+    def __init__(self, oldindex, newindex):
+        self.oldindex = oldindex
+        self.newindex = newindex
+        return
+
+    def apply(self, model):
+        model.moveColumn(self.oldindex, self.newindex)
+        return
+
+    def size(self):
+        return 0
+
+
+class FrameReplaced(object):
+    """A whole table replaced outside the finer operations (ie: cleaning or
+    pasting a table), restored by putting the old frame back. The old frame
+    is kept by reference rather than copied."""
+
+    def __init__(self, df):
+        self.df = df
+        return
+
+    def apply(self, model):
+        model.df = self.df
+        return
+
+    def size(self):
+        # a shallow count, walking every string of a whole table would cost more than the change.
+        return int(self.df.memory_usage(deep=False).sum())
+
+
+class UndoStep(object):
+    """The inverse operations recorded for one change to the table, in the
+    order they were recorded. Held in memory, or in a file once spilled."""
+
+    def __init__(self, operations=None):
+        self.operations = operations if operations is not None else []
+        self.bytes = sum(x.size() for x in self.operations)
+        self.path = None
+        return
+
+    def append(self, operation):
+        self.operations.append(operation)
+        self.bytes += operation.size()
+        return
+
+    def spill(self, directory):
+        fd, self.path = tempfile.mkstemp(suffix='.undo', dir=directory)
+        with os.fdopen(fd, 'wb') as spillFile:
+            pickle.dump(self.operations, spillFile, protocol=pickle.HIGHEST_PROTOCOL)
+        self.operations = None
+        return
+
+    def load(self):
+        if self.path is not None:
+            with open(self.path, 'rb') as spillFile:
+                self.operations = pickle.load(spillFile)
+            self.discard()
+        return self.operations
+
+    def discard(self):
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+        return
+
+    def inMemory(self):
+        return self.path is None
+
+    def __len__(self):
+        return len(self.operations) if self.operations is not None else 0
+
+
+class UndoJournal(object):
+    """Unlimited undo and redo of table changes, as the inverse operations the
+    TableModel records while it changes. Each step costs memory in proportion
+    to what it changed rather than to the table. Once the steps held in
+    memory pass memoryLimit, the oldest are written to a temporary folder
+    and read back when they are reached."""
+
+    def __init__(self):
+        self.undoSteps = []
+        self.redoSteps = []
+        # ops recorded after begin() start a new step, later ones join it.
+        self.newStep = True
+        self.collecting = None
+        self.spillDirectory = None
+        # bytes held by the steps in memory, kept up to date rather than summed on each change.
+        self.bytesInMemory = 0
+        # steps are spilled oldest first, so the spilled steps lead each list.
+        self.undoSpilled = 0
+        self.redoSpilled = 0
+        return
+
+    def begin(self):
+        """Start a new undo step with the next change recorded"""
+
+        self.newStep = True
+        return
+
+    def record(self, operation):
+        """Called by the model with the inverse of each change it makes"""
+
+        if self.collecting is not None:
+            # the inverses of an undo or redo being applied
+            self.collecting.append(operation)
+            return
+        if self.newStep or len(self.undoSteps) == 0:
+            self.undoSteps.append(UndoStep())
+            self.newStep = False
+            for step in self.redoSteps:
+                if step.inMemory():
+                    self.bytesInMemory -= step.bytes
+                step.discard()
+            self.redoSteps = []
+            self.redoSpilled = 0
+        step = self.undoSteps[-1]
+        if not step.inMemory():
+            step.load()
+            self.bytesInMemory += step.bytes
+            self.undoSpilled = len(self.undoSteps) - 1
+        before = step.bytes
+        step.append(operation)
+        self.bytesInMemory += step.bytes - before
+        self.limitMemory()
+        return
+
+    def applyStep(self, step, model):
+        """Apply a step's operations in reverse, returning the step that reverses it"""
+
+        self.collecting = []
+        try:
+            for operation in reversed(step.load()):
+                operation.apply(model)
+            inverse = UndoStep(self.collecting)
+        finally:
+            self.collecting = None
+        self.newStep = True
+        return inverse
+
+    def undo(self, model):
+        """Undo the last step, returns False if there is none"""
+
+        if len(self.undoSteps) == 0:
+            return False
+        self.redoSteps.append(self.applyStep(self.popStep(self.undoSteps), model))
+        self.bytesInMemory += self.redoSteps[-1].bytes
+        self.limitMemory()
+        return True
+
+    def redo(self, model):
+        """Redo the last undone step, returns False if there is none"""
+
+        if len(self.redoSteps) == 0:
+            return False
+        self.undoSteps.append(self.applyStep(self.popStep(self.redoSteps), model))
+        self.bytesInMemory += self.undoSteps[-1].bytes
+        self.limitMemory()
+        return True
+
+    def popStep(self, steps):
+        """Take the last step off the undo or redo steps"""
+
+        step = steps.pop()
+        if step.inMemory():
+            self.bytesInMemory -= step.bytes
+        self.undoSpilled = min(self.undoSpilled, len(self.undoSteps))
+        self.redoSpilled = min(self.redoSpilled, len(self.redoSteps))
+        return step
+
+    def canUndo(self):
+        return len(self.undoSteps) > 0
+
+    def canRedo(self):
+        return len(self.redoSteps) > 0
+
+    def memoryUsed(self):
+        return self.bytesInMemory
+
+    def limitMemory(self):
+        """Spill the steps furthest from the current table to disk until the
+        rest fit in memoryLimit. The current undo step stays in memory."""
+
+        limit = memoryLimit * 1e6
+        # oldest undo steps first, then the redo steps furthest away.
+        while self.bytesInMemory > limit and self.undoSpilled < len(self.undoSteps) - 1:
+            self.spill(self.undoSteps[self.undoSpilled])
+            self.undoSpilled += 1
+        while self.bytesInMemory > limit and self.redoSpilled < len(self.redoSteps):
+            self.spill(self.redoSteps[self.redoSpilled])
+            self.redoSpilled += 1
+        return
+
+    def spill(self, step):
+        """Write a step in memory to the spill folder"""
+
+        if not step.inMemory() or len(step) == 0:
+            return
+        if self.spillDirectory is None:
+            self.spillDirectory = tempfile.mkdtemp(prefix='pdp-undo-')
+            # spilled steps don't outlive the session
+            atexit.register(shutil.rmtree, self.spillDirectory, True)
+        self.bytesInMemory -= step.bytes
+        step.spill(self.spillDirectory)
+        return
+
+    def clear(self):
+        """Forget all steps, ie: when another file is opened"""
+
+        self.undoSteps = []
+        self.redoSteps = []
+        self.newStep = True
+        self.bytesInMemory = 0
+        self.undoSpilled = 0
+        self.redoSpilled = 0
+        if self.spillDirectory is not None:
+            shutil.rmtree(self.spillDirectory, ignore_errors=True)
+            self.spillDirectory = None
+        return
+
+    def __repr__(self):
+        return 'Undo journal with {} undo and {} redo steps'.format(len(self.undoSteps), len(self.redoSteps))
@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+# Author
+# License
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+# defaults for the shared client, see WebServiceClient
+defaultTimeout = 30
+defaultRetries = 2
+defaultBackoff = 0.5
+defaultMaxBackoff = 8
+defaultFailureThreshold = 5
+defaultResetTimeout = 60
+defaultPoolSize = 10
+# seconds a hedged request waits before also asking the next endpoint
+defaultHedgeBudget = 3
+
+# http status codes worth another attempt, everything else is final.
+retryStatusCodes = [429, 500, 502, 503, 504]
+
+
+class WebServiceError(OSError):
+    """Raised when a webservice request fails. Subclasses OSError so callers
+    written against urllib's errors keep working."""
+
+    def __init__(self, message, endpoint=None, status=None):
+        OSError.__init__(self, message)
+        self.endpoint = endpoint
+        self.status = status
+
+
+class CircuitOpenError(WebServiceError):
+    """Raised without making a request while an endpoint's circuit is open."""
+    pass
+
+
+class CircuitBreaker(object):
+    """Tracks consecutive failures for an endpoint. After failureThreshold
+    failures the circuit opens and requests fail fast. Once resetTimeout
+    seconds pass a single trial request is let through, its success closes
+    the circuit again and its failure re-opens it.
+
+    Args:
+        failureThreshold: consecutive failures which open the circuit
+        resetTimeout: seconds to wait before a trial request
+    """
+
+    def __init__(self, failureThreshold=defaultFailureThreshold, resetTimeout=defaultResetTimeout):
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.failures = 0
+        self.openedAt = None
+        self.trialInProgress = False
+        self.lock = threading.Lock()
+        return
+
+    @property
+    def state(self):
+        if self.openedAt is None:
+            return 'closed'
+        if time.time() - self.openedAt >= self.resetTimeout:
+            return 'half-open'
+        return 'open'
+
+    def allowRequest(self):
+        """Returns the state a request is let through in, claiming the trial
+        when half-open, or None if the request should be skipped."""
+
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return state
+            if state == 'half-open' and not self.trialInProgress:
+                self.trialInProgress = True
+                return state
+            return None
+
+    def recordSuccess(self):
+        with self.lock:
+            self.failures = 0
+            self.openedAt = None
+            self.trialInProgress = False
+        return
+
+    def recordFailure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trialInProgress or self.failures >= self.failureThreshold:
+                self.openedAt = time.time()
+            self.trialInProgress = False
+        return
+
+
+class EndpointMetrics(object):
+    """Request counts and latency for a single endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.totalLatency = 0.0
+        self.maxLatency = 0.0
+        self.lastError = None
+        self.lock = threading.Lock()
+        return
+
+    def record(self, latency, error=None):
+        with self.lock:
+            self.requests += 1
+            self.totalLatency += latency
+            self.maxLatency = max(self.maxLatency, latency)
+            if error is not None:
+                self.failures += 1
+                self.lastError = str(error)
+        return
+
+    def summary(self):
+        with self.lock:
+            meanLatency = self.totalLatency / self.requests if self.requests else 0.0
+            return {'requests': self.requests, 'failures': self.failures, 'retries': self.retries,
+                    'rejected': self.rejected, 'meanLatency': meanLatency,
+                    'maxLatency': self.maxLatency, 'lastError': self.lastError}
+
+
+class TokenBucket(object):
+    """Paces requests to a provider's rate limit. Tokens refill at rate per
+    second up to capacity, and each request takes one, so short bursts are
+    allowed while the long run average stays within the limit. A daily quota,
+    when given, caps the tokens handed out each day.
+
+    Args:
+        rate: requests per second allowed
+        capacity: largest burst allowed, by default one second's worth
+        dailyQuota: requests allowed per day, None for no limit
+        usedToday: requests already made today (ie: in an earlier session)
+    """
+
+    def __init__(self, rate, capacity=None, dailyQuota=None, usedToday=0):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1, rate))
+        self.dailyQuota = dailyQuota
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self.day = time.strftime('%Y-%m-%d')
+        self.usedToday = usedToday
+        self.exhausted = False
+        self.pausedUntil = 0.0
+        self.acquired = 0
+        self.waited = 0.0
+        self.lock = threading.Lock()
+        return
+
+    def refill(self, now):
+        if time.strftime('%Y-%m-%d') != self.day:
+            self.day = time.strftime('%Y-%m-%d')
+            self.usedToday = 0
+            self.exhausted = False
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return
+
+    def acquire(self, timeout=None):
+        """Wait for a token. Returns False without waiting once the daily
+        quota is spent, or if timeout seconds pass first."""
+
+        start = time.time()
+        while True:
+            with self.lock:
+                now = time.time()
+                self.refill(now)
+                if self.exhausted or (self.dailyQuota is not None and self.usedToday >= self.dailyQuota):
+                    self.exhausted = True
+                    return False
+                if now >= self.pausedUntil and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.usedToday += 1
+                    self.acquired += 1
+                    self.waited += now - start
+                    return True
+                delay = max(self.pausedUntil - now, (1 - self.tokens) / self.rate)
+            if timeout is not None and time.time() + delay - start > timeout:
+                return False
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Hand out no tokens for a while, ie: after the provider says we're
+        over its limit. Tokens saved up before the pause are dropped."""
+
+        with self.lock:
+            self.pausedUntil = max(self.pausedUntil, time.time() + seconds)
+            self.tokens = 0
+        return
+
+    def exhaust(self):
+        """Treat the daily quota as spent"""
+
+        with self.lock:
+            self.exhausted = True
+        return
+
+    def remainingQuota(self):
+        """Requests left today, None without a daily quota"""
+
+        with self.lock:
+            if self.dailyQuota is None:
+                return None
+            return 0 if self.exhausted else max(0, self.dailyQuota - self.usedToday)
+
+
+class WebServiceClient(object):
+    """A shared http client for the webservices we call. Connections are
+    pooled and kept alive between requests, failed requests are retried with
+    exponential backoff, and each endpoint has a circuit breaker so that a
+    service which is clearly down fails fast instead of waiting out timeouts.
+
+    Args:
+        timeout: seconds to wait for a response
+        retries: additional attempts after a failed request
+        backoff: seconds before the first retry, doubled for each retry after
+        maxBackoff: the longest wait between retries
+        failureThreshold: consecutive failures which open an endpoint's circuit
+        resetTimeout: seconds an open circuit waits before a trial request
+        poolSize: connections kept open per host
+    """
+
+    def __init__(self, timeout=defaultTimeout, retries=defaultRetries, backoff=defaultBackoff,
+                 maxBackoff=defaultMaxBackoff, failureThreshold=defaultFailureThreshold,
+                 resetTimeout=defaultResetTimeout, poolSize=defaultPoolSize):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.session = requests.Session()
+        # retries are handled here, so the adapter should not make its own.
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.breakers = {}
+        self.endpointMetrics = {}
+        self.lock = threading.Lock()
+        # requests made on behalf of hedgedGet
+        self.hedgeExecutor = ThreadPoolExecutor(max_workers=poolSize * 3)
+        return
+
+    def getBreaker(self, endpoint):
+        with self.lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(self.failureThreshold, self.resetTimeout)
+            return self.breakers[endpoint]
+
+    def getMetrics(self, endpoint):
+        with self.lock:
+            if endpoint not in self.endpointMetrics:
+                self.endpointMetrics[endpoint] = EndpointMetrics()
+            return self.endpointMetrics[endpoint]
+
+    def retryDelay(self, attempt):
+        """Exponential backoff with a little jitter, so concurrent workers
+        don't retry in lockstep."""
+
+        delay = min(self.maxBackoff, self.backoff * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def get(self, url, endpoint=None, params=None, timeout=None, retries=None):
+        """Make a GET request, returning the requests.Response.
+        endpoint names the service for circuit breaking and metrics,
+        by default it is the url's host. timeout and retries override the
+        client's defaults. Raises WebServiceError on failure."""
+
+        if endpoint is None:
+            endpoint = urlparse(url).netloc
+        if timeout is None:
+            timeout = self.timeout
+        if retries is None:
+            retries = self.retries
+        breaker = self.getBreaker(endpoint)
+        metrics = self.getMetrics(endpoint)
+        state = breaker.allowRequest()
+        if state is None:
+            with metrics.lock:
+                metrics.rejected += 1
+            raise CircuitOpenError('{} is unavailable, skipping request'.format(endpoint), endpoint)
+
+        # a trial request through a half-open circuit gets a single attempt.
+        attempts = 1 if state == 'half-open' else retries + 1
+        succeeded = False
+        try:
+            for attempt in range(attempts):
+                if attempt > 0:
+                    with metrics.lock:
+                        metrics.retries += 1
+                    time.sleep(self.retryDelay(attempt - 1))
+                start = time.time()
+                try:
+                    response = self.session.get(url, params=params, timeout=timeout)
+                except requests.RequestException as e:
+                    metrics.record(time.time() - start, e)
+                    error = WebServiceError('{} request failed: {}'.format(endpoint, e), endpoint)
+                    continue
+                if response.status_code in retryStatusCodes:
+                    metrics.record(time.time() - start, 'http {}'.format(response.status_code))
+                    error = WebServiceError('{} responded with http {}'.format(endpoint, response.status_code),
+                                            endpoint, response.status_code)
+                    continue
+                metrics.record(time.time() - start)
+                succeeded = True
+                breaker.recordSuccess()
+                if response.status_code >= 400:
+                    # the service is up, but won't answer this request. retrying won't help.
+                    raise WebServiceError('{} responded with http {}'.format(endpoint, response.status_code),
+                                          endpoint, response.status_code)
+                return response
+            raise error
+        finally:
+            # any other exception counts as a failure too, so a trial is never left claimed.
+            if not succeeded:
+                breaker.recordFailure()
+
+    def hedgedGet(self, targets, budget=defaultHedgeBudget, timeout=None):
+        """Request the same resource from several endpoints, returning the
+        first successful response. targets is a list of (url, endpoint) in
+        order of preference. The first is requested straight away, and the
+        next is only requested if the budget (in seconds) passes without an
+        answer, or the earlier request fails. Slow requests are left to finish
+        in the background. Raises the last WebServiceError if all fail."""
+
+        targets = list(targets)
+        pending = set()
+        error = WebServiceError('no endpoints to request')
+
+        def requestNext():
+            url, endpoint = targets.pop(0)
+            # the other endpoints stand in for retries.
+            pending.add(self.hedgeExecutor.submit(self.get, url, endpoint, None, timeout, 0))
+
+        requestNext()
+        while len(pending) > 0:
+            done, _ = wait(pending, timeout=budget if len(targets) > 0 else None,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                try:
+                    return future.result()
+                except OSError as e:
+                    error = e
+            # hedge when the budget is spent or straight away after a failure.
+            if len(targets) > 0:
+                requestNext()
+        raise error
+
+    def metrics(self):
+        """Latency and error summaries for every endpoint used so far"""
+
+        with self.lock:
+            endpoints = list(self.endpointMetrics.items())
+        summaries = {}
+        for endpoint, metrics in endpoints:
+            summaries[endpoint] = metrics.summary()
+            summaries[endpoint]['circuit'] = self.getBreaker(endpoint).state
+        return summaries
+
+    def close(self):
+        self.hedgeExecutor.shutdown(wait=False)
+        self.session.close()
+        return
+
+
+_client = None
+_clientLock = threading.Lock()
+
+
+def getClient():
+    """Returns the client shared by every module making webservice calls."""
+
+    global _client
+    with _clientLock:
+        if _client is None:
+            _client = WebServiceClient()
+        return _client
+
+
+def printMetrics():
+    """Print a line of latency and error statistics for each endpoint"""
+
+    for endpoint, summary in sorted(getClient().metrics().items()):
+        print('{}: {requests} requests, {failures} failed, {retries} retried, {rejected} rejected, '
+              'mean {meanLatency:.2f}s, max {maxLatency:.2f}s, circuit {circuit}'.format(endpoint, **summary))
+    return
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import catalogOfLife
+
+
+class FakeModel(object):
+    def __init__(self, row):
+        self.row = row
+
+    def getValueAt(self, rowIndex, columnIndex):
+        return self.row[columnIndex]
+
+
+class FakeTable(object):
+    """Just enough of core.Table for the name functions"""
+
+    columns = ['scientificName', 'scientificNameAuthorship']
+
+    def __init__(self, sciName, author=''):
+        self.model = FakeModel([sciName, author])
+
+    def findColumnIndex(self, columnName):
+        return self.columns.index(columnName)
+
+
+class SuggestedNameTests(unittest.TestCase):
+    """A misspelled name replaced by the closest checklist name keeps the
+    rank and qualifier the user entered."""
+
+    def suggest(self, table):
+        error = ('ERROR', 'No names found')
+        suggestions = [(1, 'Quercus alba latiloba', 'Quercus alba latiloba', 'Sarg.')]
+        with mock.patch.object(catalogOfLife, 'colNameSearch', return_value=error), \
+                mock.patch.object(catalogOfLife, 'safeColNameSearch', return_value=error), \
+                mock.patch.object(catalogOfLife, 'suggestNames', return_value=suggestions), \
+                mock.patch.object(catalogOfLife.messagebox, 'askyesno', return_value=True):
+            return (catalogOfLife.genScientificName(table, 0),
+                    catalogOfLife.proposeScientificName(table, 0))
+
+    def test_misspelledTrinomialKeepsRank(self):
+        accepted, proposed = self.suggest(FakeTable('Quercus albba var. latiloba'))
+        self.assertEqual(accepted, ('Quercus alba var. latiloba', 'Sarg.'))
+        self.assertEqual(proposed[0]['scientificName'], 'Quercus alba var. latiloba')
+
+    def test_misspelledTrinomialKeepsSubspecies(self):
+        accepted, proposed = self.suggest(FakeTable('Quercus alba subsp. latilobba'))
+        self.assertEqual(accepted[0], 'Quercus alba subsp. latiloba')
+        self.assertEqual(proposed[0]['scientificName'], 'Quercus alba subsp. latiloba')
+
+
+class QualifiedNameTests(unittest.TestCase):
+    """A qualifier such as 'sp.' is kept once, whether the name is checked
+    interactively or proposed."""
+
+    def check(self, table, results):
+        with mock.patch.object(catalogOfLife, 'colNameSearch', return_value=results), \
+                mock.patch.object(catalogOfLife, 'safeColNameSearch', return_value=results), \
+                mock.patch.object(catalogOfLife.messagebox, 'askyesno', return_value=True) as asked:
+            return (catalogOfLife.genScientificName(table, 0),
+                    catalogOfLife.proposeScientificName(table, 0), asked.called)
+
+    def test_unchangedNameKeepsQualifier(self):
+        accepted, proposed, asked = self.check(FakeTable('Quercus sp.'), ('Quercus', 'L.'))
+        self.assertEqual(accepted, ('Quercus sp.', 'L.'))
+        self.assertEqual(proposed[0]['scientificName'], 'Quercus sp.')
+        self.assertFalse(asked)
+
+    def test_updatedNameKeepsQualifier(self):
+        accepted, proposed, asked = self.check(FakeTable('Quercus alba var.', 'L.'), ('Quercus montana', 'Willd.'))
+        self.assertEqual(accepted, ('Quercus montana var.', 'Willd.'))
+        self.assertEqual(proposed[0]['scientificName'], 'Quercus montana var.')
+
+
+class FormatScientificNamesTests(unittest.TestCase):
+    """Label markup keeps every word of the name, only the genus and
+    epithets are italicized."""
+
+    def format(self, name):
+        return catalogOfLife.formatScientificNames(catalogOfLife.pd.Series([name])).iloc[0]
+
+    def test_infraspecificNameWithAuthority(self):
+        self.assertEqual(self.format('Quercus alba var. latiloba Sarg.'),
+                         '<i>Quercus alba</i> var. <i>latiloba</i> Sarg.')
+
+    def test_authorityBeforeRank(self):
+        self.assertEqual(self.format('Quercus alba L. var. latiloba (Sarg.) Nixon'),
+                         '<i>Quercus alba</i> L. var. <i>latiloba</i> (Sarg.) Nixon')
+
+    def test_infraspecificNameWithQualifier(self):
+        self.assertEqual(self.format('Acer saccharum subsp. nigrum sp.'),
+                         '<i>Acer saccharum</i> subsp. <i>nigrum</i> sp.')
+
+    def test_binomialWithAuthority(self):
+        self.assertEqual(self.format('Acer saccharum Marshall'), '<i>Acer saccharum</i> Marshall')
+
+    def test_authorityWithParticles(self):
+        self.assertEqual(self.format('Acer rubrum L. var. drummondii (Hook. & Arn. ex Nutt.) Sarg.'),
+                         '<i>Acer rubrum</i> L. var. <i>drummondii</i> (Hook. & Arn. ex Nutt.) Sarg.')
+
+    def test_hybridName(self):
+        self.assertEqual(self.format('Quercus \u00d7bebbiana C.K. Schneid.'),
+                         '<i>Quercus \u00d7bebbiana</i> C.K. Schneid.')
+
+    def test_genusWithQualifier(self):
+        self.assertEqual(self.format('Acer  sp.'), '<i>Acer</i> sp.')
+
+    def test_missingName(self):
+        self.assertEqual(self.format(None), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
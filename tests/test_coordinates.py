@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import numpy as np
+import pandas as pd
+from coordinates import parseVerbatimCoordinates, fillDecimalCoordinates
+
+
+class ParseVerbatimCoordinatesTests(unittest.TestCase):
+
+    def parse(self, verbatim):
+        parsed = parseVerbatimCoordinates(pd.Series([verbatim])).iloc[0]
+        return parsed['decimalLatitude'], parsed['decimalLongitude']
+
+    def assertParses(self, verbatim, latitude, longitude):
+        parsedLatitude, parsedLongitude = self.parse(verbatim)
+        self.assertAlmostEqual(parsedLatitude, latitude, places=5, msg=verbatim)
+        self.assertAlmostEqual(parsedLongitude, longitude, places=5, msg=verbatim)
+
+    def assertUnparsed(self, verbatim):
+        self.assertTrue(np.isnan(self.parse(verbatim)).all(), verbatim)
+
+    def test_decimalDegrees(self):
+        self.assertParses('35.07704, -85.26839', 35.07704, -85.26839)
+        self.assertParses('35.07704 -85.26839', 35.07704, -85.26839)
+        self.assertParses('+35.07704;−85.26839', 35.07704, -85.26839)
+
+    def test_degreesDecimalMinutes(self):
+        self.assertParses("35° 4.622' N, 85° 16.103' W", 35 + 4.622 / 60, -(85 + 16.103 / 60))
+        self.assertParses('35 4.622N 85 16.103W', 35 + 4.622 / 60, -(85 + 16.103 / 60))
+
+    def test_degreesMinutesSeconds(self):
+        self.assertParses('35°4\'37.3"N 85°16\'6.2"W', 35 + 4 / 60 + 37.3 / 3600, -(85 + 16 / 60 + 6.2 / 3600))
+        self.assertParses("35deg 4min 37sec, 85d 16min 6sec", 35 + 4 / 60 + 37 / 3600, 85 + 16 / 60 + 6 / 3600)
+
+    def test_hemisphereBefore(self):
+        self.assertParses("N35°4.622' W85°16.103'", 35 + 4.622 / 60, -(85 + 16.103 / 60))
+        self.assertParses('S 33.86, E 151.21', -33.86, 151.21)
+
+    def test_longitudeFirstWithHemispheres(self):
+        self.assertParses('85.26839 W, 35.07704 N', 35.07704, -85.26839)
+        self.assertParses('W85.26839 35.07704', 35.07704, -85.26839)
+
+    def test_invalidValues(self):
+        # out of range, minutes or seconds of 60 or more, and fractions before the last part.
+        for verbatim in ['95.1, -85.2', '35.1, -185.2', "35° 61' N, 85° 16' W",
+                         "35° 4' 60\" N, 85° 16' 6\" W", "35.5° 4' N, 85° 16' W",
+                         '35.1 N, 85.2 N', '35.1 E, 85.2 W', 'near the river', '']:
+            self.assertUnparsed(verbatim)
+
+    def test_repeatedValuesShareAResult(self):
+        verbatim = pd.Series(['35.1, -85.2', 'junk', '35.1, -85.2'], index=[10, 11, 12])
+        parsed = parseVerbatimCoordinates(verbatim)
+        self.assertEqual(list(parsed.index), [10, 11, 12])
+        self.assertEqual(list(parsed['decimalLatitude'].fillna(0)), [35.1, 0, 35.1])
+
+
+class FillDecimalCoordinatesTests(unittest.TestCase):
+
+    def test_fillsOnlyBlankRows(self):
+        df = pd.DataFrame({'verbatimCoordinates': ['35.1, -85.2', '36.1, -86.2', 'junk', ''],
+                           'decimalLatitude': ['', '1.5', '', ''],
+                           'decimalLongitude': ['', '2.5', '', '']})
+        unparsed = fillDecimalCoordinates(df)
+        self.assertEqual(list(df['decimalLatitude']), ['35.1', '1.5', '', ''])
+        self.assertEqual(list(df['decimalLongitude']), ['-85.2', '2.5', '', ''])
+        self.assertEqual(list(unparsed), [False, False, True, False])
+
+    def test_addsMissingColumns(self):
+        df = pd.DataFrame({'verbatimCoordinates': ["35° 4.5' N, 85° 15' W"]})
+        fillDecimalCoordinates(df, precision=3)
+        self.assertEqual(df.loc[0, 'decimalLatitude'], '35.075')
+        self.assertEqual(df.loc[0, 'decimalLongitude'], '-85.25')
+
+    def test_withoutVerbatimColumn(self):
+        df = pd.DataFrame({'decimalLatitude': ['']})
+        self.assertFalse(fillDecimalCoordinates(df).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import numpy as np
+import pandas as pd
+import elevation
+from elevation import DEMTiles, proposeElevations
+
+
+class FakeModel(object):
+    def __init__(self, df):
+        self.df = df
+
+
+class FakeTable(object):
+    """Just enough of core.Table for proposeElevations"""
+
+    def __init__(self, df):
+        self.model = FakeModel(df)
+
+
+class ElevationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # a 3 cell square tile covering 35N to 36N, 86W to 85W, rows running north to south.
+        heights = np.array([[100, 200, 300],
+                            [400, 500, 600],
+                            [700, 800, 900]], dtype='>i2')
+        heights.tofile(os.path.join(self.directory, 'N35W086.hgt'))
+        # the tile south of it, with no data in its north west corner.
+        heights[0, 0] = elevation.voidValue
+        heights.tofile(os.path.join(self.directory, 'n34w086.hgt'))
+        open(os.path.join(self.directory, 'readme.txt'), 'w').close()
+        elevation.setDemDirectory(self.directory)
+        self.addCleanup(elevation.setDemDirectory, '')
+
+    def test_tilesAreFoundByName(self):
+        tiles = DEMTiles(self.directory)
+        self.assertEqual(len(tiles), 2)
+        self.assertEqual(tiles.tile(35, -86).shape, (3, 3))
+        self.assertEqual(tiles.tile(34, -86)[0, 1], 200)
+        self.assertIsNone(tiles.tile(36, -86))
+
+    def test_sample(self):
+        heights = DEMTiles(self.directory).sample([35.5, 35.75, 35.0, 40.0, np.nan],
+                                                  [-85.5, -85.75, -86.0, -85.5, -85.5])
+        self.assertEqual(heights[0], 500)
+        # bilinear, halfway between 100, 200, 400 and 500.
+        self.assertEqual(heights[1], 300)
+        # the south west corner is the last row.
+        self.assertEqual(heights[2], 700)
+        self.assertTrue(np.isnan(heights[3]))
+        self.assertTrue(np.isnan(heights[4]))
+
+    def test_voidCells(self):
+        heights = DEMTiles(self.directory).sample([34.9, 34.25], [-85.9, -85.25])
+        self.assertTrue(np.isnan(heights[0]))
+        self.assertEqual(heights[1], 700)
+
+    def test_withoutTiles(self):
+        elevation.setDemDirectory('')
+        self.assertIsNone(elevation.getDemTiles())
+        self.assertEqual(proposeElevations(FakeTable(pd.DataFrame())), (None, None))
+
+    def test_proposeElevations(self):
+        df = pd.DataFrame({'otherCatalogNumbers': ['1-1', '1-2', '1-3', '1-4', '1-5', '1-6'],
+                           'decimalLatitude': ['35.5', '35.5', '35.5', '35.5', '35.5', ''],
+                           'decimalLongitude': ['-85.5', '-85.5', '-85.5', '-85.5', '-85.5', ''],
+                           'minimumElevationInMeters': ['', '550', '900 m', '1640', 'high', '']})
+        changes, deviates = proposeElevations(FakeTable(df), tolerance=100)
+        self.assertEqual(changes[['row', 'catalogNumber', 'old', 'new']].values.tolist(),
+                         [[0, '1-1', '', '500'], [2, '1-3', '900 m', '500'],
+                          [3, '1-4', '1640', '500'], [4, '1-5', 'high', '500']])
+        self.assertEqual(list(changes['note']), ['Elevation from DEM',
+                                                 'Entered elevation is 400 m from the DEM',
+                                                 'Entered elevation is 1140 m from the DEM, it may be in feet',
+                                                 'Entered elevation is not a number'])
+        self.assertEqual(list(deviates), [False, False, True, True, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from fuzzyNames import editDistance, trigrams, FuzzyNameMatcher
+
+
+class FakeChecklist(object):
+    """Just enough of localChecklist.LocalChecklist for the matcher.
+    names maps a normalized name to its (accepted name, authority)."""
+
+    def __init__(self, names):
+        self.names = names
+
+    def genera(self):
+        return sorted(set(x.split()[0] for x in self.names))
+
+    def namesInGenus(self, genus):
+        return [x for x in self.names if x.split()[0] == genus]
+
+    def lookup(self, identQuery):
+        if ' '.join(identQuery) not in self.names:
+            return None
+        name, authority = self.names[' '.join(identQuery)]
+        return {'status': 'accepted', 'name': name, 'authority': authority, 'synonyms': []}
+
+
+class EditDistanceTests(unittest.TestCase):
+
+    def test_distance(self):
+        self.assertEqual(editDistance('acer', 'acer'), 0)
+        self.assertEqual(editDistance('acer', 'aser'), 1)
+        self.assertEqual(editDistance('saccharum', 'sacharum'), 1)
+        self.assertEqual(editDistance('kitten', 'sitting'), 3)
+        self.assertEqual(editDistance('', 'abc'), 3)
+
+    def test_stopsPastMaxDistance(self):
+        self.assertEqual(editDistance('kitten', 'sitting', maxDistance=1), 2)
+        self.assertEqual(editDistance('a', 'abcdef', maxDistance=2), 3)
+        self.assertEqual(editDistance('kitten', 'sitting', maxDistance=3), 3)
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams('Acer'), {'  a', ' ac', 'ace', 'cer', 'er '})
+
+
+class FuzzyNameMatcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = FuzzyNameMatcher(FakeChecklist({
+            'Acer saccharum': ('Acer saccharum', 'Marshall'),
+            'Acer saccharinum': ('Acer saccharinum', 'L.'),
+            'Acer rubrum': ('Acer rubrum', 'L.'),
+            'Acer carolinianum': ('Acer rubrum', 'L.'),
+            'Aster laevis': ('Symphyotrichum laeve', '(L.) G.L. Nesom'),
+            'Quercus alba': ('Quercus alba', 'L.'),
+        }))
+
+    def test_matchGenus(self):
+        self.assertEqual(self.matcher.matchGenus('Acre'), [(2, 'Acer')])
+        self.assertEqual(self.matcher.matchGenus('Aser'), [(1, 'Acer'), (1, 'Aster')])
+        self.assertEqual(self.matcher.matchGenus('Quercis'), [(1, 'Quercus')])
+        self.assertEqual(self.matcher.matchGenus('Pinus'), [])
+
+    def test_closestFirst(self):
+        self.assertEqual(self.matcher.suggest(['Acer', 'sacharum']),
+                         [(1, 'Acer saccharum', 'Acer saccharum', 'Marshall')])
+        suggestions = self.matcher.suggest(['Acer', 'saccharnum'])
+        self.assertEqual([x[2] for x in suggestions], ['Acer saccharinum', 'Acer saccharum'])
+
+    def test_misspelledGenusAndEpithet(self):
+        self.assertEqual(self.matcher.suggest(['Quercis', 'albo']), [(2, 'Quercus alba', 'Quercus alba', 'L.')])
+
+    def test_synonymReportsAcceptedName(self):
+        suggestions = self.matcher.suggest(['Aster', 'laevus'])
+        self.assertEqual(suggestions, [(1, 'Aster laevis', 'Symphyotrichum laeve', '(L.) G.L. Nesom')])
+
+    def test_acceptedNameSuggestedOnce(self):
+        suggestions = self.matcher.suggest(['Acer', 'rubrim'], maxDistance=2)
+        self.assertEqual([x[2] for x in suggestions], ['Acer rubrum'])
+
+    def test_genusOnly(self):
+        self.assertEqual(self.matcher.suggest(['Quercas']), [(1, 'Quercus', 'Quercus', '')])
+
+    def test_limit(self):
+        self.assertEqual(len(self.matcher.suggest(['Acer', 'saccharim'], k=1)), 1)
+        self.assertEqual(self.matcher.suggest([]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import pandas as pd
+import geographyAudit
+from geographyAudit import normalizeGeographyNames, addressNames, findGeographyConflicts
+
+
+def address(county, state, stateShort, country='United States', countryShort='US'):
+    return [{'types': ['administrative_area_level_2', 'political'], 'long_name': county, 'short_name': county},
+            {'types': ['administrative_area_level_1', 'political'], 'long_name': state, 'short_name': stateShort},
+            {'types': ['country', 'political'], 'long_name': country, 'short_name': countryShort}]
+
+
+class FakeModel(object):
+    def __init__(self, df):
+        self.df = df
+
+
+class FakeTable(object):
+    """Just enough of core.Table for the audit"""
+
+    def __init__(self, df):
+        self.model = FakeModel(df)
+
+
+class NormalizeGeographyNamesTests(unittest.TestCase):
+
+    def test_comparableForms(self):
+        names = pd.Series(['Hamilton County', 'hamilton', 'St. Louis Co.', 'Doña Ana', 'USA', None])
+        self.assertEqual(list(normalizeGeographyNames(names)),
+                         ['hamilton', 'hamilton', 'saint louis', 'dona ana', 'us', ''])
+
+    def test_addressNames(self):
+        names = addressNames(address('Hamilton County', 'Tennessee', 'TN'))
+        self.assertEqual(names['county'], 'Hamilton County')
+        self.assertEqual(names['stateProvinceShort'], 'TN')
+        self.assertEqual(names['countryShort'], 'US')
+        self.assertEqual(addressNames('ZERO_RESULTS'), {})
+
+
+class FindGeographyConflictsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.addresses = {('35.04', '-85.31'): address('Hamilton County', 'Tennessee', 'TN'),
+                          ('36.16', '-86.78'): address('Davidson County', 'Tennessee', 'TN')}
+        self.lookups = []
+        patchers = [mock.patch.object(geographyAudit, 'knownAddress', self.knownAddress),
+                    mock.patch.object(geographyAudit, 'offlineReverseGeoCall', lambda *x: 'ZERO_RESULTS')]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def knownAddress(self, latitude, longitude, uncertainty=''):
+        self.lookups.append((latitude, longitude))
+        return self.addresses.get((latitude, longitude))
+
+    def audit(self, rows):
+        columns = ['otherCatalogNumbers', 'decimalLatitude', 'decimalLongitude',
+                   'coordinateUncertaintyInMeters', 'country', 'stateProvince', 'county']
+        return findGeographyConflicts(FakeTable(pd.DataFrame(rows, columns=columns)))
+
+    def test_agreeingRowsPass(self):
+        conflicts, mask = self.audit([['1-1', '35.04', '-85.31', '', 'USA', 'TN', 'Hamilton'],
+                                      ['1-2', '36.16', '-86.78', '', 'United States', 'Tennessee', 'Davidson Co.']])
+        self.assertEqual(len(conflicts), 0)
+        self.assertFalse(mask.values.any())
+
+    def test_conflictingCounty(self):
+        conflicts, mask = self.audit([['1-1', '35.04', '-85.31', '', 'US', 'Tennessee', 'Marion'],
+                                      ['1-2', '36.16', '-86.78', '', 'US', 'Tennessee', 'Davidson']])
+        self.assertEqual(conflicts[['row', 'catalogNumber', 'field', 'old', 'new']].values.tolist(),
+                         [[0, '1-1', 'county', 'Marion', 'Hamilton County']])
+        self.assertEqual(mask.loc[0].tolist(), [False, False, True])
+        self.assertFalse(mask.loc[1].any())
+
+    def test_countryProposedByShortName(self):
+        conflicts, _ = self.audit([['1-1', '35.04', '-85.31', '', 'Canada', 'Tennessee', 'Hamilton']])
+        self.assertEqual(conflicts[['field', 'old', 'new']].values.tolist(), [['country', 'Canada', 'US']])
+
+    def test_blankOrUnlocatedRowsAreSkipped(self):
+        conflicts, mask = self.audit([['1-1', '', '', '', 'Canada', 'Ontario', 'York'],
+                                      ['1-2', '35.04', '-85.31', '', '', '', ''],
+                                      ['1-3', '10.0', '10.0', '', 'Canada', 'Ontario', 'York']])
+        self.assertEqual(len(conflicts), 0)
+        self.assertEqual(list(mask.index), [0, 1, 2])
+
+    def test_sharedLocationLookedUpOnce(self):
+        conflicts, _ = self.audit([['1-1', '35.04', '-85.31', '', 'US', 'TN', 'Marion'],
+                                   ['1-2', '35.04', '-85.31', '', 'US', 'TN', 'Marion']])
+        self.assertEqual(self.lookups, [('35.04', '-85.31')])
+        self.assertEqual(list(conflicts['row']), [0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
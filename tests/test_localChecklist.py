@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from localChecklist import importChecklist, LocalChecklist, canonicalName, termName
+
+taxonRows = [
+    ['taxonID', 'scientificName', 'scientificNameAuthorship', 'taxonomicStatus', 'acceptedNameUsageID'],
+    ['1', 'Acer rubrum L.', 'L.', 'accepted name', ''],
+    ['2', 'Acer carolinianum Walter', 'Walter', 'synonym', '1'],
+    ['3', 'Acer drummondii Hook. & Arn.', 'Hook. & Arn.', 'synonym', '2'],
+    ['4', 'Quercus alba var. latiloba Sarg., 1918', 'Sarg., 1918', 'accepted name', ''],
+    ['5', 'Acer loopus', '', 'synonym', '6'],
+    ['6', 'Acer loopa', '', 'synonym', '5'],
+]
+
+metaXml = """<archive xmlns="http://rs.tdwg.org/dwc/text/">
+  <core fieldsTerminatedBy="\\t" ignoreHeaderLines="1">
+    <files><location>taxa.txt</location></files>
+    <id index="0"/>
+    <field index="1" term="http://rs.tdwg.org/dwc/terms/genus"/>
+    <field index="2" term="http://rs.tdwg.org/dwc/terms/specificEpithet"/>
+    <field index="3" term="http://rs.tdwg.org/dwc/terms/scientificNameAuthorship"/>
+    <field index="4" term="http://rs.tdwg.org/dwc/terms/taxonomicStatus"/>
+  </core>
+</archive>"""
+
+
+class LocalChecklistTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.indexPath = os.path.join(self.directory, 'checklist.sqlite')
+
+    def importRows(self, rows):
+        sourcePath = os.path.join(self.directory, 'taxa.txt')
+        with open(sourcePath, 'w', encoding='utf-8') as taxonFile:
+            taxonFile.write('\n'.join('\t'.join(x) for x in rows) + '\n')
+        count = importChecklist(sourcePath, self.indexPath)
+        checklist = LocalChecklist(self.indexPath)
+        self.addCleanup(checklist.close)
+        return count, checklist
+
+    def test_importCountsNames(self):
+        count, checklist = self.importRows(taxonRows)
+        self.assertEqual(count, 6)
+        self.assertEqual(len(checklist), 6)
+        self.assertEqual(sorted(checklist.genera()), ['Acer', 'Quercus'])
+
+    def test_acceptedName(self):
+        _, checklist = self.importRows(taxonRows)
+        self.assertEqual(checklist.lookup(['Acer', 'rubrum']),
+                         {'status': 'accepted', 'name': 'Acer rubrum', 'authority': 'L.', 'synonyms': []})
+
+    def test_infraspecificNameDropsRankAndYear(self):
+        _, checklist = self.importRows(taxonRows)
+        entry = checklist.lookup(['Quercus', 'alba', 'latiloba'])
+        self.assertEqual(entry['name'], 'Quercus alba latiloba')
+        self.assertEqual(entry['authority'], 'Sarg.')
+
+    def test_synonymChainIsFollowed(self):
+        _, checklist = self.importRows(taxonRows)
+        entry = checklist.lookup(['Acer', 'drummondii'])
+        self.assertEqual(entry['name'], 'Acer rubrum')
+        self.assertEqual(entry['synonyms'], ['Acer drummondii', 'Acer carolinianum'])
+
+    def test_synonymLoopIsUnresolved(self):
+        _, checklist = self.importRows(taxonRows)
+        self.assertIsNone(checklist.lookup(['Acer', 'loopus']))
+
+    def test_missingName(self):
+        _, checklist = self.importRows(taxonRows)
+        self.assertIsNone(checklist.lookup(['Acer', 'saccharum']))
+
+    def test_archiveWithMeta(self):
+        sourcePath = os.path.join(self.directory, 'dwca.zip')
+        with zipfile.ZipFile(sourcePath, 'w') as archive:
+            archive.writestr('meta.xml', metaXml)
+            archive.writestr('taxa.txt', 'id\tgenus\tepithet\tauthor\tstatus\n'
+                                         '7\tAcer\tsaccharum\tMarshall\taccepted\n')
+        self.assertEqual(importChecklist(sourcePath, self.indexPath), 1)
+        checklist = LocalChecklist(self.indexPath)
+        self.addCleanup(checklist.close)
+        self.assertEqual(checklist.lookup(['Acer', 'saccharum'])['authority'], 'Marshall')
+
+    def test_termName(self):
+        self.assertEqual(termName('dwc:taxonID'), 'taxonID')
+        self.assertEqual(termName('\ufeffhttp://rs.tdwg.org/dwc/terms/taxonID'), 'taxonID')
+
+    def test_canonicalNamePrefersAtomizedFields(self):
+        self.assertEqual(canonicalName({'genus': 'Acer', 'specificEpithet': 'saccharum',
+                                        'infraspecificEpithet': 'nigrum', 'scientificName': 'ignored'}),
+                         'Acer saccharum nigrum')
+        self.assertEqual(canonicalName({'scientificName': 'Acer saccharum subsp. nigrum (F. Michx.) Desmarais',
+                                        'scientificNameAuthorship': '(F. Michx.) Desmarais'}),
+                         'Acer saccharum nigrum')
+
+
+if __name__ == '__main__':
+    unittest.main()
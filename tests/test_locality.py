@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import locality
+from locality import ResolvedPointIndex, distanceMeters, reuseRadius, geocodeCacheKey
+
+
+class ResolvedPointIndexTests(unittest.TestCase):
+    """Nearby points reuse an address already geocoded, within a radius."""
+
+    def setUp(self):
+        self.index = ResolvedPointIndex(cellSize=0.01)
+        self.index.add(35.0456, -85.3097, 'Chattanooga')
+        self.index.add(35.0500, -85.3097, 'North Chattanooga')
+
+    def test_distance(self):
+        # a thousandth of a degree of latitude is about 111 meters.
+        self.assertAlmostEqual(distanceMeters(35.0, -85.0, 35.001, -85.0), 111.2, places=0)
+        self.assertEqual(distanceMeters(35.0, -85.0, 35.0, -85.0), 0)
+
+    def test_nearestWithinRadius(self):
+        self.assertEqual(self.index.nearest(35.0457, -85.3097, 100)[2], 'Chattanooga')
+        self.assertEqual(self.index.nearest(35.0490, -85.3097, 200)[2], 'North Chattanooga')
+
+    def test_nothingWithinRadius(self):
+        self.assertIsNone(self.index.nearest(35.0478, -85.3097, 100))
+        self.assertIsNone(self.index.nearest(36.0, -85.3097, 1000))
+
+    def test_searchesNeighbouringCells(self):
+        index = ResolvedPointIndex(cellSize=0.01)
+        index.add(35.0099, -85.0099, 'across the cell edge')
+        self.assertEqual(index.cell(35.0099, -85.0099), (3500, -8501))
+        self.assertEqual(index.cell(35.0101, -85.0099), (3501, -8501))
+        self.assertEqual(index.nearest(35.0101, -85.0099, 50)[2], 'across the cell edge')
+
+    def test_len(self):
+        self.assertEqual(len(self.index), 2)
+
+
+class ReuseRadiusTests(unittest.TestCase):
+
+    def test_uncertaintyIsUsed(self):
+        self.assertEqual(reuseRadius('250'), 250)
+
+    def test_missingUncertaintyFallsBack(self):
+        for uncertainty in ['', None, 'nan', '0', 'unknown']:
+            self.assertEqual(reuseRadius(uncertainty), locality.geocodeReuseRadius)
+
+    def test_largeUncertaintyIsCapped(self):
+        self.assertEqual(reuseRadius(50000), locality.geocodeMaxReuseRadius)
+
+    def test_cacheKey(self):
+        self.assertEqual(geocodeCacheKey('35.04561', -85.30969), '35.0456,-85.3097')
+        self.assertIsNone(geocodeCacheKey('', -85.3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from offlineGeocoder import OfflineGeocoder, BoundaryLayer
+
+
+def square(minX, minY, maxX, maxY):
+    return [[minX, minY], [maxX, minY], [maxX, maxY], [minX, maxY], [minX, minY]]
+
+
+def feature(properties, geometryType, coordinates):
+    return {'type': 'Feature', 'properties': properties,
+            'geometry': {'type': geometryType, 'coordinates': coordinates}}
+
+
+class OfflineGeocoderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.geocoder = OfflineGeocoder(cellSize=1.0)
+        self.addLayer('stateProvince', [
+            feature({'NAME': 'Tennessee', 'STUSPS': 'TN'}, 'Polygon', [square(-90, 35, -81.6, 36.7)]),
+            feature({'NAME': 'Kentucky', 'STUSPS': 'KY'}, 'Polygon', [square(-89.5, 36.7, -82, 39.1)]),
+        ])
+        # a county with a hole in it, and a county in two parts.
+        self.addLayer('county', [
+            feature({'NAMELSAD': 'Hamilton County'}, 'Polygon',
+                    [square(-85.5, 35, -84.9, 35.5), square(-85.3, 35.1, -85.1, 35.3)]),
+            feature({'NAMELSAD': 'Split County'}, 'MultiPolygon',
+                    [[square(-88, 35.5, -87.5, 36)], [square(-86, 36, -85.8, 36.2)]]),
+        ])
+
+    def addLayer(self, level, features):
+        path = os.path.join(self.directory, level + '.geojson')
+        with open(path, 'w', encoding='utf-8') as geoFile:
+            json.dump({'type': 'FeatureCollection', 'features': features}, geoFile)
+        return self.geocoder.addLayer(level, path)
+
+    def longNames(self, latitude, longitude):
+        address = self.geocoder.lookup(latitude, longitude)
+        if address == 'ZERO_RESULTS':
+            return address
+        return [x['long_name'] for x in address]
+
+    def test_mostSpecificFirst(self):
+        address = self.geocoder.lookup(35.04, -85.31)
+        self.assertEqual([x['long_name'] for x in address], ['Hamilton County', 'Tennessee'])
+        self.assertEqual(address[0]['types'], ['administrative_area_level_2', 'political'])
+        self.assertEqual(address[1]['short_name'], 'TN')
+        # without a short name the name stands in.
+        self.assertEqual(address[0]['short_name'], 'Hamilton County')
+
+    def test_holeIsOutside(self):
+        self.assertEqual(self.longNames(35.2, -85.2), ['Tennessee'])
+
+    def test_multiPolygon(self):
+        self.assertEqual(self.longNames(35.7, -87.7), ['Split County', 'Tennessee'])
+        self.assertEqual(self.longNames('36.1', '-85.9'), ['Split County', 'Tennessee'])
+
+    def test_neighbouringBoundaries(self):
+        self.assertEqual(self.longNames(38, -85), ['Kentucky'])
+        self.assertEqual(self.longNames(10, -85), 'ZERO_RESULTS')
+
+    def test_lookupMany(self):
+        self.assertEqual(self.geocoder.lookupMany([38, 10], [-85, -85])[1], 'ZERO_RESULTS')
+
+    def test_unknownLevel(self):
+        with self.assertRaises(ValueError):
+            self.addLayer('township', [])
+
+    def test_saveAndLoad(self):
+        path = os.path.join(self.directory, 'geocoder.pickle')
+        self.geocoder.save(path)
+        loaded = OfflineGeocoder.load(path)
+        self.assertEqual(loaded.lookup(35.04, -85.31), self.geocoder.lookup(35.04, -85.31))
+
+    def test_layerSkipsDegenerateRings(self):
+        layer = BoundaryLayer([('line', 'line', [[[0, 0], [1, 1]]]), ('box', 'box', [square(0, 0, 2, 2)])])
+        self.assertEqual(len(layer), 1)
+        self.assertEqual(layer.find(1, 1), 0)
+        self.assertIsNone(layer.find(3, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
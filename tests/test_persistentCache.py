@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import persistentCache
+from persistentCache import PersistentCache
+
+
+class Clock(object):
+    """Stands in for time.time, moving on only when told to"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class PersistentCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(persistentCache.time, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_storesJsonValues(self):
+        cache = PersistentCache(':memory:')
+        cache.set('Acer rubrum', {'name': 'Acer rubrum', 'synonyms': ['Acer carolinianum']})
+        self.assertEqual(cache.get('Acer rubrum'), {'name': 'Acer rubrum', 'synonyms': ['Acer carolinianum']})
+        self.assertEqual(cache.get('Acer nigrum', 'missing'), 'missing')
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_defaultTTLExpires(self):
+        cache = PersistentCache(':memory:', ttl=60)
+        cache.set('key', 'value')
+        self.clock.now += 59
+        self.assertEqual(cache.get('key'), 'value')
+        self.clock.now += 2
+        self.assertNotIn('key', cache)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.entries, 0)
+
+    def test_ttlOverridesDefault(self):
+        cache = PersistentCache(':memory:', ttl=60)
+        cache.set('short', 'value', ttl=5)
+        cache.set('long', 'value')
+        self.clock.now += 10
+        self.assertIsNone(cache.get('short'))
+        self.assertEqual(cache.get('long'), 'value')
+        self.assertEqual(cache.items(), [('long', 'value')])
+
+    def test_noTTLNeverExpires(self):
+        cache = PersistentCache(':memory:')
+        cache.set('key', 'value')
+        self.clock.now += 10 ** 9
+        self.assertEqual(cache.get('key'), 'value')
+
+    def test_evictsLeastRecentlyUsed(self):
+        cache = PersistentCache(':memory:', maxEntries=2)
+        cache.set('a', 1)
+        self.clock.now += 1
+        cache.set('b', 2)
+        self.clock.now += 1
+        cache.get('a')
+        self.clock.now += 1
+        cache.set('c', 3)
+        self.assertEqual(sorted(cache.items()), [('a', 1), ('c', 3)])
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.entries, 2)
+
+    def test_replacingKeepsCount(self):
+        cache = PersistentCache(':memory:', maxEntries=2)
+        cache.set('a', 1)
+        cache.set('a', 2)
+        cache.set('b', 3)
+        self.assertEqual(cache.entries, 2)
+        self.assertEqual(cache.evictions, 0)
+        self.assertEqual(cache.get('a'), 2)
+
+    def test_evictionDropsExpiredFirst(self):
+        cache = PersistentCache(':memory:', maxEntries=2)
+        cache.set('expiring', 1, ttl=5)
+        self.clock.now += 1
+        cache.set('kept', 2)
+        self.clock.now += 10
+        cache.set('new', 3)
+        self.assertEqual(sorted(cache.items()), [('kept', 2), ('new', 3)])
+        self.assertEqual(cache.evictions, 0)
+
+    def test_periodicPurge(self):
+        cache = PersistentCache(':memory:')
+        cache.set('expiring', 1, ttl=5)
+        self.clock.now += 10
+        with mock.patch.object(persistentCache, 'purgeInterval', 3):
+            cache.set('b', 2)
+            self.assertEqual(len(cache), 2)
+            cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.entries, 2)
+
+    def test_survivesReopening(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'cache.sqlite')
+        cache = PersistentCache(path, table='names')
+        cache.set('key', ['value'])
+        cache.close()
+        cache = PersistentCache(path, table='names')
+        self.assertEqual(cache.get('key'), ['value'])
+        self.assertEqual(cache.entries, 1)
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import catalogOfLife
+from persistentCache import PersistentCache
+
+
+def acceptedResponse(name, authority):
+    return ET.fromstring('<results error_message=""><result><name_status>accepted name</name_status>'
+                         '<name>{0}</name><name_html><i>{0}</i> {1}</name_html></result></results>'.format(name, authority))
+
+
+def synonymResponse(acceptedName):
+    return ET.fromstring('<results error_message=""><result><name_status>synonym</name_status>'
+                         '<accepted_name><name>{}</name></accepted_name></result></results>'.format(acceptedName))
+
+
+class SynonymChainTests(unittest.TestCase):
+    """Synonym edges are learned from Catalog of Life, then walked without
+    asking it again."""
+
+    def setUp(self):
+        self.synonymMap = PersistentCache(':memory:', table='colSynonyms')
+        self.nameCache = PersistentCache(':memory:', table='colNames')
+        for name, value in [('_synonymMap', self.synonymMap), ('_nameCache', self.nameCache)]:
+            patcher = mock.patch.object(catalogOfLife, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.responses = {}
+        self.queried = []
+        patcher = mock.patch.object(catalogOfLife, 'colQuery', self.colQuery)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def colQuery(self, identQuery):
+        self.queried.append(' '.join(identQuery))
+        return self.responses.get(' '.join(identQuery))
+
+    def test_knownChain(self):
+        self.synonymMap.set('Acer drummondii', 'Acer carolinianum')
+        self.synonymMap.set('Acer carolinianum', 'Acer rubrum')
+        self.assertEqual(catalogOfLife.resolveKnownSynonyms('Acer drummondii'),
+                         ['Acer drummondii', 'Acer carolinianum', 'Acer rubrum'])
+        self.assertEqual(catalogOfLife.resolveKnownSynonyms('Acer rubrum'), ['Acer rubrum'])
+
+    def test_knownCycle(self):
+        self.synonymMap.set('Acer loopus', 'Acer loopa')
+        self.synonymMap.set('Acer loopa', 'Acer loopus')
+        with self.assertRaises(ValueError):
+            catalogOfLife.resolveKnownSynonyms('Acer loopus')
+
+    def test_chainTooLong(self):
+        for x in range(catalogOfLife.maxSynonymChain + 2):
+            self.synonymMap.set('Acer n{}'.format(x), 'Acer n{}'.format(x + 1))
+        with self.assertRaises(ValueError):
+            catalogOfLife.resolveKnownSynonyms('Acer n0')
+
+    def test_lookupLearnsEdges(self):
+        self.responses['Acer drummondii'] = synonymResponse('Acer carolinianum')
+        self.responses['Acer carolinianum'] = synonymResponse('Acer rubrum')
+        self.responses['Acer rubrum'] = acceptedResponse('Acer rubrum', 'L.')
+        entry = catalogOfLife.colNameLookup(['Acer', 'drummondii'])
+        self.assertEqual(entry, {'status': 'accepted', 'name': 'Acer rubrum', 'authority': 'L.',
+                                 'synonyms': ['Acer drummondii', 'Acer carolinianum']})
+        self.assertEqual(self.synonymMap.get('Acer drummondii'), 'Acer carolinianum')
+        self.assertEqual(self.synonymMap.get('Acer carolinianum'), 'Acer rubrum')
+        self.assertEqual(self.nameCache.get('Acer rubrum')['synonyms'], [])
+
+    def test_knownEdgesSkipRequests(self):
+        self.synonymMap.set('Acer drummondii', 'Acer carolinianum')
+        self.synonymMap.set('Acer carolinianum', 'Acer rubrum')
+        self.nameCache.set('Acer rubrum', {'status': 'accepted', 'name': 'Acer rubrum', 'authority': 'L.',
+                                           'synonyms': []})
+        entry = catalogOfLife.colNameLookup(['Acer', 'drummondii'])
+        self.assertEqual(entry['name'], 'Acer rubrum')
+        self.assertEqual(entry['synonyms'], ['Acer drummondii', 'Acer carolinianum'])
+        self.assertEqual(self.queried, [])
+
+    def test_knownEdgesThenRequest(self):
+        self.synonymMap.set('Acer drummondii', 'Acer rubrum')
+        self.responses['Acer rubrum'] = acceptedResponse('Acer rubrum', 'L.')
+        entry = catalogOfLife.colNameLookup(['Acer', 'drummondii'])
+        self.assertEqual(entry['name'], 'Acer rubrum')
+        self.assertEqual(self.queried, ['Acer rubrum'])
+
+    def test_reportedCycleIsAnError(self):
+        self.responses['Acer loopus'] = synonymResponse('Acer loopa')
+        self.responses['Acer loopa'] = synonymResponse('Acer loopus')
+        entry = catalogOfLife.colNameLookup(['Acer', 'loopus'])
+        self.assertEqual(entry['status'], 'error')
+        self.assertIn('cycle', entry['message'])
+
+    def test_unreachable(self):
+        self.assertIsNone(catalogOfLife.colNameLookup(['Acer', 'rubrum']))
+
+
+if __name__ == '__main__':
+    unittest.main()
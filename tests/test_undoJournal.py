@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import unittest
+from unittest import mock
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from data import TableModel
+import undoJournal
+from undoJournal import UndoJournal
+
+
+def sampleModel():
+    df = pd.DataFrame({'site#': [3, 1, 2], 'specimen#': [1, 1, 1], 'locality': ['c', 'a', 'b']})
+    model = TableModel(dataframe=df)
+    model.journal = UndoJournal()
+    return model
+
+
+class StepGroupingTests(unittest.TestCase):
+    """Each user level change is undone on its own"""
+
+    def test_sortIsItsOwnStep(self):
+        model = sampleModel()
+        model.beginStep()
+        model.setValueAt('edited', 0, 2)
+        model.sortRows(['site#'])
+        self.assertEqual(model.df['site#'].tolist(), [1, 2, 3])
+        self.assertTrue(model.journal.undo(model))
+        self.assertEqual(model.df['site#'].tolist(), [3, 1, 2])
+        self.assertEqual(model.df['locality'].tolist(), ['edited', 'a', 'b'])
+
+    def test_sortFinishingAChangeJoinsItsStep(self):
+        model = sampleModel()
+        model.beginStep()
+        model.setValueAt('edited', 0, 2)
+        model.sortRows(['site#'], newStep=False)
+        model.journal.undo(model)
+        self.assertEqual(model.df['locality'].tolist(), ['c', 'a', 'b'])
+        self.assertFalse(model.journal.canUndo())
+
+    def test_changesJoinTheOpenStep(self):
+        model = sampleModel()
+        model.beginStep()
+        model.setValueAt('x', 0, 2)
+        model.setValueAt('y', 1, 2)
+        model.beginStep()
+        model.setValueAt('z', 2, 2)
+        model.journal.undo(model)
+        self.assertEqual(model.df['locality'].tolist(), ['x', 'y', 'b'])
+        model.journal.undo(model)
+        self.assertEqual(model.df['locality'].tolist(), ['c', 'a', 'b'])
+        self.assertFalse(model.journal.canUndo())
+
+    def test_redo(self):
+        model = sampleModel()
+        model.beginStep()
+        model.setValueAt('x', 0, 2)
+        model.journal.undo(model)
+        self.assertTrue(model.journal.redo(model))
+        self.assertEqual(model.df['locality'].tolist(), ['x', 'a', 'b'])
+        self.assertFalse(model.journal.canRedo())
+        self.assertTrue(model.journal.undo(model))
+        self.assertEqual(model.df['locality'].tolist(), ['c', 'a', 'b'])
+
+    def test_newChangeDropsRedo(self):
+        model = sampleModel()
+        model.beginStep()
+        model.setValueAt('x', 0, 2)
+        model.journal.undo(model)
+        model.beginStep()
+        model.setValueAt('y', 1, 2)
+        self.assertFalse(model.journal.canRedo())
+        self.assertFalse(model.journal.redo(model))
+
+    def test_rowAndColumnChanges(self):
+        model = sampleModel()
+        original = model.df.copy()
+        model.beginStep()
+        model.insertRows([{'site#': 4, 'specimen#': 1, 'locality': 'd'}], 1)
+        model.beginStep()
+        model.deleteRows([0])
+        model.beginStep()
+        model.moveColumn(2, 0)
+        model.beginStep()
+        model.addColumn('habitat')
+        for _ in range(4):
+            self.assertTrue(model.journal.undo(model))
+        pd.testing.assert_frame_equal(model.df, original)
+
+
+class SpillTests(unittest.TestCase):
+    """Steps past the memory limit are kept on disk and read back when reached"""
+
+    def setUp(self):
+        patcher = mock.patch.object(undoJournal, 'memoryLimit', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.model = sampleModel()
+        self.addCleanup(self.model.journal.clear)
+        for row, value in enumerate(['x', 'y', 'z']):
+            self.model.beginStep()
+            self.model.setValueAt(value, row, 2)
+
+    def test_olderStepsSpill(self):
+        journal = self.model.journal
+        self.assertEqual(journal.undoSpilled, 2)
+        self.assertEqual([x.inMemory() for x in journal.undoSteps], [False, False, True])
+        self.assertEqual(len(os.listdir(journal.spillDirectory)), 2)
+        self.assertEqual(journal.memoryUsed(), journal.undoSteps[-1].bytes)
+
+    def test_spilledStepsUndoAndRedo(self):
+        journal = self.model.journal
+        while journal.undo(self.model):
+            pass
+        self.assertEqual(self.model.df['locality'].tolist(), ['c', 'a', 'b'])
+        # the redo steps furthest from the table went to disk on the way.
+        self.assertEqual(journal.redoSpilled, 3)
+        while journal.redo(self.model):
+            pass
+        self.assertEqual(self.model.df['locality'].tolist(), ['x', 'y', 'z'])
+        self.assertEqual(journal.memoryUsed(), sum(x.bytes for x in journal.undoSteps if x.inMemory()))
+
+    def test_changeToSpilledStepLoadsIt(self):
+        journal = self.model.journal
+        journal.undo(self.model)
+        journal.undo(self.model)
+        # the step left on top was spilled, a change joining it reads it back first.
+        self.assertFalse(journal.undoSteps[-1].inMemory())
+        journal.newStep = False
+        self.model.setValueAt('w', 2, 2)
+        self.assertTrue(journal.undoSteps[-1].inMemory())
+        journal.undo(self.model)
+        self.assertEqual(self.model.df['locality'].tolist(), ['c', 'a', 'b'])
+
+    def test_clearRemovesSpillFolder(self):
+        directory = self.model.journal.spillDirectory
+        self.model.journal.clear()
+        self.assertFalse(os.path.isdir(directory))
+        self.assertEqual(self.model.journal.memoryUsed(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
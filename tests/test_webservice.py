@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# Author
+# License
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import requests
+import webservice
+from webservice import CircuitBreaker, CircuitOpenError, TokenBucket, WebServiceClient, WebServiceError
+
+
+class Clock(object):
+    """Stands in for time.time, moving on only when told to"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse(object):
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+
+class CircuitBreakerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(webservice.time, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failureThreshold=3, resetTimeout=60)
+
+    def test_opensAfterConsecutiveFailures(self):
+        for _ in range(2):
+            self.breaker.recordFailure()
+        self.assertEqual(self.breaker.allowRequest(), 'closed')
+        self.breaker.recordFailure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertIsNone(self.breaker.allowRequest())
+
+    def test_successResetsFailures(self):
+        self.breaker.recordFailure()
+        self.breaker.recordFailure()
+        self.breaker.recordSuccess()
+        self.breaker.recordFailure()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_halfOpenAllowsOneTrial(self):
+        for _ in range(3):
+            self.breaker.recordFailure()
+        self.clock.now += 60
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.assertEqual(self.breaker.allowRequest(), 'half-open')
+        self.assertIsNone(self.breaker.allowRequest())
+
+    def test_trialSuccessCloses(self):
+        for _ in range(3):
+            self.breaker.recordFailure()
+        self.clock.now += 60
+        self.breaker.allowRequest()
+        self.breaker.recordSuccess()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertEqual(self.breaker.allowRequest(), 'closed')
+
+    def test_trialFailureReopens(self):
+        for _ in range(3):
+            self.breaker.recordFailure()
+        self.clock.now += 60
+        self.breaker.allowRequest()
+        self.breaker.recordFailure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.clock.now += 59
+        self.assertIsNone(self.breaker.allowRequest())
+        self.clock.now += 1
+        self.assertEqual(self.breaker.allowRequest(), 'half-open')
+
+
+class WebServiceClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.client = WebServiceClient(retries=2, backoff=0, failureThreshold=2, resetTimeout=60)
+        self.addCleanup(self.client.close)
+
+    def respond(self, *responses):
+        """Have the session answer with each response (or raise each exception) in turn"""
+
+        def get(url, params=None, timeout=None):
+            response = responses[min(get.calls, len(responses) - 1)]
+            get.calls += 1
+            if isinstance(response, Exception):
+                raise response
+            return response
+        get.calls = 0
+        self.client.session.get = get
+        return get
+
+    def test_retriesThenSucceeds(self):
+        get = self.respond(FakeResponse(503), requests.ConnectionError('refused'), FakeResponse(200))
+        self.assertEqual(self.client.get('http://example.org/a').status_code, 200)
+        self.assertEqual(get.calls, 3)
+        summary = self.client.metrics()['example.org']
+        self.assertEqual((summary['requests'], summary['failures'], summary['retries']), (3, 2, 2))
+        self.assertEqual(summary['circuit'], 'closed')
+
+    def test_clientErrorIsNotRetried(self):
+        get = self.respond(FakeResponse(404))
+        with self.assertRaises(WebServiceError) as raised:
+            self.client.get('http://example.org/a')
+        self.assertEqual(raised.exception.status, 404)
+        self.assertEqual(get.calls, 1)
+        self.assertEqual(self.client.getBreaker('example.org').failures, 0)
+
+    def test_failingEndpointFailsFast(self):
+        get = self.respond(FakeResponse(500))
+        for _ in range(2):
+            with self.assertRaises(WebServiceError):
+                self.client.get('http://example.org/a', endpoint='CoL')
+        self.assertEqual(get.calls, 6)
+        with self.assertRaises(CircuitOpenError):
+            self.client.get('http://example.org/a', endpoint='CoL')
+        self.assertEqual(get.calls, 6)
+        self.assertEqual(self.client.metrics()['CoL']['rejected'], 1)
+
+    def test_halfOpenTrialGetsOneAttempt(self):
+        get = self.respond(FakeResponse(500))
+        breaker = self.client.getBreaker('CoL')
+        breaker.openedAt = webservice.time.time() - 60
+        with self.assertRaises(WebServiceError):
+            self.client.get('http://example.org/a', endpoint='CoL')
+        self.assertEqual(get.calls, 1)
+        self.assertEqual(breaker.state, 'open')
+
+
+class HedgedGetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.client = WebServiceClient()
+        self.release = threading.Event()
+        self.requested = []
+        self.addCleanup(self.client.close)
+        self.addCleanup(self.release.set)
+
+    def answer(self, behaviours):
+        """Stand in for client.get, endpoints answer as given in behaviours:
+        'slow' waits to be released, 'fail' raises, anything else is returned."""
+
+        def get(url, endpoint=None, params=None, timeout=None, retries=None):
+            self.requested.append(endpoint)
+            behaviour = behaviours[endpoint]
+            if behaviour == 'slow':
+                self.release.wait(5)
+                return 'late ' + endpoint
+            if behaviour == 'fail':
+                raise WebServiceError('{} failed'.format(endpoint), endpoint)
+            return behaviour
+        self.client.get = get
+
+    def test_firstAnswerWithinBudget(self):
+        self.answer({'CoL': 'CoL answer', 'mirror': 'mirror answer'})
+        result = self.client.hedgedGet([('http://a', 'CoL'), ('http://b', 'mirror')], budget=5)
+        self.assertEqual(result, 'CoL answer')
+        self.assertEqual(self.requested, ['CoL'])
+
+    def test_hedgesOnceBudgetSpent(self):
+        self.answer({'CoL': 'slow', 'mirror': 'mirror answer'})
+        result = self.client.hedgedGet([('http://a', 'CoL'), ('http://b', 'mirror')], budget=0.05)
+        self.assertEqual(result, 'mirror answer')
+        self.assertEqual(self.requested, ['CoL', 'mirror'])
+
+    def test_hedgesStraightAwayAfterFailure(self):
+        self.answer({'CoL': 'fail', 'mirror': 'mirror answer'})
+        result = self.client.hedgedGet([('http://a', 'CoL'), ('http://b', 'mirror')], budget=5)
+        self.assertEqual(result, 'mirror answer')
+
+    def test_raisesLastErrorWhenAllFail(self):
+        self.answer({'CoL': 'fail', 'mirror': 'fail'})
+        with self.assertRaises(WebServiceError) as raised:
+            self.client.hedgedGet([('http://a', 'CoL'), ('http://b', 'mirror')], budget=5)
+        self.assertEqual(raised.exception.endpoint, 'mirror')
+
+
+class TokenBucketTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.slept = []
+
+        def sleep(seconds):
+            self.slept.append(seconds)
+            self.clock.now += seconds
+        for name, replacement in [('time', self.clock), ('sleep', sleep)]:
+            patcher = mock.patch.object(webservice.time, name, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_burstUpToCapacity(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+        for _ in range(3):
+            self.assertTrue(bucket.acquire())
+        self.assertEqual(self.slept, [])
+        self.assertTrue(bucket.acquire())
+        self.assertEqual(self.slept, [0.5])
+        self.assertAlmostEqual(bucket.waited, 0.5)
+
+    def test_refillIsCappedAtCapacity(self):
+        bucket = TokenBucket(rate=1)
+        bucket.acquire()
+        self.clock.now += 100
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(self.slept, [1.0])
+
+    def test_timeout(self):
+        bucket = TokenBucket(rate=0.5)
+        bucket.acquire()
+        self.assertFalse(bucket.acquire(timeout=1))
+        self.assertEqual(self.slept, [])
+        self.assertTrue(bucket.acquire(timeout=2))
+
+    def test_dailyQuota(self):
+        bucket = TokenBucket(rate=10, dailyQuota=5, usedToday=3)
+        self.assertEqual(bucket.remainingQuota(), 2)
+        self.assertTrue(bucket.acquire())
+        self.assertTrue(bucket.acquire())
+        self.assertFalse(bucket.acquire())
+        self.assertEqual(bucket.remainingQuota(), 0)
+        self.assertEqual(self.slept, [])
+
+    def test_exhaust(self):
+        bucket = TokenBucket(rate=10)
+        self.assertIsNone(bucket.remainingQuota())
+        bucket.exhaust()
+        self.assertFalse(bucket.acquire())
+
+    def test_pauseDropsSavedTokens(self):
+        bucket = TokenBucket(rate=1, capacity=5)
+        bucket.pause(10)
+        self.assertTrue(bucket.acquire())
+        self.assertEqual(self.clock.now, 1010.0)
+
+
+if __name__ == '__main__':
+    unittest.main()